@@ -1,14 +1,18 @@
 import { NextRequest, NextResponse } from 'next/server'
-import { readFileSync, writeFileSync, existsSync, unlinkSync, readdirSync } from 'fs'
+import { readFileSync, writeFileSync, existsSync, unlinkSync, readdirSync, statSync } from 'fs'
 import { join } from 'path'
 
 const HISTORY_DIR = join(process.cwd(), 'public', 'params_history')
 const PARAMS_DIR = join(process.cwd(), 'public', 'params')
+// Aligned snapshot written at a fixed rate by listen.py's resampler
+const SNAPSHOT_PATH = join(PARAMS_DIR, 'SNAPSHOT.json')
+const SNAPSHOT_MAX_AGE_MS = 2000
 
 // Define the telemetry data structure
 interface TelemetrySnapshot {
   timestamp: string
   time_boot_ms: number
+  time_unix_us?: number
   battery?: {
     voltage: number
     current: number
@@ -58,10 +62,30 @@ interface TelemetrySnapshot {
   }
 }
 
+// Latest resampled snapshot, or null if listen.py is not producing one
+function readAlignedSnapshot(): TelemetrySnapshot | null {
+  try {
+    if (!existsSync(SNAPSHOT_PATH) || Date.now() - statSync(SNAPSHOT_PATH).mtimeMs > SNAPSHOT_MAX_AGE_MS) {
+      return null
+    }
+    return JSON.parse(readFileSync(SNAPSHOT_PATH, 'utf8'))
+  } catch (error) {
+    // Caught mid-write; the per-file path below still works
+    return null
+  }
+}
+
 // Function to read current telemetry data
 async function getCurrentTelemetryData(): Promise<TelemetrySnapshot> {
+  const aligned = readAlignedSnapshot()
+  if (aligned) {
+    return aligned
+  }
+
   const timestamp = new Date().toISOString()
   let time_boot_ms = Date.now()
+  // Vehicle-clock time aligned to host epoch by listen.py (TIMESYNC)
+  let time_unix_us: number | undefined
   
   const snapshot: TelemetrySnapshot = {
     timestamp,
@@ -86,6 +110,7 @@ async function getCurrentTelemetryData(): Promise<TelemetrySnapshot> {
     if (existsSync(localPosPath)) {
       const localPos = JSON.parse(readFileSync(localPosPath, 'utf8'))
       time_boot_ms = localPos.time_boot_ms || time_boot_ms
+      time_unix_us = localPos.time_unix_us || time_unix_us
       snapshot.position = {
         x: localPos.x || 0,
         y: localPos.y || 0,
@@ -129,6 +154,7 @@ async function getCurrentTelemetryData(): Promise<TelemetrySnapshot> {
     if (existsSync(attitudePath)) {
       const attitude = JSON.parse(readFileSync(attitudePath, 'utf8'))
       time_boot_ms = attitude.time_boot_ms || time_boot_ms
+      time_unix_us = attitude.time_unix_us || time_unix_us
       snapshot.attitude = {
         roll: attitude.roll || 0,
         pitch: attitude.pitch || 0,
@@ -156,9 +182,23 @@ async function getCurrentTelemetryData(): Promise<TelemetrySnapshot> {
       }
     }
 
+    // Read ALTITUDE_AGL (listen.py has already picked a fresh, downward, tilt-corrected sensor).
+    // When it exists the raw sensor files below are not used, as in the aligned snapshot
+    const altitudeAglPath = join(PARAMS_DIR, 'ALTITUDE_AGL.json')
+    const hasAltitudeAgl = existsSync(altitudeAglPath)
+    if (hasAltitudeAgl) {
+      const altitudeAgl = JSON.parse(readFileSync(altitudeAglPath, 'utf8'))
+      // altitude is the tilt-corrected height; it only comes from relative_alt when no sensor is fresh
+      if (altitudeAgl.source && altitudeAgl.source !== 'RELATIVE_ALT' && altitudeAgl.altitude != null) {
+        snapshot.rangefinder = {
+          distance: altitudeAgl.altitude
+        }
+      }
+    }
+
     // Read RANGEFINDER
     const rangefinderPath = join(PARAMS_DIR, 'RANGEFINDER.json')
-    if (existsSync(rangefinderPath)) {
+    if (!hasAltitudeAgl && existsSync(rangefinderPath)) {
       const rangefinder = JSON.parse(readFileSync(rangefinderPath, 'utf8'))
       snapshot.rangefinder = {
         distance: rangefinder.distance || 0
@@ -167,7 +207,7 @@ async function getCurrentTelemetryData(): Promise<TelemetrySnapshot> {
 
     // Read DISTANCE_SENSOR (alternative/backup for rangefinder)
     const distanceSensorPath = join(PARAMS_DIR, 'DISTANCE_SENSOR.json')
-    if (existsSync(distanceSensorPath)) {
+    if (!hasAltitudeAgl && existsSync(distanceSensorPath)) {
       const distanceSensor = JSON.parse(readFileSync(distanceSensorPath, 'utf8'))
       // If we don't have rangefinder data, use distance sensor
       if (!snapshot.rangefinder || snapshot.rangefinder.distance === 0) {
@@ -189,6 +229,10 @@ async function getCurrentTelemetryData(): Promise<TelemetrySnapshot> {
     }
 
     snapshot.time_boot_ms = time_boot_ms
+    if (time_unix_us) {
+      snapshot.time_unix_us = time_unix_us
+      snapshot.timestamp = new Date(time_unix_us / 1000).toISOString()
+    }
 
   } catch (error) {
     console.error('Error reading telemetry data:', error)
@@ -13,6 +13,9 @@ const JETSON_CONFIG = {
   localPath: path.join(process.cwd(), 'temp', 'safe_zone_data.txt')
 }
 
+// Pushed updates from safe_zone_ingest.py; scp is only the fallback
+const SAFE_ZONE_URL = process.env.SAFE_ZONE_URL || 'http://127.0.0.1:8790/safe-zone'
+
 interface ArenaCorner {
   lat: number
   lng: number
@@ -30,6 +33,7 @@ interface ParsedData {
   timestamp: string
   status: 'success' | 'error'
   error?: string
+  version?: number
 }
 
 // Ensure temp directory exists
@@ -93,6 +97,20 @@ function parseArenaData(content: string): ParsedData {
   }
 }
 
+// Latest pushed state, or null if the ingest service is not running or has no data yet
+async function fetchPushedData(): Promise<ParsedData | null> {
+  try {
+    const response = await fetch(SAFE_ZONE_URL, { cache: 'no-store', signal: AbortSignal.timeout(300) })
+    if (!response.ok) {
+      return null
+    }
+    const data: ParsedData = await response.json()
+    return data.status === 'success' ? data : null
+  } catch {
+    return null
+  }
+}
+
 // Fetch data from Jetson via SCP
 async function fetchJetsonData(): Promise<ParsedData> {
   try {
@@ -136,7 +154,7 @@ async function fetchJetsonData(): Promise<ParsedData> {
 // GET endpoint
 export async function GET(request: NextRequest) {
   try {
-    const data = await fetchJetsonData()
+    const data = (await fetchPushedData()) ?? (await fetchJetsonData())
     
     return NextResponse.json(data, {
       status: 200,
@@ -0,0 +1,29 @@
+import { NextRequest, NextResponse } from 'next/server'
+
+// Per-field history kept by listen.py (--metrics-port 8787); see timeseries.py
+const SERIES_URL = process.env.SERIES_URL || 'http://127.0.0.1:8787/series'
+
+// GET /api/series?type=ATTITUDE&fields=roll,pitch&seconds=30&max_points=500
+export async function GET(request: NextRequest) {
+  try {
+    // Accept is passed through so clients can negotiate the binary format (lib/mavlink/telemetry-wire.ts)
+    const response = await fetch(`${SERIES_URL}${request.nextUrl.search}`, {
+      cache: 'no-store',
+      headers: { Accept: request.headers.get('Accept') || 'application/json' },
+      signal: AbortSignal.timeout(1000)
+    })
+    const body = await response.arrayBuffer()
+    return new NextResponse(body, {
+      status: response.status,
+      headers: {
+        'Content-Type': response.headers.get('Content-Type') || 'application/json',
+        'Cache-Control': 'no-cache, no-store, must-revalidate'
+      }
+    })
+  } catch (error) {
+    return NextResponse.json(
+      { error: 'Telemetry history unavailable (is listen.py running with --metrics-port?)' },
+      { status: 503 }
+    )
+  }
+}
@@ -1,5 +1,9 @@
 from pymavlink import mavutil
 import time
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connection_profile import open_connection
 
 def print_baro_data(master):
     print("Waiting for barometer data...")
@@ -18,10 +22,11 @@ def main():
     baud_rate = 57600
 
     print(f"Connecting to {connection_string} at {baud_rate} baud...")
-    master = mavutil.mavlink_connection(connection_string, baud=baud_rate)
-
     print("Waiting for heartbeat...")
-    master.wait_heartbeat()
+    master, _ = open_connection(connection_string, baud_rate)
+    if not master:
+        print("No heartbeat received.")
+        return
     print(f"Heartbeat received from system {master.target_system}, component {master.target_component}")
 
     print("\n--- Barometer data BEFORE calibration ---")
@@ -1,7 +1,13 @@
 from pymavlink import mavutil
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mavlink_autodetect import resolve_serial
+from statustext_classifier import classify, outcome
 
 # Connect to flight controller
-master = mavutil.mavlink_connection('/dev/tty.usbserial-D30JKVZM', baud=57600)
+port, baud = resolve_serial('/dev/tty.usbserial-D30JKVZM', 57600)
+master = mavutil.mavlink_connection(port, baud=baud)
 
 print("Waiting for heartbeat...")
 master.wait_heartbeat()
@@ -38,12 +44,12 @@ while True:
         print("❌ No status update received.")
         break
 
-    text = msg.text.lower()
     print(f"Status: {msg.text}")
 
-    if "gyro" in text and ("done" in text or "complete" in text):
+    done = outcome(classify(msg.text))
+    if done:
         print("✅ Gyro calibration completed successfully.")
         break
-    elif "gyro" in text and "fail" in text:
+    elif done is False:
         print("❌ Gyro calibration failed.")
         break
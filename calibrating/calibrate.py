@@ -5,6 +5,11 @@ import threading
 import sys
 import serial
 import serial.tools.list_ports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mavlink_autodetect import resolve_serial
+from stream_profiles import StreamManager
+from calibration_sequencer import CalibrationSequencer, FULL_CALIBRATION, summarize
+from statustext_classifier import StatusTextAssembler, classify, outcome
 
 # Connection settings
 SERIAL_PORT = "/dev/tty.usbserial-D30JKVZM"
@@ -111,12 +116,19 @@ def connect_drone():
     # List available ports
     list_serial_ports()
     
+    # Use the configured port when it is present; the ports are only
+    # sniffed for MAVLink traffic when it is missing
+    port, baud = resolve_serial(SERIAL_PORT, BAUD_RATES[0], bauds=BAUD_RATES)
+    if port != SERIAL_PORT:
+        print(f"Detected MAVLink on {port} at {baud} baud")
+    bauds = [baud] + [b for b in BAUD_RATES if b != baud]
+    
     # Test serial connection first
-    if not test_serial_connection(SERIAL_PORT, BAUD_RATES[0]):
+    if not test_serial_connection(port, bauds[0]):
         print("Failed to open serial port. Please check your connection.")
         print("\nTrying to read raw data from port...")
         try:
-            with serial.Serial(SERIAL_PORT, BAUD_RATES[0], timeout=1) as ser:
+            with serial.Serial(port, bauds[0], timeout=1) as ser:
                 data = ser.read(100)
                 if data:
                     print(f"Raw data received: {data.hex()}")
@@ -127,8 +139,8 @@ def connect_drone():
         return None
     
     # Try each baud rate
-    for baud in BAUD_RATES:
-        master = try_connection(SERIAL_PORT, baud)
+    for baud in bauds:
+        master = try_connection(port, baud)
         if master:
             print(f"Connected to system {master.target_system} | Component {master.target_component}")
             print(f"Vehicle type: {master.flightmode}, System status: {master.system_status}")
@@ -137,14 +149,10 @@ def connect_drone():
             heartbeat_thread = threading.Thread(target=send_heartbeat, args=(master,), daemon=True)
             heartbeat_thread.start()
             
-            # Request data streams
-            master.mav.request_data_stream_send(
-                master.target_system,
-                master.target_component,
-                mavutil.mavlink.MAV_DATA_STREAM_ALL,
-                10,  # 10Hz rate
-                1    # Start sending
-            )
+            # Request the sensor streams calibration needs
+            streams = StreamManager(master)
+            streams.apply('calibration')
+            streams.settle()   # Reads the interval ACKs; there is no receive loop yet
             
             # Wait for initial data
             time.sleep(1)
@@ -183,6 +191,7 @@ def wait_for_completion(master, timeout=CALIBRATION_TIMEOUT):
     """Enhanced calibration completion monitoring"""
     start_time = time.time()
     last_progress = -1
+    assembler = StatusTextAssembler()
     
     # First wait for command acknowledgment
     while time.time() - start_time < 10:  # 10 second timeout for initial ACK
@@ -202,14 +211,15 @@ def wait_for_completion(master, timeout=CALIBRATION_TIMEOUT):
             continue
             
         if msg.get_type() == 'STATUSTEXT':
-            text = msg.text.lower()
-            print(f"Status: {msg.text}")
+            text = assembler.add(msg)
+            if text is None:
+                continue
+            print(f"Status: {text}")
             
             # Check for completion messages
-            if "calibration successful" in text or "calibration done" in text:
-                return True
-            if "calibration failed" in text or "failed" in text:
-                return False
+            done = outcome(classify(text))
+            if done is not None:
+                return done
                 
         elif msg.get_type() == 'PROGRESS':
             if msg.progress != last_progress:
@@ -317,13 +327,9 @@ def main():
                 calibrate_mag(master)
             elif choice == '5':
                 print("\n=== Starting Full Calibration Sequence ===")
-                if calibrate_gyro(master):
-                    time.sleep(2)
-                    if calibrate_mag(master):
-                        time.sleep(2)
-                        if calibrate_accel(master):
-                            time.sleep(2)
-                            calibrate_baro(master)
+                sequencer = CalibrationSequencer(master, on_status=lambda status, progress=None: print(status))
+                results = sequencer.run(FULL_CALIBRATION)
+                print(f"\nCalibration timings: {summarize(results)}")
             elif choice == '6':
                 print("\nExiting...")
                 break
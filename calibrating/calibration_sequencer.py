@@ -0,0 +1,193 @@
+"""
+Calibration sequencer
+
+Runs MAV_CMD_PREFLIGHT_CALIBRATION steps back to back on one shared
+MAVLink connection. A step ends as soon as the vehicle reports it done
+(COMMAND_ACK plus the completion STATUSTEXT for the interactive steps,
+and for every step on autopilots that acknowledge before finishing, like
+PX4), so a full pass takes as long as the vehicle needs and no longer.
+Only STATUSTEXT from the target vehicle counts, and a text that names
+another sensor belongs to an earlier step and is dropped.
+"""
+
+import re
+import time
+import logging
+from pymavlink import mavutil
+from statustext_classifier import STARTED, StatusTextAssembler, classify, outcome, progress
+
+logger = logging.getLogger(__name__)
+
+# Sensor named in a STATUSTEXT -> the step it belongs to
+SENSOR_WORDS = re.compile(r'\b(gyro|mag|compass|accel|level|baro|airspeed)', re.IGNORECASE)
+SENSOR_STEPS = {'gyro': 'gyro', 'mag': 'mag', 'compass': 'mag', 'accel': 'accel',
+                'level': 'accel', 'baro': 'baro', 'airspeed': 'baro'}
+
+
+def named_steps(text):
+    """Steps whose sensor the text names, e.g. {'mag'} for 'calibration done: mag'"""
+    return {SENSOR_STEPS[word.lower()] for word in SENSOR_WORDS.findall(text)}
+
+
+class CalibrationStep:
+    """One calibration command with its operator prompt and timeout"""
+
+    def __init__(self, name, params, timeout, prompt, wait_for_text):
+        self.name = name
+        self.params = params
+        self.timeout = timeout
+        self.prompt = prompt
+        # On ArduPilot gyro and baro are acknowledged once finished; mag and
+        # accel are acknowledged immediately and finish with a STATUSTEXT
+        self.wait_for_text = wait_for_text
+
+
+class StepResult:
+    """Outcome and timings of a single calibration step"""
+
+    def __init__(self, name, success, reason, ack_latency, duration):
+        self.name = name
+        self.success = success
+        self.reason = reason
+        self.ack_latency = ack_latency
+        self.duration = duration
+
+    def __repr__(self):
+        return (f"StepResult({self.name}, success={self.success}, reason={self.reason!r}, "
+                f"ack={self.ack_latency}, duration={self.duration:.2f}s)")
+
+
+CALIBRATION_STEPS = {
+    'gyro': CalibrationStep('gyro', [1, 0, 0, 0, 0, 0, 0], 30,
+                            "Keep the drone completely still...", False),
+    'mag': CalibrationStep('mag', [0, 1, 0, 0, 0, 0, 0], 120,
+                           "Rotate the drone around all axes...", True),
+    'accel': CalibrationStep('accel', [0, 0, 0, 0, 1, 0, 0], 180,
+                             "Place vehicle in each orientation when instructed "
+                             "(level, right, left, nose down, nose up, back)", True),
+    'baro': CalibrationStep('baro', [0, 0, 1, 0, 0, 0, 0], 30,
+                            "Keep the drone still...", False),
+}
+
+FULL_CALIBRATION = ['gyro', 'mag', 'accel', 'baro']
+
+
+class CalibrationSequencer:
+    """Run calibration steps one after another on a single connection"""
+
+    def __init__(self, master, on_status=None, acks_early=None):
+        self.master = master
+        self.on_status = on_status
+        self.assembler = StatusTextAssembler()
+        # True when the autopilot acknowledges before finishing (PX4); None works it out from HEARTBEAT
+        self.acks_early = acks_early
+
+    def _acks_early(self):
+        if self.acks_early is None:
+            heartbeat = getattr(self.master, 'messages', {}).get('HEARTBEAT')
+            return heartbeat is not None and heartbeat.autopilot == mavutil.mavlink.MAV_AUTOPILOT_PX4
+        return self.acks_early
+
+    def _from_target(self, msg):
+        if msg.get_srcSystem() != self.master.target_system:
+            return False
+        return not self.master.target_component or msg.get_srcComponent() == self.master.target_component
+
+    def _drain(self):
+        """Drop replies still queued from earlier steps"""
+        while self.master.recv_match(type=['COMMAND_ACK', 'STATUSTEXT'], blocking=False) is not None:
+            pass
+
+    def _status(self, status, progress=None):
+        logger.info(f"Status: {status}" + (f" Progress: {progress}%" if progress is not None else ""))
+        if self.on_status:
+            self.on_status(status, progress)
+
+    def run_step(self, step, next_step=None):
+        """Send one calibration command and wait for the vehicle to finish it"""
+        self._status(step.prompt)
+        self._drain()
+        started = time.monotonic()
+        deadline = started + step.timeout
+        self.master.mav.command_long_send(
+            self.master.target_system,
+            self.master.target_component,
+            mavutil.mavlink.MAV_CMD_PREFLIGHT_CALIBRATION,
+            0,  # confirmation
+            *step.params
+        )
+
+        ack_latency = None
+        text_done = not (step.wait_for_text or self._acks_early())
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                reason = "no acknowledgment received" if ack_latency is None else "timed out"
+                return StepResult(step.name, False, reason, ack_latency, time.monotonic() - started)
+
+            msg = self.master.recv_match(type=['COMMAND_ACK', 'STATUSTEXT'],
+                                         blocking=True, timeout=min(remaining, 1.0))
+            if msg is None or not self._from_target(msg):
+                continue
+
+            if msg.get_type() == 'COMMAND_ACK':
+                if msg.command != mavutil.mavlink.MAV_CMD_PREFLIGHT_CALIBRATION:
+                    continue
+                if msg.result == mavutil.mavlink.MAV_RESULT_IN_PROGRESS:
+                    continue
+                if msg.result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+                    return StepResult(step.name, False, f"command rejected (result={msg.result})",
+                                      time.monotonic() - started, time.monotonic() - started)
+                ack_latency = time.monotonic() - started
+                self._status(f"{step.name} calibration command accepted")
+                # Let the operator get ready for the next step while this one finishes
+                if next_step is not None and not text_done:
+                    self._status(f"Next: {next_step.name} - {next_step.prompt}")
+            else:
+                text = self.assembler.add(msg)
+                if text is None:
+                    continue
+                named = named_steps(text)
+                if named and step.name not in named:
+                    logger.debug(f"Ignoring STATUSTEXT for another step during {step.name}: {text}")
+                    continue
+                events = classify(text)
+                self._status(text, progress(events))
+                done = outcome(events)
+                if done is False:
+                    return StepResult(step.name, False, text, ack_latency, time.monotonic() - started)
+                if done:
+                    text_done = True
+                elif ack_latency is not None and any(event.kind == STARTED for event in events):
+                    # Started after the ACK: this autopilot acknowledges before finishing
+                    text_done = False
+
+            if ack_latency is not None and text_done:
+                return StepResult(step.name, True, "completed", ack_latency, time.monotonic() - started)
+
+    def run(self, names=FULL_CALIBRATION, stop_on_failure=True):
+        """Run the named steps in order and return a StepResult per step run"""
+        steps = [CALIBRATION_STEPS[name] for name in names]
+        results = []
+        for i, step in enumerate(steps):
+            next_step = steps[i + 1] if i + 1 < len(steps) else None
+            result = self.run_step(step, next_step)
+            results.append(result)
+            if result.success:
+                self._status(f"{step.name} calibration done in {result.duration:.1f}s")
+            else:
+                self._status(f"{step.name} calibration failed: {result.reason}")
+                if stop_on_failure:
+                    break
+
+        total = sum(r.duration for r in results)
+        logger.info("Calibration timings: " +
+                    ", ".join(f"{r.name}={r.duration:.1f}s" for r in results) +
+                    f" (total {total:.1f}s)")
+        return results
+
+
+def summarize(results):
+    """One-line summary of a sequence run"""
+    return ", ".join(f"{r.name} {'ok' if r.success else 'failed'} {r.duration:.1f}s" for r in results)
@@ -10,6 +10,9 @@ import signal
 import serial
 import serial.tools.list_ports
 import logging
+from calibration_sequencer import CalibrationSequencer, FULL_CALIBRATION, summarize
+from statustext_classifier import (StatusTextAssembler, classify, outcome,
+                                   PROGRESS, SIDE_DONE, PENDING, PROMPT)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -21,6 +24,13 @@ COMPONENT_ID = 190
 WS_PORT = 8765
 CALIBRATION_TIMEOUT = 120
 
+# Operator instructions for the classifier's prompt events
+PROMPT_STATUS = {
+    'hold_still': "Hold vehicle still...",
+    'rest_detected': "Position detected, keep holding...",
+    'already_done': "Position already calibrated, try a different position",
+}
+
 def connect_to_drone():
     """Connect to the drone via UDP"""
     try:
@@ -84,9 +94,7 @@ async def run_calibration(websocket, calibration_type):
             await send_status(websocket, "Keep the drone still...")
             timeout = 30
         elif calibration_type == "all":
-            for cal_type in ["gyro", "mag", "accel", "baro"]:
-                await run_calibration(websocket, cal_type)
-                await asyncio.sleep(2)
+            await run_calibration_sequence(websocket, master, FULL_CALIBRATION)
             return
         else:
             await send_status(websocket, f"failed: Unknown calibration type {calibration_type}")
@@ -112,6 +120,7 @@ async def run_calibration(websocket, calibration_type):
         start_time = time.time()
         ack_received = False
         last_message_time = time.time()
+        assembler = StatusTextAssembler()
         completed_sides = set()
         pending_sides = {"back", "front", "left", "right", "up", "down"}
 
@@ -132,51 +141,41 @@ async def run_calibration(websocket, calibration_type):
                             return
 
                 elif msg_type == 'STATUSTEXT':
-                    text = msg.text.lower()
-                    
+                    text = assembler.add(msg)
                     # Handle calibration-specific messages
-                    if "[cal]" in text:
+                    if text is not None and "[cal]" in text.lower():
+                        events = classify(text)
                         # Clean up the message by removing '[cal]' prefix
                         clean_text = text.replace("[cal]", "").strip()
                         await send_status(websocket, clean_text)
                         logging.info(f"Calibration message: {clean_text}")  # Log to console
 
-                        # Track progress for accelerometer calibration
-                        if "progress" in text:
-                            try:
-                                progress = int(text.split("<")[1].split(">")[0])
-                                await send_status(websocket, f"Calibration progress: {progress}%", progress)
-                            except:
-                                pass
-                        
-                        # Track completed sides
-                        if "side result" in text:
-                            for side in ["back", "front", "left", "right", "up", "down"]:
-                                if side in text and side in pending_sides:
-                                    pending_sides.remove(side)
-                                    completed_sides.add(side)
-                                    await send_status(websocket, f"Completed {side} side. Remaining: {', '.join(pending_sides)}")
-                        
-                        # Handle completion messages
-                        if "calibration successful" in text or "calibration done" in text:
+                        pending = next((e.value for e in events if e.kind == PENDING), [])
+                        for event in events:
+                            if event.kind == PROGRESS:
+                                await send_status(websocket, f"Calibration progress: {event.value}%", event.value)
+                            elif event.kind == SIDE_DONE:
+                                # Track completed sides
+                                if event.value in pending_sides:
+                                    pending_sides.remove(event.value)
+                                    completed_sides.add(event.value)
+                                    await send_status(websocket, f"Completed {event.value} side. Remaining: {', '.join(pending_sides)}")
+                                else:
+                                    await send_status(websocket, "Position calibrated successfully")
+                            elif event.kind == PROMPT:
+                                if event.name == 'rotate':
+                                    await send_status(websocket, f"Rotate to a new position. Remaining sides: {' '.join(pending)}")
+                                else:
+                                    await send_status(websocket, PROMPT_STATUS[event.name])
+
+                        # Handle completion messages (explicit "calibration successful/done/failed" only)
+                        done = outcome(events, explicit=True)
+                        if done:
                             await send_status(websocket, "success: Calibration completed successfully")
                             return
-                        elif "calibration failed" in text:
-                            await send_status(websocket, f"failed: {clean_text}")
+                        elif done is False:
+                            await send_status(websocket, f"failed: {text.replace('[cal]', '').strip()}")
                             return
-                        
-                        # Handle specific instructions
-                        if "hold vehicle still" in text:
-                            await send_status(websocket, "Hold vehicle still...")
-                        elif "detected rest position" in text:
-                            await send_status(websocket, "Position detected, keep holding...")
-                        elif "rotate to a different side" in text:
-                            sides_left = text.split("pending:")[1].strip() if "pending:" in text else ""
-                            await send_status(websocket, f"Rotate to a new position. Remaining sides: {sides_left}")
-                        elif "side already completed" in text:
-                            await send_status(websocket, "Position already calibrated, try a different position")
-                        elif "side done" in text:
-                            await send_status(websocket, "Position calibrated successfully")
 
             # Check for timeout conditions
             if time.time() - last_message_time > 5:  # No messages for 5 seconds
@@ -208,6 +207,21 @@ async def run_calibration(websocket, calibration_type):
         if master:
             master.close()
 
+async def run_calibration_sequence(websocket, master, steps):
+    """Run several calibrations back to back on the already open connection"""
+    loop = asyncio.get_running_loop()
+
+    def on_status(status, progress=None):
+        asyncio.run_coroutine_threadsafe(send_status(websocket, status, progress), loop)
+
+    sequencer = CalibrationSequencer(master, on_status=on_status)
+    results = await loop.run_in_executor(None, sequencer.run, steps)
+
+    if len(results) == len(steps) and all(r.success for r in results):
+        await send_status(websocket, f"success: All calibrations completed ({summarize(results)})")
+    else:
+        await send_status(websocket, f"failed: {summarize(results)}")
+
 async def send_status(websocket, status, progress=None):
     """Send status and optional progress to the websocket client"""
     message = {"status": status}
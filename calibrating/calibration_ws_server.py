@@ -2,12 +2,16 @@ import asyncio
 import websockets
 import json
 from pymavlink import mavutil
-from threading import Thread
-import time
-import serial
 import logging
 import os
 import socket
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mavlink_link import ReconnectingLink
+from stream_profiles import StreamManager
+from records import compact, message_time_us
+import mavlink_json
+import telemetry_wire
 
 # Configure logging for better debugging
 logging.basicConfig(
@@ -19,9 +23,13 @@ logging.basicConfig(
 )
 
 connected_clients = set()
+# Clients that negotiated a telemetry subprotocol -> StreamEncoder (binary) or None (JSON)
+telemetry_clients = {}
 
 # Connect to your drone (update connection string as needed)
-master = mavutil.mavlink_connection('//dev/tty.usbmodem01', baud=57600)
+SERIAL_PORT = '/dev/tty.usbmodem01'
+BAUD_RATE = 57600
+link = ReconnectingLink(SERIAL_PORT, BAUD_RATE)
 
 PARAM_TYPES = [
     'ATTITUDE',
@@ -41,40 +49,32 @@ PARAM_TYPES = [
 PARAMS_DIR = os.path.join('public', 'params')
 os.makedirs(PARAMS_DIR, exist_ok=True)
 
-def mavlink_reader(loop, mavlink_queue):
-    while True:
-        try:
-            msg = master.recv_match(blocking=True)
-            if msg:
-                logging.debug(f"MAVLink message received: {msg}")
-                if msg.get_type() == 'BAD_DATA':
-                    logging.warning(f"Skipping BAD_DATA message: {msg}")
-                    continue
-                asyncio.run_coroutine_threadsafe(mavlink_queue.put(msg), loop)
-        except serial.SerialException as e:
-            logging.error(f"SerialException: {e}. Retrying connection...")
-            reconnect_to_device()
-        time.sleep(0.1)
-
-def reconnect_to_device():
-    global master
-    while True:
-        try:
-            master = mavutil.mavlink_connection('/dev/tty.usbserial-D30JKVZM', baud=57600)
-            logging.info("Reconnected to the telemetry device.")
-            break
-        except serial.SerialException as e:
-            logging.warning(f"Failed to reconnect: {e}. Retrying in 5 seconds...")
-            time.sleep(5)
+# Stream manager for the current connection, replaced on every (re)connect
+streams = None
+
+@link.on_connect
+def request_streams(master):
+    """Re-request telemetry after every (re)connect"""
+    global streams
+    # PARAM_TYPES is the dashboard message set; apply() only sends, the ACKs
+    # are matched in observe() so the reader thread is never held up
+    streams = StreamManager(master)
+    streams.apply('dashboard')
+
+@link.subscribe
+def observe_streams(msg):
+    if streams is not None:
+        streams.observe(msg)
 
 async def process_mavlink_messages(mavlink_queue):
     while True:
         msg = await mavlink_queue.get()
-        if msg.get_type() == 'BAD_DATA':
-            logging.warning(f"Ignoring BAD_DATA message: {msg}")
-            continue
         logging.debug(f"Processing MAVLink message: {msg}")
-        if msg.get_type() == 'STATUSTEXT':
+        if msg.get_type() in PARAM_TYPES:
+            save_to_params_file(msg.get_type(), msg.to_dict())
+            if telemetry_clients:
+                await stream_telemetry(msg)
+        elif msg.get_type() == 'STATUSTEXT':
             message = {
                 "type": "status",
                 "text": msg.text.strip() if isinstance(msg.text, str) else msg.text.decode('utf-8').strip()
@@ -96,18 +96,6 @@ async def process_mavlink_messages(mavlink_queue):
                 save_to_params_file('calibration_ack.json', ack_message)
                 await broadcast(json.dumps(ack_message))
 
-        for param_type in PARAM_TYPES:
-            try:
-                msg = master.recv_match(type=param_type, blocking=True, timeout=0.5)
-                if msg:
-                    param_data = msg.to_dict()
-                    logging.info(f"Received {param_type}: {param_data}")
-                    save_to_params_file(param_type, param_data)
-            except Exception as e:
-                logging.error(f"Error processing {param_type}: {e}")
-        logging.info("Completed parameter cycle, waiting before next cycle...")
-        time.sleep(1)
-
 async def broadcast(message):
     for ws in connected_clients.copy():
         try:
@@ -115,27 +103,54 @@ async def broadcast(message):
         except websockets.exceptions.ConnectionClosed:
             connected_clients.remove(ws)
 
+async def stream_telemetry(msg):
+    """Send a telemetry message to each subscribed client in the format it negotiated"""
+    time_us = getattr(msg, 'time_us', None) or message_time_us(msg)
+    text = None
+    for ws, encoder in list(telemetry_clients.items()):
+        try:
+            if encoder is None:
+                text = text or mavlink_json.dumps(msg, time_unix_us=time_us)
+                await ws.send(text)
+            else:
+                await ws.send(b''.join(encoder.frames(msg, time_us)))
+        except websockets.exceptions.ConnectionClosed:
+            telemetry_clients.pop(ws, None)
+
 async def handle_calibration(websocket, path):
     connected_clients.add(websocket)
-    logging.info("WebSocket client connected.")
+    if websocket.subprotocol == telemetry_wire.WS_BINARY:
+        telemetry_clients[websocket] = telemetry_wire.StreamEncoder()
+    elif websocket.subprotocol == telemetry_wire.WS_JSON:
+        telemetry_clients[websocket] = None
+    logging.info(f"WebSocket client connected (subprotocol {websocket.subprotocol}).")
     try:
         async for message in websocket:
             try:
                 data = json.loads(message)
                 command = data.get("command")
+                if command == "telemetry_fields" and telemetry_clients.get(websocket) is not None:
+                    # {"command": "telemetry_fields", "fields": {"ATTITUDE": ["roll", "pitch"]}}
+                    fields = {msg_type: tuple(names) for msg_type, names in data.get("fields", {}).items()}
+                    for msg_type, names in fields.items():
+                        telemetry_wire.schema(msg_type, names)  # Unknown fields fail here, not mid-stream
+                    telemetry_clients[websocket] = telemetry_wire.StreamEncoder(fields)
+                    continue
                 logging.info(f"Received calibration command: {command}")
 
                 if command == 241:  # Gyro
                     logging.debug("Preparing to send Gyro calibration command via MAVLink.")
                     try:
-                        master.mav.command_long_send(
+                        sent = link.send(lambda master: master.mav.command_long_send(
                             master.target_system,
                             master.target_component,
                             mavutil.mavlink.MAV_CMD_PREFLIGHT_CALIBRATION,
                             0,
                             1,  # Gyro calibration
                             0, 0, 0, 0, 0, 0
-                        )
+                        ))
+                        if not sent:
+                            raise ConnectionError("drone is reconnecting")
                         logging.info("Gyro calibration command sent to the drone.")
                         save_to_params_file('calibration_command.json', {"command": "Gyro", "status": "sent"})
                     except Exception as e:
@@ -150,6 +165,7 @@ async def handle_calibration(websocket, path):
         logging.error(f"Error in handle_calibration: {e}")
     finally:
         connected_clients.remove(websocket)
+        telemetry_clients.pop(websocket, None)
         logging.info("WebSocket client disconnected.")
 
 def save_to_params_file(param_type, param_data):
@@ -161,6 +177,12 @@ def save_to_params_file(param_type, param_data):
     except Exception as e:
         logging.error(f"Failed to write to {file_path}: {e}")
 
+async def publish_link_stats(interval=1.0):
+    """Write link statistics as the LINK_STATS telemetry type"""
+    while True:
+        await asyncio.sleep(interval)
+        save_to_params_file('LINK_STATS', link.stats.snapshot())
+
 def is_port_in_use(port):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         return s.connect_ex(('localhost', port)) == 0
@@ -176,14 +198,22 @@ def get_available_port(start_port):
 async def main():
     loop = asyncio.get_running_loop()
     mavlink_queue = asyncio.Queue()
-    Thread(target=mavlink_reader, args=(loop, mavlink_queue), daemon=True).start()
+    # The subscription outlives reconnects, so the queue never has to be re-wired.
+    # Queued messages are slot records, so a backlog holds fields rather than whole message objects
+    link.subscribe(lambda msg: loop.call_soon_threadsafe(mavlink_queue.put_nowait, compact(msg)))
+    if link.prof:
+        link.prof.install_signal_handler()
+    link.start()
 
     # Dynamically find an available port starting from 8765
     port = get_available_port(8765)
     logging.info(f"WebSocket calibration server running on ws://localhost:{port}")
 
-    async with websockets.serve(handle_calibration, "localhost", port):
+    # Clients offering a telemetry subprotocol also get the telemetry stream; others only calibration
+    async with websockets.serve(handle_calibration, "localhost", port,
+                                subprotocols=[telemetry_wire.WS_BINARY, telemetry_wire.WS_JSON]):
         asyncio.create_task(process_mavlink_messages(mavlink_queue))
+        asyncio.create_task(publish_link_stats())
         await asyncio.Future()
 
 if __name__ == "__main__":
@@ -1,10 +1,15 @@
 from pymavlink import mavutil
 import time
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mavlink_autodetect import resolve_serial
 
 # Define the serial port and baud rate for macOS
 # Update this if your Pixhawk is connected to a different port
 SERIAL_PORT = "/dev/tty.usbserial-D30JKVZM" 
 BAUD_RATE = 57600
+SERIAL_PORT, BAUD_RATE = resolve_serial(SERIAL_PORT, BAUD_RATE)
 
 def run_gyro_calibration():
     """Connects to Pixhawk, sends gyro calibration command, and waits for ACK."""
@@ -1,6 +1,9 @@
 from pymavlink import mavutil
 import time
 import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mavlink_autodetect import resolve_serial
 
 # Connection settings
 SERIAL_PORT = "/dev/tty.usbmodem01"
@@ -20,7 +23,10 @@ def check_port():
     return True
 
 def main():
+    global SERIAL_PORT, BAUD_RATE
     try:
+        SERIAL_PORT, BAUD_RATE = resolve_serial(SERIAL_PORT, BAUD_RATE)
+
         # First check if port exists
         if not check_port():
             return
@@ -1,7 +1,12 @@
 from pymavlink import mavutil
 import time
-import statistics
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mavlink_autodetect import resolve_serial
+from records import Ring
 import math
+from calibration_sequencer import CalibrationSequencer, summarize
 
 # Connection settings
 SERIAL_PORT = "/dev/tty.usbmodem01"
@@ -14,10 +19,12 @@ BARO_DRIFT_THRESHOLD = 2.0       # Increased drift threshold to 2 meters
 WINDOW_SIZE = 30                 # Increased window size for better averaging
 MIN_SAMPLES_BEFORE_ALERT = 10    # Minimum samples needed before alerting
 
+# One row per analysed sample
+READING_DTYPE = [('baro', '<f8'), ('gyro', '<f8', (3,))]
+
 class SensorMonitor:
     def __init__(self):
-        self.baro_readings = []
-        self.gyro_readings = []
+        self.readings = Ring(READING_DTYPE, WINDOW_SIZE)
         self.initial_baro_height = None
         self.last_calibration_time = time.time()
         self.calibration_cooldown = 300  # 5 minutes between calibrations
@@ -31,37 +38,30 @@ class SensorMonitor:
             
         current_time = time.time()
         
-        # Add new readings
-        self.baro_readings.append(baro_height)
-        self.gyro_readings.append((gyro_x, gyro_y, gyro_z))
-
-        # Keep only the last WINDOW_SIZE readings
-        if len(self.baro_readings) > WINDOW_SIZE:
-            self.baro_readings.pop(0)
-        if len(self.gyro_readings) > WINDOW_SIZE:
-            self.gyro_readings.pop(0)
+        # Add new readings; the ring keeps only the last WINDOW_SIZE
+        self.readings.append_row((baro_height, (gyro_x, gyro_y, gyro_z)))
 
         # Initialize reference height if not set
-        if self.initial_baro_height is None and len(self.baro_readings) >= MIN_SAMPLES_BEFORE_ALERT:
-            self.initial_baro_height = statistics.mean(self.baro_readings[:MIN_SAMPLES_BEFORE_ALERT])
+        if self.initial_baro_height is None and len(self.readings) >= MIN_SAMPLES_BEFORE_ALERT:
+            self.initial_baro_height = float(self.readings.view()['baro'][:MIN_SAMPLES_BEFORE_ALERT].mean())
             print(f"\nInitial height reference set to: {self.initial_baro_height:.2f}m")
 
         # Only analyze if we have enough samples
-        if len(self.baro_readings) < MIN_SAMPLES_BEFORE_ALERT:
+        if len(self.readings) < MIN_SAMPLES_BEFORE_ALERT:
             return None
 
         issues = []
+        recent = self.readings.view(MIN_SAMPLES_BEFORE_ALERT)
 
         # Analyze barometer with moving average
-        recent_baro_avg = statistics.mean(self.baro_readings[-MIN_SAMPLES_BEFORE_ALERT:])
+        recent_baro_avg = float(recent['baro'].mean())
         if self.initial_baro_height is not None:
             baro_drift = abs(recent_baro_avg - self.initial_baro_height)
             if baro_drift > BARO_DRIFT_THRESHOLD:
                 issues.append(f"Significant height drift: {baro_drift:.2f}m")
 
         # Analyze gyroscope with moving window
-        recent_gyro = self.gyro_readings[-MIN_SAMPLES_BEFORE_ALERT:]
-        max_gyro = max(max(abs(x), abs(y), abs(z)) for x, y, z in recent_gyro)
+        max_gyro = float(abs(recent['gyro']).max())
         if max_gyro > GYRO_VARIANCE_THRESHOLD:
             issues.append(f"High rotation detected: {max_gyro:.3f} rad/s")
 
@@ -93,60 +93,30 @@ class SensorMonitor:
         print("STARTING SENSOR CALIBRATION")
         print("="*50)
         
-        # Send barometer calibration command
-        print("\nCalibrating barometer...")
-        master.mav.command_long_send(
-            master.target_system,
-            master.target_component,
-            mavutil.mavlink.MAV_CMD_PREFLIGHT_CALIBRATION,
-            0,  # confirmation
-            0,  # gyro calibration
-            0,  # mag calibration
-            0,  # zero pressure
-            1,  # baro calibration
-            0,  # accelerometer calibration
-            0,  # airspeed calibration
-            0   # unused
-        )
-        
-        time.sleep(2)
-        print("Barometer calibration completed!")
-        
-        # Send gyro calibration command
-        print("\nCalibrating gyroscope...")
-        master.mav.command_long_send(
-            master.target_system,
-            master.target_component,
-            mavutil.mavlink.MAV_CMD_PREFLIGHT_CALIBRATION,
-            0,  # confirmation
-            1,  # gyro calibration
-            0,  # mag calibration
-            0,  # zero pressure
-            0,  # baro calibration
-            0,  # accelerometer calibration
-            0,  # airspeed calibration
-            0   # unused
-        )
-        
-        time.sleep(5)
-        print("Gyroscope calibration completed!")
+        # Baro then gyro on the monitoring connection; each step finishes
+        # as soon as the vehicle acknowledges it
+        sequencer = CalibrationSequencer(master, on_status=lambda status, progress=None: print(status))
+        results = sequencer.run(['baro', 'gyro'])
+        success = len(results) == 2 and all(r.success for r in results)
+        print(f"\nCalibration timings: {summarize(results)}")
         
         self.last_calibration_time = time.time()
         self.initial_baro_height = None
-        self.baro_readings = []
-        self.gyro_readings = []
+        self.readings.clear()
         self.consecutive_alerts = 0
         
         print("\n" + "="*50)
-        print("CALIBRATION COMPLETED SUCCESSFULLY")
+        print("CALIBRATION COMPLETED SUCCESSFULLY" if success else "CALIBRATION FAILED")
         print("="*50 + "\n")
         self.calibration_in_progress = False
+        return success
 
 def main():
     try:
         # Connect to the drone
         print("Connecting to Pixhawk...")
-        master = mavutil.mavlink_connection(SERIAL_PORT, baud=BAUD_RATE)
+        port, baud = resolve_serial(SERIAL_PORT, BAUD_RATE)
+        master = mavutil.mavlink_connection(port, baud=baud)
         
         # Wait for heartbeat
         print("Waiting for heartbeat...")
@@ -1,5 +1,9 @@
 from pymavlink import mavutil
 import time
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mavlink_autodetect import resolve_serial
 
 # Connection settings
 SERIAL_PORT = "/dev/tty.usbmodem01"
@@ -9,7 +13,8 @@ def monitor_height():
     try:
         # Connect to the drone
         print("Connecting to Pixhawk...")
-        master = mavutil.mavlink_connection(SERIAL_PORT, baud=BAUD_RATE)
+        port, baud = resolve_serial(SERIAL_PORT, BAUD_RATE)
+        master = mavutil.mavlink_connection(port, baud=baud)
         
         # Wait for heartbeat
         print("Waiting for heartbeat...")
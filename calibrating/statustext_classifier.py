@@ -0,0 +1,166 @@
+"""
+STATUSTEXT classifier for calibration
+
+All calibration code paths classify vehicle STATUSTEXT with the rule table
+below. The rules are compiled into a single regex so each message is
+scanned once, and multi-chunk MAVLink2 STATUSTEXT (id/chunk_seq) is
+reassembled before classification.
+"""
+
+import re
+
+STARTED = 'started'
+PROGRESS = 'progress'
+SIDE_DONE = 'side_done'
+PENDING = 'pending'
+PROMPT = 'prompt'
+SUCCESS = 'success'
+FAILURE = 'failure'
+
+SIDES = r'back|front|left|right|up|down'
+
+# (group name, event kind, pattern). Earlier rules win when two match at
+# the same position, so specific phrases come before generic words.
+RULES = [
+    ('progress', PROGRESS, r'progress\D{0,3}(?P<progress_value>\d{1,3})'),
+    ('side_result', SIDE_DONE, r'side result\b[^\[\n]*?\b(?P<side_result_value>' + SIDES + r')\b'),
+    ('side_done', SIDE_DONE, r'\b(?P<side_done_value>' + SIDES + r') side (?:done|result)\b'),
+    ('completed_side', SIDE_DONE, r'\bcompleted (?P<completed_side_value>\w+) side\b'),
+    ('pending', PENDING, r'pending:(?P<pending_value>(?:\s*(?:' + SIDES + r'))*)'),
+    ('already_done', PROMPT, r'side already completed'),
+    ('hold_still', PROMPT, r'hold (?:vehicle )?still'),
+    ('rest_detected', PROMPT, r'detected rest position|orientation detected'),
+    ('rotate', PROMPT, r'rotate to a different side'),
+    ('cal_failed', FAILURE, r'calibration failed'),
+    ('cal_success', SUCCESS, r'calibration (?:successful|done|complete(?:d)?|finished|passed)'),
+    ('cal_started', STARTED, r'calibration started|\bcalibrating\b|\bstarting\b[^\n]*?\bcalibration'),
+    ('fail_word', FAILURE, r'\bfail(?:ed|ure)?\b|\berror\b|\babort(?:ed)?\b|\btime ?out\b|\breject(?:ed)?\b'),
+    ('success_word', SUCCESS, r'\bsuccess(?:ful)?\b|\bcompleted\b'),
+]
+
+# Bare words like "error" or "completed" only count in a text about calibration
+GENERIC_RULES = {'fail_word', 'success_word'}
+CONTEXT = re.compile(r'calibrat|\[cal\]', re.IGNORECASE)
+# The explicit "calibration successful/done/failed" phrases
+EXPLICIT_RULES = {'cal_success', 'cal_failed'}
+
+
+class StatusEvent:
+    """A single classified calibration event"""
+
+    __slots__ = ('kind', 'value', 'name')
+
+    def __init__(self, kind, value=None, name=None):
+        self.kind = kind
+        self.value = value
+        self.name = name
+
+    def __eq__(self, other):
+        return (isinstance(other, StatusEvent) and
+                (self.kind, self.value, self.name) == (other.kind, other.value, other.name))
+
+    def __repr__(self):
+        return f"StatusEvent({self.kind}, {self.value!r}, {self.name})"
+
+
+class StatusTextClassifier:
+    """Classify STATUSTEXT in one regex pass using a rule table"""
+
+    def __init__(self, rules=RULES):
+        self._kinds = {name: kind for name, kind, _ in rules}
+        self._regex = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, _, pattern in rules),
+                                 re.IGNORECASE)
+
+    def classify(self, text):
+        """Return the list of StatusEvents found in text, in order"""
+        events = []
+        context = None
+        for match in self._regex.finditer(text):
+            name = match.lastgroup
+            if name in GENERIC_RULES:
+                if context is None:
+                    context = bool(CONTEXT.search(text))
+                if not context:
+                    continue
+            kind = self._kinds[name]
+            value = None
+            if kind == PROGRESS:
+                value = int(match.group('progress_value'))
+            elif kind == SIDE_DONE:
+                value = match.group(name + '_value').lower()
+            elif kind == PENDING:
+                value = match.group('pending_value').lower().split()
+            events.append(StatusEvent(kind, value, name))
+        return events
+
+
+class StatusTextAssembler:
+    """Reassemble MAVLink2 STATUSTEXT split across chunks"""
+
+    CHUNK_LEN = 50
+    MAX_PENDING = 16
+
+    def __init__(self):
+        self._pending = {}
+
+    def add(self, msg):
+        """Return the complete text once all chunks are in, otherwise None"""
+        text = msg.text
+        if isinstance(text, bytes):
+            text = text.decode('utf-8', errors='ignore')
+        text = text.split('\x00', 1)[0]
+
+        msg_id = getattr(msg, 'id', 0)
+        if not msg_id:
+            return text.strip()
+
+        key = (msg.get_srcSystem(), msg.get_srcComponent(), msg_id)
+        chunk_seq = getattr(msg, 'chunk_seq', 0)
+        chunks = self._pending.get(key)
+        if chunks is None or chunk_seq != len(chunks):
+            # A new message or a lost chunk; start over from this chunk
+            if chunk_seq != 0:
+                self._pending.pop(key, None)
+                return None
+            if len(self._pending) >= self.MAX_PENDING:
+                self._pending.pop(next(iter(self._pending)))
+            chunks = self._pending[key] = []
+        chunks.append(text)
+
+        if len(text) < self.CHUNK_LEN:
+            del self._pending[key]
+            return ''.join(chunks).strip()
+        return None
+
+
+_classifier = StatusTextClassifier()
+
+
+def classify(text):
+    """Classify text with the shared rule table"""
+    return _classifier.classify(text)
+
+
+def outcome(events, explicit=False):
+    """Return False if any event is a failure, True on success, else None
+
+    explicit=True only counts the "calibration successful/done/failed" phrases.
+    """
+    result = None
+    for event in events:
+        if explicit and event.name not in EXPLICIT_RULES:
+            continue
+        if event.kind == FAILURE:
+            return False
+        if event.kind == SUCCESS:
+            result = True
+    return result
+
+
+def progress(events):
+    """Return the last progress percentage in events, or None"""
+    value = None
+    for event in events:
+        if event.kind == PROGRESS:
+            value = event.value
+    return value
@@ -1,9 +1,12 @@
 import time
 import logging
-import re
 import serial
 from pymavlink import mavutil
+import os
 import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mavlink_autodetect import resolve_serial
+from statustext_classifier import StatusTextAssembler, classify, outcome
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +28,7 @@ class CalibrationError(Exception):
 
 def connect_to_pixhawk(port: str, baud: int = DEFAULT_BAUD) -> mavutil.mavfile:
     """Establish MAVLink connection with retries"""
+    port, baud = resolve_serial(port, baud)
     for attempt in range(1, CONNECTION_RETRIES + 1):
         try:
             logger.info(f"Connection attempt {attempt}/{CONNECTION_RETRIES} to {port}@{baud}")
@@ -93,11 +97,7 @@ def execute_gyro_calibration(master: mavutil.mavfile) -> None:
     
     # Monitor calibration state
     start_time = time.time()
-    progress_pattern = re.compile(
-        r'calibrat(e|ing|ion).*gyro|progress|complete|success|done',
-        re.IGNORECASE
-    )
-    error_pattern = re.compile(r'fail|error|abort|reject', re.IGNORECASE)
+    assembler = StatusTextAssembler()
 
     while time.time() - start_time < CALIBRATION_TIMEOUT:
         msg = master.recv_match(timeout=1)
@@ -105,20 +105,17 @@ def execute_gyro_calibration(master: mavutil.mavfile) -> None:
             continue
             
         if msg.get_type() == 'STATUSTEXT':
-            try:
-                text = msg.text.decode('utf-8', errors='ignore').strip()
-                logger.info(f"System Message: {text}")
-                
-                if error_pattern.search(text):
-                    raise CalibrationError(f"Calibration failed: {text}")
-                    
-                if progress_pattern.search(text):
-                    if any(x in text.lower() for x in ['complete', 'done', 'success']):
-                        logger.info("Calibration successful!")
-                        return
-                        
-            except UnicodeDecodeError:
-                logger.warning("Received malformed status message")
+            text = assembler.add(msg)
+            if text is None:
+                continue
+            logger.info(f"System Message: {text}")
+            
+            done = outcome(classify(text))
+            if done is False:
+                raise CalibrationError(f"Calibration failed: {text}")
+            if done:
+                logger.info("Calibration successful!")
+                return
                 
         elif msg.get_type() == 'COMMAND_ACK':
             logger.debug(f"Command ACK: {msg.result}")
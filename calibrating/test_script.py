@@ -1,7 +1,12 @@
 from pymavlink import mavutil
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mavlink_autodetect import resolve_serial
 
 # Adjust port and baudrate as per your setup
-master = mavutil.mavlink_connection('/dev/tty.usbserial-D30JKVZM', baud=57600)
+port, baud = resolve_serial('/dev/tty.usbserial-D30JKVZM', 57600)
+master = mavutil.mavlink_connection(port, baud=baud)
 
 # Wait for heartbeat before sending commands
 master.wait_heartbeat()
@@ -1,13 +1,17 @@
-from pymavlink import mavutil
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connection_profile import open_connection
 
 def main():
     port = '/dev/tty.usbserial-D30JKVZM'
     baud = 57600
     print(f"Connecting to {port} at {baud} baud...")
-    master = mavutil.mavlink_connection(port, baud=baud)
-
     print("Waiting for heartbeat...")
-    master.wait_heartbeat()
+    master, _ = open_connection(port, baud)
+    if not master:
+        print("No heartbeat received.")
+        return
     print("Heartbeat received.")
 
     # Send the tune string using play_tune_send
@@ -0,0 +1,217 @@
+"""
+Vehicle clock alignment over MAVLink TIMESYNC
+
+ClockSync runs the TIMESYNC exchange and fits vehicle boot time against
+host time (offset plus drift) using only the fastest round trip out of
+each group of eight, so RTT spikes and host scheduling jitter do not
+move the estimate. Every message can then be given one timestamp in a
+single clock domain (host epoch microseconds derived from the vehicle's
+own sample time) with unified_time_us(msg).
+
+Every MAVLink component has its own boot clock, so VehicleClocks keeps
+one ClockSync per (sysid, compid) and picks it from the message source;
+a component that never answers TIMESYNC keeps its receive time, and
+after MAX_UNANSWERED requests without a reply it is only asked again
+every RETRY_INTERVAL.
+
+    clock = VehicleClocks()
+    clock.poll(master)              # in the receive loop; sends TIMESYNC when due
+    clock.handle(msg)               # for every received message
+    t_us = clock.unified_time_us(msg)
+"""
+
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = 1.0         # Seconds between TIMESYNC requests once locked
+FAST_SYNC_INTERVAL = 0.1    # Until MIN_SAMPLES round trips are in
+RETRY_INTERVAL = 10.0       # Once MAX_UNANSWERED requests in a row got no reply
+MAX_UNANSWERED = 10
+MIN_SAMPLES = 5
+MAX_SAMPLES = 128
+GROUP_SIZE = 8              # Fit the fastest round trip out of each group of this many
+MAX_RTT_NS = 500_000_000    # Replies slower than this are ignored
+BOOT_TIME_LIMIT_US = 10 ** 15   # time_usec below this is time since boot, above is Unix time
+
+# Host epoch anchored once, so wall clock steps do not move timestamps
+_EPOCH_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+def host_ns():
+    return time.monotonic_ns()
+
+
+class ClockSync:
+    """Offset/drift estimate between the vehicle boot clock and the host clock"""
+
+    def __init__(self, interval=SYNC_INTERVAL):
+        self.interval = interval
+        self.samples = []        # (host_mid_ns, offset_ns, rtt_ns)
+        self.offset_ns = None    # vehicle - host at ref_ns
+        self.drift = 0.0         # d(offset)/d(host), e.g. 20e-6 for 20 ppm
+        self.ref_ns = 0
+        self.rtt_ns = None
+        self.unanswered = 0      # Requests sent since the last reply
+        self._last_request = 0.0
+
+    @property
+    def synced(self):
+        return self.offset_ns is not None
+
+    def request_interval(self):
+        """Fast until locked, slow once locked, and only an occasional retry while nothing answers"""
+        if self.unanswered >= MAX_UNANSWERED:
+            return RETRY_INTERVAL
+        return self.interval if len(self.samples) >= MIN_SAMPLES else FAST_SYNC_INTERVAL
+
+    def poll(self, master, now=None):
+        """Send a TIMESYNC request if one is due"""
+        now = time.monotonic() if now is None else now
+        if now - self._last_request >= self.request_interval():
+            self._last_request = now
+            self.unanswered += 1
+            master.mav.timesync_send(0, host_ns())
+
+    def handle(self, msg, master=None, now_ns=None):
+        """Feed a received message; TIMESYNC replies update the estimate"""
+        if msg.get_type() != 'TIMESYNC':
+            return
+        now_ns = host_ns() if now_ns is None else now_ns
+        if msg.tc1 == 0:
+            # The vehicle is syncing to us; answer so its estimate is good too
+            if master is not None:
+                master.mav.timesync_send(now_ns, msg.ts1)
+            return
+        rtt = now_ns - msg.ts1
+        if rtt < 0 or rtt > MAX_RTT_NS:
+            return   # Not one of ours, or stale
+        self.unanswered = 0
+        mid = msg.ts1 + rtt // 2
+        self.samples.append((mid, msg.tc1 - mid, rtt))
+        if len(self.samples) > MAX_SAMPLES:
+            self.samples.pop(0)
+        self._fit()
+
+    def _fit(self):
+        # Groups are counted back from the newest sample so the latest one always counts
+        start = len(self.samples) % GROUP_SIZE
+        groups = ([self.samples[:start]] if start else []) + \
+            [self.samples[i:i + GROUP_SIZE] for i in range(start, len(self.samples), GROUP_SIZE)]
+        best = [min(group, key=lambda s: s[2]) for group in groups]
+        if len(best) < MIN_SAMPLES:
+            best = sorted(self.samples, key=lambda s: s[2])[:MIN_SAMPLES]
+        self.rtt_ns = min(s[2] for s in best)
+        ref = best[-1][0] if len(best) == 1 else sum(s[0] for s in best) // len(best)
+        mean_offset = sum(s[1] for s in best) / len(best)
+
+        drift = 0.0
+        spread = sum((s[0] - ref) ** 2 for s in best)
+        if len(best) >= MIN_SAMPLES and spread > 0:
+            drift = sum((s[0] - ref) * (s[1] - mean_offset) for s in best) / spread
+            if abs(drift) > 1e-3:
+                drift = 0.0   # More than 1000 ppm is not a crystal, it is a reboot or a bad sample set
+
+        # A vehicle reboot shows up as a jump far beyond the residuals: start over
+        if self.offset_ns is not None and abs(self.samples[-1][1] - self._offset_at(self.samples[-1][0])) > 1e9:
+            logger.info("Vehicle clock jumped (reboot?), resetting time sync")
+            self.samples = self.samples[-1:]
+            self.offset_ns, self.drift, self.ref_ns = self.samples[0][1], 0.0, self.samples[0][0]
+            return
+
+        self.ref_ns, self.offset_ns, self.drift = ref, mean_offset, drift
+
+    def _offset_at(self, host_time_ns):
+        return self.offset_ns + self.drift * (host_time_ns - self.ref_ns)
+
+    def vehicle_to_host_ns(self, vehicle_ns):
+        """Host monotonic ns at which the vehicle clock read vehicle_ns"""
+        # Solve host + offset(host) = vehicle for host
+        return int((vehicle_ns - self.offset_ns + self.drift * self.ref_ns) / (1.0 + self.drift))
+
+    def host_to_vehicle_ns(self, host_time_ns):
+        return int(host_time_ns + self._offset_at(host_time_ns))
+
+    def unified_time_us(self, msg):
+        """
+        Host epoch microseconds for a message: from its vehicle timestamp
+        when it has one and the clock is synced, else from receive time.
+        """
+        if self.synced:
+            boot_us = None
+            time_boot_ms = getattr(msg, 'time_boot_ms', None)
+            if time_boot_ms is not None:
+                boot_us = time_boot_ms * 1000
+            else:
+                time_usec = getattr(msg, 'time_usec', None)
+                if time_usec is not None and 0 < time_usec < BOOT_TIME_LIMIT_US:
+                    boot_us = time_usec
+            if boot_us is not None:
+                return (self.vehicle_to_host_ns(boot_us * 1000) + _EPOCH_OFFSET_NS) // 1000
+        return receive_time_us(msg)
+
+    def status(self):
+        return {
+            'synced': self.synced,
+            'offset_ms': round(self.offset_ns / 1e6, 3) if self.synced else None,
+            'drift_ppm': round(self.drift * 1e6, 2),
+            'rtt_ms': round(self.rtt_ns / 1e6, 3) if self.rtt_ns is not None else None,
+            'samples': len(self.samples),
+        }
+
+
+def receive_time_us(msg):
+    """Host epoch microseconds at which pymavlink received msg"""
+    stamp = getattr(msg, '_timestamp', None)
+    return int((stamp if stamp else time.time()) * 1e6)
+
+
+class VehicleClocks:
+    """One ClockSync per (sysid, compid); TIMESYNC requests are broadcast and the replies sorted by source"""
+
+    def __init__(self, interval=SYNC_INTERVAL):
+        self.interval = interval
+        self.clocks = {}         # (sysid, compid) -> ClockSync
+        self.unanswered = 0      # Requests sent before any component first replied
+        self._last_request = 0.0
+
+    def clock_for(self, msg):
+        return self.clocks.get((msg.get_srcSystem(), msg.get_srcComponent()))
+
+    def poll(self, master, now=None):
+        """Send a TIMESYNC request if one is due for any component"""
+        now = time.monotonic() if now is None else now
+        if self.clocks:
+            interval = min(clock.request_interval() for clock in self.clocks.values())
+        else:
+            interval = RETRY_INTERVAL if self.unanswered >= MAX_UNANSWERED else FAST_SYNC_INTERVAL
+        if now - self._last_request >= interval:
+            self._last_request = now
+            # One broadcast request is due an answer from every component
+            self.unanswered += 1
+            for clock in self.clocks.values():
+                clock.unanswered += 1
+            master.mav.timesync_send(0, host_ns())
+
+    def handle(self, msg, master=None, now_ns=None):
+        """Feed a received message; a TIMESYNC reply updates its sender's clock"""
+        if msg.get_type() != 'TIMESYNC':
+            return
+        key = (msg.get_srcSystem(), msg.get_srcComponent())
+        clock = self.clocks.get(key)
+        if clock is None:
+            if msg.tc1 == 0:
+                # A request from a component we do not track yet: answer without keeping a clock
+                if master is not None:
+                    master.mav.timesync_send(host_ns() if now_ns is None else now_ns, msg.ts1)
+                return
+            clock = self.clocks[key] = ClockSync(self.interval)
+        clock.handle(msg, master, now_ns)
+
+    def unified_time_us(self, msg):
+        clock = self.clock_for(msg)
+        return clock.unified_time_us(msg) if clock else receive_time_us(msg)
+
+    def status(self):
+        return {f"{sysid}:{compid}": clock.status() for (sysid, compid), clock in sorted(self.clocks.items())}
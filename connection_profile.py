@@ -0,0 +1,236 @@
+"""
+Warm-start connection profiles
+
+Remembers the last good connection for each device (USB serial number,
+else VID:PID, else the connection string): baud rate, MAVLink version,
+target system/component and the AUTOPILOT_VERSION fields. On the next
+start the cached profile is tried first and validated against the first
+HEARTBEAT; full auto-detection only runs when it does not match. The
+cached version is only a hint: ensure_autopilot_version() always asks
+the vehicle and replaces it when the answer differs.
+
+    from connection_profile import open_connection
+    master, profile = open_connection('auto', 57600)
+"""
+
+import os
+import json
+import time
+import logging
+
+from pymavlink import mavutil
+from mavlink_autodetect import candidate_ports, is_serial, resolve_serial
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get('SKYSYNC_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.skysync'))
+PROFILE_FILE = os.path.join(CACHE_DIR, 'connection_profiles.json')
+
+FAST_HEARTBEAT_TIMEOUT = 2  # Seconds to wait on a cached profile before full detection
+HEARTBEAT_TIMEOUT = 5
+
+AUTOPILOT_VERSION_FIELDS = [
+    'capabilities',
+    'flight_sw_version',
+    'middleware_sw_version',
+    'os_sw_version',
+    'board_version',
+    'vendor_id',
+    'product_id',
+    'uid',
+    'flight_custom_version',
+    'middleware_custom_version',
+    'os_custom_version',
+]
+
+
+class ProfileCache:
+    """JSON file of connection profiles keyed by device identity"""
+
+    def __init__(self, path=PROFILE_FILE):
+        self.path = path
+        self.profiles = {}
+        try:
+            with open(path) as f:
+                self.profiles = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key):
+        return self.profiles.get(key)
+
+    def put(self, key, profile):
+        profile['updated'] = time.time()
+        self.profiles[key] = profile
+
+    def save(self):
+        """Write the cache atomically"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.profiles, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save connection profiles: {e}")
+
+
+def device_key(port_info):
+    """Stable identity for a serial port: USB serial number, VID:PID or device path"""
+    if isinstance(port_info, str):
+        matches = [p for p in candidate_ports() if p.device == port_info]
+        if not matches:
+            return port_info
+        port_info = matches[0]
+    if getattr(port_info, 'serial_number', None):
+        return f"usb:{port_info.serial_number}"
+    if getattr(port_info, 'vid', None) is not None:
+        return f"usb:{port_info.vid:04x}:{port_info.pid:04x}"
+    return port_info.device
+
+
+def query_autopilot_version(master, timeout=5):
+    """Request AUTOPILOT_VERSION and return its fields as a dict, or None"""
+    master.mav.command_long_send(
+        master.target_system,
+        master.target_component,
+        mavutil.mavlink.MAV_CMD_REQUEST_AUTOPILOT_CAPABILITIES,
+        0,
+        1, 0, 0, 0, 0, 0, 0
+    )
+    msg = master.recv_match(type='AUTOPILOT_VERSION', blocking=True, timeout=timeout)
+    if not msg:
+        return None
+    version = {}
+    for field in AUTOPILOT_VERSION_FIELDS:
+        value = getattr(msg, field, None)
+        # The *_custom_version fields arrive as byte arrays
+        version[field] = list(value) if isinstance(value, (bytes, bytearray, list)) else value
+    return version
+
+
+def _wait_vehicle_heartbeat(master, timeout):
+    """Wait for the first HEARTBEAT from a vehicle (not another GCS)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        msg = master.recv_match(type='HEARTBEAT', blocking=True,
+                                timeout=max(0.0, deadline - time.monotonic()))
+        if msg and msg.type != mavutil.mavlink.MAV_TYPE_GCS:
+            return msg
+    return None
+
+
+def _profile_from_heartbeat(master, heartbeat, port, baud):
+    return {
+        'port': port,
+        'baud': baud,
+        'mavlink_version': 2 if heartbeat.get_msgbuf()[0] == 0xFD else 1,
+        'target_system': heartbeat.get_srcSystem(),
+        'target_component': heartbeat.get_srcComponent(),
+        'autopilot': heartbeat.autopilot,
+        'vehicle_type': heartbeat.type,
+        'autopilot_version': None,
+    }
+
+
+def _connect(port, baud, profile, timeout, **kwargs):
+    """Open port and wait for a heartbeat; cached target IDs are applied up front"""
+    if is_serial(port):
+        master = mavutil.mavlink_connection(port, baud=baud, **kwargs)
+    else:
+        master = mavutil.mavlink_connection(port, **kwargs)
+    if profile:
+        # Optimistic: commands can be addressed before the first heartbeat
+        master.target_system = profile['target_system']
+        master.target_component = profile['target_component']
+    heartbeat = _wait_vehicle_heartbeat(master, timeout)
+    if heartbeat is None:
+        master.close()
+        return None, None
+    return master, heartbeat
+
+
+def open_connection(connection='auto', baud=None, cache=None, **kwargs):
+    """
+    Connect using the cached profile when it still matches, falling back
+    to auto-detection. Returns (master, profile) or (None, None).
+    """
+    cache = cache or ProfileCache()
+    started = time.monotonic()
+
+    # Fast path: a cached profile for a device that is present right now
+    if is_serial(connection):
+        # A configured port that is not plugged in behaves like 'auto'
+        wanted = connection if os.path.exists(connection) else 'auto'
+        attempts = []
+        for port_info in candidate_ports():
+            key = device_key(port_info)
+            profile = cache.get(key)
+            if profile and wanted in ('auto', port_info.device):
+                attempts.append((key, port_info.device, profile))
+    else:
+        key = connection
+        profile = cache.get(key)
+        attempts = [(key, connection, profile)] if profile else []
+
+    for key, port, profile in attempts:
+        master, heartbeat = _connect(port, profile['baud'], profile, FAST_HEARTBEAT_TIMEOUT, **kwargs)
+        if master is None:
+            logger.info(f"Cached profile for {key} did not answer, running full detection")
+            continue
+        fresh = _profile_from_heartbeat(master, heartbeat, port, profile['baud'])
+        if (fresh['target_system'], fresh['target_component']) == \
+                (profile['target_system'], profile['target_component']):
+            fresh['autopilot_version'] = profile.get('autopilot_version')
+            logger.info(f"Warm start on {port}@{profile['baud']} in {time.monotonic() - started:.2f}s")
+        else:
+            logger.info(f"Vehicle on {port} changed (sysid {profile['target_system']} -> "
+                        f"{fresh['target_system']}), refreshing profile")
+        master.target_system = fresh['target_system']
+        master.target_component = fresh['target_component']
+        cache.put(key, fresh)
+        cache.save()
+        return master, fresh
+
+    # Slow path: full detection
+    port, baud = resolve_serial(connection, baud)
+    if port == 'auto':
+        return None, None
+    key = device_key(port) if is_serial(port) else port
+    master, heartbeat = _connect(port, baud, None, HEARTBEAT_TIMEOUT, **kwargs)
+    if master is None:
+        logger.error(f"No heartbeat on {port}")
+        return None, None
+
+    profile = _profile_from_heartbeat(master, heartbeat, port, baud)
+    logger.info(f"Connected to system {profile['target_system']} on {port}@{baud} "
+                f"in {time.monotonic() - started:.2f}s")
+    cache.put(key, profile)
+    cache.save()
+    return master, profile
+
+
+def ensure_autopilot_version(master, profile, cache=None, fallback=False):
+    """
+    Query the vehicle's AUTOPILOT_VERSION and keep the cached copy in step
+    with it. A cached version that no longer matches (new firmware, or a
+    different board with the same sysid) is replaced. With fallback=True
+    the cached copy is returned when the vehicle does not answer.
+    """
+    cached = profile.get('autopilot_version')
+    version = query_autopilot_version(master)
+    if version is None:
+        if fallback and cached:
+            logger.warning("No AUTOPILOT_VERSION reply, using the cached one")
+            return cached
+        return None
+    if version != cached:
+        if cached:
+            logger.info(f"AUTOPILOT_VERSION changed (uid {cached.get('uid')} -> {version['uid']}), "
+                        f"replacing the cached one")
+        cache = cache or ProfileCache()
+        key = device_key(profile['port']) if is_serial(profile['port']) else profile['port']
+        profile['autopilot_version'] = version
+        cache.put(key, profile)
+        cache.save()
+    return version
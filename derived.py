@@ -0,0 +1,227 @@
+"""
+Derived telemetry computed once at ingest
+
+Values such as ground speed, battery time remaining, height above ground
+and attitude in degrees used to be worked out by every consumer: the
+listener, the history API and each dashboard component. Here each
+derived type is declared once with the source message types it depends
+on, and DerivedTelemetry recomputes a type only when one of its inputs
+arrives. The outputs are published like any other telemetry type
+(listen.py writes params/<TYPE>.json for each), so consumers read the
+result instead of repeating the math.
+
+    derived = DerivedTelemetry()
+    for name, values in derived.add(msg, time_us):   # for every message
+        publish(name, values)
+
+A derivation is a function decorated with @derivation(name, inputs,
+uses): it runs when a message of an `inputs` type arrives, may read the
+latest fresh message of any `uses` type, keeps whatever it needs in its
+own state dict, and returns the output fields or None to publish nothing.
+"""
+
+import math
+
+STALE_S = 3.0               # Inputs older than this are ignored
+RANGE_STALE_S = 1.0         # A rangefinder reading is only trusted this long
+BATTERY_TAU_S = 30.0        # Time constant of the current used for time remaining
+COURSE_MIN_SPEED = 0.5      # m/s; below this the course is held rather than following noise
+
+MAV_SENSOR_ROTATION_PITCH_270 = 25    # DISTANCE_SENSOR facing down
+UINT16_UNKNOWN = 65535
+
+
+class Derivation:
+    def __init__(self, name, inputs, compute, uses=()):
+        self.name = name
+        self.inputs = tuple(inputs)      # Types that trigger a recompute
+        self.uses = tuple(uses)          # Types read when present, without triggering
+        self.compute = compute
+        self.state = {}
+
+
+DERIVATIONS = []
+
+
+def derivation(name, inputs, uses=()):
+    """Register compute(msg, latest, state) -> dict or None as the derived type `name`"""
+    def register(compute):
+        DERIVATIONS.append((name, tuple(inputs), tuple(uses), compute))
+        return compute
+    return register
+
+
+class Latest:
+    """Newest message per watched type, with an age check against the message being processed"""
+
+    def __init__(self):
+        self.messages = {}    # msg_type -> (time_us, msg)
+        self.now_us = 0
+
+    def get(self, msg_type, max_age_s=STALE_S):
+        entry = self.messages.get(msg_type)
+        if entry is None or self.now_us - entry[0] > max_age_s * 1e6:
+            return None
+        return entry[1]
+
+
+def _heading(degrees):
+    return degrees % 360.0
+
+
+@derivation('ATTITUDE_DEG', inputs=('ATTITUDE',))
+def attitude_deg(msg, latest, state):
+    return {
+        'time_boot_ms': msg.time_boot_ms,
+        'roll': math.degrees(msg.roll),
+        'pitch': math.degrees(msg.pitch),
+        'yaw': math.degrees(msg.yaw),
+        'heading': _heading(math.degrees(msg.yaw)),
+        'rollspeed': math.degrees(msg.rollspeed),
+        'pitchspeed': math.degrees(msg.pitchspeed),
+        'yawspeed': math.degrees(msg.yawspeed),
+    }
+
+
+@derivation('GROUND_VELOCITY', inputs=('GLOBAL_POSITION_INT', 'LOCAL_POSITION_NED'))
+def ground_velocity(msg, latest, state):
+    if msg.get_type() == 'GLOBAL_POSITION_INT':
+        vn, ve, vd = msg.vx / 100.0, msg.vy / 100.0, msg.vz / 100.0
+        heading = msg.hdg / 100.0 if msg.hdg != UINT16_UNKNOWN else None
+        source = 'GLOBAL_POSITION_INT'
+    elif latest.get('GLOBAL_POSITION_INT') is None:
+        # LOCAL_POSITION_NED only stands in while there is no global position
+        vn, ve, vd = msg.vx, msg.vy, msg.vz
+        heading = None
+        source = 'LOCAL_POSITION_NED'
+    else:
+        return None
+    speed = math.hypot(vn, ve)
+    if speed >= COURSE_MIN_SPEED or 'course' not in state:
+        state['course'] = _heading(math.degrees(math.atan2(ve, vn)))
+    return {
+        'ground_speed': speed,
+        'course': state['course'],
+        'heading': heading if heading is not None else state['course'],
+        'climb_rate': -vd,
+        'speed_3d': math.sqrt(speed * speed + vd * vd),
+        'source': source,
+    }
+
+
+@derivation('ALTITUDE_AGL', inputs=('RANGEFINDER', 'DISTANCE_SENSOR', 'GLOBAL_POSITION_INT'), uses=('ATTITUDE',))
+def altitude_agl(msg, latest, state):
+    """Height above ground: a fresh downward rangefinder, tilt-corrected, else relative altitude"""
+    distance = None
+    source = None
+    rangefinder = latest.get('RANGEFINDER', RANGE_STALE_S)
+    if rangefinder is not None and rangefinder.distance > 0:
+        distance, source = rangefinder.distance, 'RANGEFINDER'
+    else:
+        sensor = latest.get('DISTANCE_SENSOR', RANGE_STALE_S)
+        if (sensor is not None and sensor.orientation == MAV_SENSOR_ROTATION_PITCH_270
+                and sensor.min_distance <= sensor.current_distance <= sensor.max_distance):
+            distance, source = sensor.current_distance / 100.0, 'DISTANCE_SENSOR'
+
+    position = latest.get('GLOBAL_POSITION_INT')
+    relative_alt = position.relative_alt / 1000.0 if position is not None else None
+    if distance is not None:
+        attitude = latest.get('ATTITUDE', RANGE_STALE_S)
+        tilt = math.cos(attitude.roll) * math.cos(attitude.pitch) if attitude is not None else 1.0
+        altitude = distance * max(tilt, 0.0)
+    elif relative_alt is not None:
+        altitude, source = relative_alt, 'RELATIVE_ALT'
+    else:
+        return None
+    return {
+        'altitude': altitude,
+        'source': source,
+        'rangefinder': distance,
+        'relative_alt': relative_alt,
+    }
+
+
+@derivation('BATTERY_ESTIMATE', inputs=('BATTERY_STATUS',))
+def battery_estimate(msg, latest, state):
+    """Remaining capacity over a low-passed current, so the estimate does not jump with throttle"""
+    time_us = latest.now_us
+    current = msg.current_battery / 100.0 if msg.current_battery >= 0 else None
+    if current is not None:
+        last = state.get('time_us')
+        if last is None or 'current' not in state:
+            state['current'] = current
+        else:
+            alpha = 1.0 - math.exp(-max(time_us - last, 0) / 1e6 / BATTERY_TAU_S)
+            state['current'] += alpha * (current - state['current'])
+        state['time_us'] = time_us
+    smoothed = state.get('current')
+
+    remaining_pct = msg.battery_remaining if msg.battery_remaining >= 0 else None
+    consumed = msg.current_consumed if msg.current_consumed >= 0 else None
+    remaining_mah = None
+    if remaining_pct is not None and consumed and remaining_pct < 100:
+        # consumed is (100 - remaining)% of the pack
+        remaining_mah = consumed * remaining_pct / (100.0 - remaining_pct)
+
+    time_remaining = None
+    if remaining_mah is not None and smoothed and smoothed > 0.1:
+        time_remaining = remaining_mah / (smoothed * 1000.0) * 3600.0
+    elif getattr(msg, 'time_remaining', 0) > 0:
+        time_remaining = float(msg.time_remaining)   # The autopilot's own estimate, 0 when unknown
+    voltages = [v for v in msg.voltages if v != UINT16_UNKNOWN]
+    return {
+        'voltage': sum(voltages) / 1000.0 if voltages else None,
+        'current': current,
+        'current_smoothed': smoothed,
+        'remaining_pct': remaining_pct,
+        'consumed_mah': consumed,
+        'remaining_mah': remaining_mah,
+        'time_remaining_s': time_remaining,
+    }
+
+
+class DerivedTelemetry:
+    """Runs each derivation when one of its input types arrives"""
+
+    def __init__(self, derivations=None):
+        registered = DERIVATIONS if derivations is None else derivations
+        self.derivations = [Derivation(name, inputs, compute, uses) for name, inputs, uses, compute in registered]
+        self.by_input = {}
+        for item in self.derivations:
+            for msg_type in item.inputs:
+                self.by_input.setdefault(msg_type, []).append(item)
+        self.watched = set(self.by_input)
+        for item in self.derivations:
+            self.watched.update(item.uses)
+        self.latest = Latest()
+        self.values = {}      # derived type -> newest output
+
+    def add(self, msg, time_us):
+        """[(derived type, values)] recomputed because of msg; empty if nothing depends on it"""
+        msg_type = msg.get_type()
+        if msg_type not in self.watched:
+            return []
+        self.latest.now_us = time_us
+        self.latest.messages[msg_type] = (time_us, msg)
+        outputs = []
+        for item in self.by_input.get(msg_type, ()):
+            values = item.compute(msg, self.latest, item.state)
+            if values is None:
+                continue
+            values['time_unix_us'] = time_us
+            self.values[item.name] = values
+            outputs.append((item.name, values))
+        return outputs
+
+    def get(self, name, field=None):
+        values = self.values.get(name)
+        if values is None or field is None:
+            return values
+        return values.get(field)
+
+    def route(self, type=None):
+        """HTTP route: every derived type's newest values, or one type's (KeyError -> 404)"""
+        # Copies: the server thread serialises these while add() keeps replacing them
+        if type is None:
+            return dict(self.values)
+        return dict(self.values[type])
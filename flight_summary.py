@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Batch flight summaries for a directory of tlogs
+
+Walks a log directory (MyDrone/logs by default), summarises every .tlog
+in a process pool and prints one line per flight. Each log is read once
+into per-type NumPy columns and the summary is computed with array ops:
+duration and armed time, max altitude and distance from home, battery
+consumed and minimum voltage, attitude extremes, vibration RMS, EKF
+variances and AHRS2-vs-ATTITUDE disagreement, and link-loss periods
+(gaps in the vehicle's heartbeat).
+
+Summaries are cached in ~/.skysync/flights/<sha256 of the log>.json, so
+an unchanged directory comes back from the cache and only new or
+modified logs are read. A stat index (path, size, mtime -> hash) avoids
+re-hashing files that have not been touched.
+
+    python flight_summary.py
+    python flight_summary.py --logs MyDrone/logs --workers 4 --json
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from connection_profile import CACHE_DIR
+from geodetic import LocalTangentPlane
+from tlog import read_tlog
+
+logger = logging.getLogger(__name__)
+
+FLIGHT_CACHE_DIR = os.path.join(CACHE_DIR, 'flights')
+LOG_DIR = os.path.join('MyDrone', 'logs')
+SUMMARY_VERSION = 1          # Bump when the summary changes so cached entries are recomputed
+
+LINK_LOSS_S = 3.0            # Vehicle heartbeat gap that counts as a lost link
+GRAVITY = 9.80665
+MAV_TYPE_GCS = 6
+MAV_AUTOPILOT_INVALID = 8
+MAV_MODE_FLAG_SAFETY_ARMED = 128
+
+# Columns collected per message type; array fields keep their first element
+FIELDS = {
+    'HEARTBEAT': ('base_mode',),
+    'ATTITUDE': ('roll', 'pitch', 'yaw'),
+    'AHRS2': ('roll', 'pitch', 'yaw'),
+    'GLOBAL_POSITION_INT': ('lat', 'lon', 'alt', 'relative_alt'),
+    'HOME_POSITION': ('latitude', 'longitude', 'altitude'),
+    'SYS_STATUS': ('voltage_battery', 'current_battery'),
+    'BATTERY_STATUS': ('current_consumed', 'voltages'),
+    'VIBRATION': ('vibration_x', 'vibration_y', 'vibration_z', 'clipping_0', 'clipping_1', 'clipping_2'),
+    'RAW_IMU': ('xacc', 'yacc', 'zacc'),
+    'EKF_STATUS_REPORT': ('velocity_variance', 'pos_horiz_variance', 'pos_vert_variance', 'compass_variance'),
+}
+
+
+def load_columns(path):
+    """({msg_type: (time_s, values)}, first_s, last_s); values has one column per FIELDS entry"""
+    rows = {msg_type: [] for msg_type in FIELDS}
+    first = last = None
+    for time_us, msg in read_tlog(path):
+        if first is None:
+            first = time_us
+        last = time_us
+        msg_type = msg.get_type()
+        if msg_type not in rows:
+            continue
+        if msg_type == 'HEARTBEAT' and (msg.type == MAV_TYPE_GCS or msg.autopilot == MAV_AUTOPILOT_INVALID):
+            continue  # Only the vehicle's heartbeat says anything about the link
+        values = [getattr(msg, name) for name in FIELDS[msg_type]]
+        rows[msg_type].append([time_us] + [v[0] if isinstance(v, list) else v for v in values])
+    columns = {}
+    for msg_type, data in rows.items():
+        if data:
+            array = np.array(data, dtype=np.float64)
+            columns[msg_type] = (array[:, 0] / 1e6, array[:, 1:])
+    if first is None:
+        return columns, None, None
+    return columns, first / 1e6, last / 1e6
+
+
+def _round(value, digits=2):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def _wrap(angle):
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+def _intervals(mask, t):
+    """[(start_s, end_s)] of runs where mask holds, against sample times t"""
+    if not mask.any():
+        return []
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    return list(zip(t[starts], t[ends]))
+
+
+def position_summary(columns):
+    if 'GLOBAL_POSITION_INT' not in columns:
+        return None
+    t, (lat, lon, alt, rel) = columns['GLOBAL_POSITION_INT'][0], columns['GLOBAL_POSITION_INT'][1].T
+    fix = (lat != 0) | (lon != 0)
+    if not fix.any():
+        return {'max_relative_alt_m': _round(rel.max() / 1000), 'max_distance_m': None}
+    if 'HOME_POSITION' in columns:
+        home_lat, home_lon, home_alt = columns['HOME_POSITION'][1][0]
+    else:
+        first = np.flatnonzero(fix)[0]
+        home_lat, home_lon, home_alt = lat[first], lon[first], alt[first]
+    plane = LocalTangentPlane.from_e7(home_lat, home_lon, home_alt)
+    north, east, _ = plane.to_ned_e7(lat[fix], lon[fix], alt[fix])
+    distance = np.hypot(north, east)
+    return {
+        'max_relative_alt_m': _round(rel.max() / 1000),
+        'max_alt_amsl_m': _round(alt[fix].max() / 1000),
+        'max_distance_m': _round(distance.max()),
+        'max_distance_at_s': _round(t[fix][distance.argmax()] - t[0], 1),
+    }
+
+
+def battery_summary(columns):
+    result = {}
+    if 'SYS_STATUS' in columns:
+        t, (voltage, current) = columns['SYS_STATUS'][0], columns['SYS_STATUS'][1].T
+        valid = (voltage > 0) & (voltage < 65535)
+        if valid.any():
+            result['min_voltage_v'] = _round(voltage[valid].min() / 1000)
+            result['start_voltage_v'] = _round(voltage[valid][0] / 1000)
+        measured = current >= 0  # -1 when the autopilot does not measure current
+        if measured.sum() > 1:
+            # Trapezoidal integral of cA over seconds -> mAh
+            amps, times = current[measured] / 100, t[measured]
+            charge = np.sum((amps[1:] + amps[:-1]) / 2 * np.diff(times))
+            result['consumed_mah'] = _round(charge / 3.6, 0)
+            result['max_current_a'] = _round(current[measured].max() / 100)
+    if 'BATTERY_STATUS' in columns:
+        consumed, voltage = columns['BATTERY_STATUS'][1].T
+        known = consumed >= 0
+        if known.any():
+            # The autopilot's own counter beats integrating SYS_STATUS
+            result['consumed_mah'] = _round(consumed[known][-1] - consumed[known][0], 0)
+        valid = (voltage > 0) & (voltage < 65535)
+        if 'min_voltage_v' not in result and valid.any():
+            result['min_voltage_v'] = _round(voltage[valid].min() / 1000)
+    return result or None
+
+
+def attitude_summary(columns):
+    if 'ATTITUDE' not in columns:
+        return None
+    t, values = columns['ATTITUDE']
+    roll, pitch = np.degrees(values[:, 0]), np.degrees(values[:, 1])
+    rate = np.degrees(np.abs(_wrap(np.diff(values[:, 2])))) / np.maximum(np.diff(t), 1e-3)
+    return {
+        'roll_deg': [_round(roll.min(), 1), _round(roll.max(), 1)],
+        'pitch_deg': [_round(pitch.min(), 1), _round(pitch.max(), 1)],
+        'max_yaw_rate_dps': _round(rate.max(), 1) if len(rate) else None,
+    }
+
+
+def vibration_summary(columns):
+    if 'VIBRATION' in columns:
+        values = columns['VIBRATION'][1]
+        levels = values[:, :3]
+        rms = np.sqrt(np.mean(levels ** 2, axis=0))
+        return {
+            'source': 'VIBRATION',
+            'rms_mss': [_round(v) for v in rms],
+            'max_mss': _round(levels.max()),
+            'clipping': int(values[-1, 3:].sum()),
+        }
+    if 'RAW_IMU' in columns:
+        # No VIBRATION stream: RMS of the accelerometer about its mean (milli-g -> m/s/s)
+        accel = columns['RAW_IMU'][1] * GRAVITY / 1000
+        rms = np.sqrt(np.mean((accel - accel.mean(axis=0)) ** 2, axis=0))
+        return {'source': 'RAW_IMU', 'rms_mss': [_round(v) for v in rms]}
+    return None
+
+
+def estimator_summary(columns):
+    result = {}
+    if 'ATTITUDE' in columns and 'AHRS2' in columns:
+        t, attitude = columns['ATTITUDE']
+        t2, ahrs2 = columns['AHRS2']
+        overlap = (t >= t2[0]) & (t <= t2[-1])
+        if overlap.sum() > 1:
+            diffs = []
+            for axis in range(3):
+                # Unwrap before interpolating so yaw does not sweep through zero at +/-180
+                other = np.interp(t[overlap], t2, np.unwrap(ahrs2[:, axis]))
+                diffs.append(np.degrees(np.abs(_wrap(attitude[overlap, axis] - other))))
+            diffs = np.array(diffs)
+            result['ahrs_disagreement_deg'] = {
+                'max': [_round(v, 1) for v in diffs.max(axis=1)],
+                'rms': [_round(v, 2) for v in np.sqrt(np.mean(diffs ** 2, axis=1))],
+            }
+    if 'EKF_STATUS_REPORT' in columns:
+        peaks = columns['EKF_STATUS_REPORT'][1].max(axis=0)
+        result['ekf_max_variance'] = {name: _round(v, 3) for name, v in zip(FIELDS['EKF_STATUS_REPORT'], peaks)}
+    return result or None
+
+
+def link_summary(columns, start, end):
+    if 'HEARTBEAT' not in columns:
+        return None
+    t, values = columns['HEARTBEAT']
+    # Pad with the log's ends so a link lost at the start or never regained counts too
+    beats = np.concatenate(([start], t, [end]))
+    gaps = np.diff(beats)
+    lost = np.flatnonzero(gaps > LINK_LOSS_S)
+    armed = (values[:, 0].astype(np.int64) & MAV_MODE_FLAG_SAFETY_ARMED) != 0
+    armed_s = sum(b - a for a, b in _intervals(armed, t))
+    return {
+        'link_losses': [[_round(beats[i] - start, 1), _round(gaps[i], 1)] for i in lost],
+        'link_lost_s': _round(gaps[lost].sum(), 1),
+        'armed_s': _round(armed_s, 1),
+    }
+
+
+def summarize(path):
+    """Summary dict for one tlog"""
+    columns, start, end = load_columns(path)
+    return {
+        'version': SUMMARY_VERSION,
+        'path': path,
+        'start_unix': _round(start, 3),
+        'duration_s': _round(end - start, 1) if start is not None else None,
+        'messages': {msg_type: len(values[0]) for msg_type, values in columns.items()},
+        'position': position_summary(columns),
+        'battery': battery_summary(columns),
+        'attitude': attitude_summary(columns),
+        'vibration': vibration_summary(columns),
+        'estimator': estimator_summary(columns),
+        'link': link_summary(columns, start, end) if start is not None else None,
+    }
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class SummaryCache:
+    """Summaries keyed by log content hash, with a stat index so unchanged files are not re-hashed"""
+
+    def __init__(self, directory=FLIGHT_CACHE_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        try:
+            with open(self.index_path) as f:
+                self.index = json.load(f)     # abspath -> [size, mtime_ns, sha256]
+        except (OSError, ValueError):
+            self.index = {}
+        self.dirty = False
+
+    def digest(self, path):
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.index.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = file_digest(path)
+        self.index[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        self.dirty = True
+        return digest
+
+    def path_for(self, digest):
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def load(self, digest):
+        try:
+            with open(self.path_for(digest)) as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return summary if summary.get('version') == SUMMARY_VERSION else None
+
+    def save_index(self):
+        if self.dirty:
+            _write_json(self.index_path, self.index)
+            self.dirty = False
+
+
+def _summarize_to_cache(path, cache_path):
+    """Worker: summarise one log and store it, so finished logs survive an interrupted run"""
+    summary = summarize(path)
+    if cache_path:
+        _write_json(cache_path, summary)
+    return summary
+
+
+def find_logs(root=LOG_DIR):
+    paths = []
+    for directory, _, files in os.walk(root):
+        paths.extend(os.path.join(directory, name) for name in files if name.endswith('.tlog'))
+    return sorted(paths)
+
+
+def analyze_directory(root=LOG_DIR, workers=None, use_cache=True, cache=None):
+    """Summaries for every tlog under root (in path order); only uncached logs are read"""
+    cache = cache or SummaryCache()
+    paths = find_logs(root)
+    results = {}
+    pending = []
+    for path in paths:
+        digest = cache.digest(path) if use_cache else None
+        summary = cache.load(digest) if digest else None
+        if summary is not None:
+            summary['path'] = path  # The same content may have been cached under another name
+            summary['cached'] = True
+            results[path] = summary
+        else:
+            pending.append((path, cache.path_for(digest) if digest else None))
+    cache.save_index()
+
+    if pending:
+        logger.info(f"Summarising {len(pending)} of {len(paths)} logs")
+    if len(pending) == 1:
+        # Not worth a pool's start-up cost
+        path, cache_path = pending[0]
+        results[path] = _summarize_to_cache(path, cache_path)
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_summarize_to_cache, path, cache_path): path for path, cache_path in pending}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to summarise {path}: {e}")
+    return [results[path] for path in paths if path in results]
+
+
+def _format(summary):
+    position = summary.get('position') or {}
+    battery = summary.get('battery') or {}
+    attitude = summary.get('attitude') or {}
+    vibration = summary.get('vibration') or {}
+    estimator = summary.get('estimator') or {}
+    link = summary.get('link') or {}
+
+    def value(v, unit=''):
+        return '-' if v is None else f"{v}{unit}"
+
+    start = summary.get('start_unix')
+    when = time.strftime('%Y-%m-%d %H:%M', time.localtime(start)) if start else '-'
+    disagreement = estimator.get('ahrs_disagreement_deg', {}).get('max')
+    return (f"{summary['path']}\n"
+            f"  {when}  {value(summary.get('duration_s'), ' s')}  {sum(summary.get('messages', {}).values())} msgs"
+            f"  armed {value(link.get('armed_s'), ' s')}\n"
+            f"  alt {value(position.get('max_relative_alt_m'), ' m')}"
+            f"  dist {value(position.get('max_distance_m'), ' m')}"
+            f"  used {value(battery.get('consumed_mah'), ' mAh')}"
+            f"  min {value(battery.get('min_voltage_v'), ' V')}\n"
+            f"  roll {value(attitude.get('roll_deg'))}  pitch {value(attitude.get('pitch_deg'))}"
+            f"  vibe {value(vibration.get('rms_mss'))}  ahrs {value(disagreement)}"
+            f"  link lost {len(link.get('link_losses', []))}x / {value(link.get('link_lost_s'), ' s')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarise every tlog in a log directory')
+    parser.add_argument('--logs', type=str, default=LOG_DIR,
+                        help='Directory to search for .tlog files')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: one per CPU)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the summaries as JSON')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-read every log and leave the cache untouched')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stderr)
+
+    t0 = time.perf_counter()
+    summaries = analyze_directory(args.logs, args.workers, use_cache=not args.no_cache)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        for summary in summaries:
+            print(_format(summary))
+    cached = sum(1 for summary in summaries if summary.get('cached'))
+    logger.info(f"{len(summaries)} logs ({cached} cached) in {time.perf_counter() - t0:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+WGS84 geodetic <-> local NED/ENU conversion
+
+LocalTangentPlane caches an origin (home, or an arena corner) as its
+ECEF position and the ECEF->NED rotation matrix, so converting a batch
+is one subtraction and one matrix product over NumPy arrays. Inputs can
+be scalars or arrays of any shape. The *_e7 methods take and return
+MAVLink integer units (degE7 and millimetres) directly: integers go in
+through one exact scaling and come out through one rint, with no float
+degree strings or repeated round trips in between.
+
+    plane = LocalTangentPlane.cached(lat0, lon0)          # or tangent_plane(msg)
+    n, e, d = plane.to_ned(lats, lons, alts)
+    lat_e7, lon_e7, alt_mm = plane.from_ned_e7(n, e, d)
+"""
+
+import math
+import functools
+
+import numpy as np
+
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+WGS84_EP2 = WGS84_E2 / (1 - WGS84_E2)
+
+DEG_E7 = math.pi / 180 / 1e7    # degE7 -> radians
+
+
+def geodetic_to_ecef(lat_rad, lon_rad, alt):
+    """ECEF (x, y, z) in metres from latitude/longitude in radians and height in metres"""
+    sin_lat = np.sin(lat_rad)
+    cos_lat = np.cos(lat_rad)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat * sin_lat)
+    x = (n + alt) * cos_lat * np.cos(lon_rad)
+    y = (n + alt) * cos_lat * np.sin(lon_rad)
+    z = (n * (1 - WGS84_E2) + alt) * sin_lat
+    return x, y, z
+
+
+def ecef_to_geodetic(x, y, z):
+    """(lat_rad, lon_rad, alt) from ECEF, Bowring's method (sub-millimetre near the surface)"""
+    p = np.hypot(x, y)
+    theta = np.arctan2(z * WGS84_A, p * WGS84_B)
+    sin_t, cos_t = np.sin(theta), np.cos(theta)
+    lat = np.arctan2(z + WGS84_EP2 * WGS84_B * sin_t ** 3, p - WGS84_E2 * WGS84_A * cos_t ** 3)
+    lon = np.arctan2(y, x)
+    sin_lat = np.sin(lat)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_lat * sin_lat)
+    # Near the poles cos(lat) -> 0; use the z form there
+    cos_lat = np.cos(lat)
+    alt = np.where(np.abs(cos_lat) > 1e-6,
+                   p / np.where(np.abs(cos_lat) > 1e-6, cos_lat, 1.0) - n,
+                   np.abs(z) - WGS84_B)
+    return lat, lon, alt
+
+
+class LocalTangentPlane:
+    """NED/ENU around a fixed WGS84 origin"""
+
+    def __init__(self, lat, lon, alt=0.0):
+        self.lat = float(lat)
+        self.lon = float(lon)
+        self.alt = float(alt)
+        lat_r, lon_r = np.radians(self.lat), np.radians(self.lon)
+        self.origin = np.array(geodetic_to_ecef(lat_r, lon_r, self.alt))
+        sl, cl = np.sin(lat_r), np.cos(lat_r)
+        so, co = np.sin(lon_r), np.cos(lon_r)
+        # Rows are the north, east and down unit vectors in ECEF
+        self.ecef_to_ned = np.array([
+            [-sl * co, -sl * so, cl],
+            [-so, co, 0.0],
+            [-cl * co, -cl * so, -sl],
+        ])
+        self.ned_to_ecef = self.ecef_to_ned.T
+        # Plain floats for the single-point path, where NumPy call overhead dominates
+        self._origin_f = tuple(float(v) for v in self.origin)
+        self._rot_f = tuple(tuple(float(v) for v in row) for row in self.ecef_to_ned)
+
+    @classmethod
+    def cached(cls, lat, lon, alt=0.0):
+        """Shared plane for an origin; origins are keyed at degE7 / millimetre resolution"""
+        return _cached_plane(int(round(lat * 1e7)), int(round(lon * 1e7)), int(round(alt * 1000)))
+
+    @classmethod
+    def from_e7(cls, lat_e7, lon_e7, alt_mm=0):
+        return _cached_plane(int(lat_e7), int(lon_e7), int(alt_mm))
+
+    def _to_ned_rad(self, lat_rad, lon_rad, alt):
+        x, y, z = geodetic_to_ecef(lat_rad, lon_rad, alt)
+        delta = np.stack([np.asarray(x) - self.origin[0],
+                          np.asarray(y) - self.origin[1],
+                          np.asarray(z) - self.origin[2]])
+        ned = np.tensordot(self.ecef_to_ned, delta, axes=1)
+        return ned[0], ned[1], ned[2]
+
+    def _from_ned_rad(self, n, e, d):
+        ned = np.stack(np.broadcast_arrays(np.asarray(n, dtype=float), np.asarray(e, dtype=float),
+                                           np.asarray(d, dtype=float)))
+        ecef = np.tensordot(self.ned_to_ecef, ned, axes=1)
+        return ecef_to_geodetic(ecef[0] + self.origin[0], ecef[1] + self.origin[1], ecef[2] + self.origin[2])
+
+    def to_ned(self, lat, lon, alt=None):
+        """(north, east, down) in metres from degrees and metres (alt defaults to the origin's)"""
+        alt = self.alt if alt is None else np.asarray(alt, dtype=float)
+        return self._to_ned_rad(np.radians(lat), np.radians(lon), alt)
+
+    def from_ned(self, n, e, d=0.0):
+        """(lat, lon, alt) in degrees and metres"""
+        lat, lon, alt = self._from_ned_rad(n, e, d)
+        return np.degrees(lat), np.degrees(lon), alt
+
+    def to_enu(self, lat, lon, alt=None):
+        n, e, d = self.to_ned(lat, lon, alt)
+        return e, n, -d
+
+    def from_enu(self, e, n, u=0.0):
+        return self.from_ned(n, e, -np.asarray(u, dtype=float))
+
+    def to_ned_e7(self, lat_e7, lon_e7, alt_mm=None):
+        """NED metres from MAVLink degE7 (and mm) integers"""
+        lat = np.asarray(lat_e7, dtype=np.int64) * DEG_E7
+        lon = np.asarray(lon_e7, dtype=np.int64) * DEG_E7
+        alt = self.alt if alt_mm is None else np.asarray(alt_mm, dtype=np.int64) / 1000.0
+        return self._to_ned_rad(lat, lon, alt)
+
+    def point_to_ned_e7(self, lat_e7, lon_e7, alt_mm=None):
+        """to_ned_e7 for one point with math instead of NumPy (for per-message use)"""
+        lat = lat_e7 * DEG_E7
+        lon = lon_e7 * DEG_E7
+        alt = self.alt if alt_mm is None else alt_mm / 1000.0
+        sin_lat, cos_lat = math.sin(lat), math.cos(lat)
+        n = WGS84_A / math.sqrt(1 - WGS84_E2 * sin_lat * sin_lat)
+        ox, oy, oz = self._origin_f
+        dx = (n + alt) * cos_lat * math.cos(lon) - ox
+        dy = (n + alt) * cos_lat * math.sin(lon) - oy
+        dz = (n * (1 - WGS84_E2) + alt) * sin_lat - oz
+        (a, b, c), (d, e, f), (g, h, i) = self._rot_f
+        return a * dx + b * dy + c * dz, d * dx + e * dy + f * dz, g * dx + h * dy + i * dz
+
+    def from_ned_e7(self, n, e, d=0.0):
+        """(lat_e7, lon_e7, alt_mm) as int32 arrays"""
+        lat, lon, alt = self._from_ned_rad(n, e, d)
+        return (np.rint(lat / DEG_E7).astype(np.int32),
+                np.rint(lon / DEG_E7).astype(np.int32),
+                np.rint(alt * 1000).astype(np.int32))
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_plane(lat_e7, lon_e7, alt_mm):
+    return LocalTangentPlane(lat_e7 / 1e7, lon_e7 / 1e7, alt_mm / 1000.0)
+
+
+def tangent_plane(msg):
+    """Cached plane with its origin at a GLOBAL_POSITION_INT or HOME_POSITION message"""
+    return LocalTangentPlane.from_e7(msg.lat, msg.lon, getattr(msg, 'alt', 0))
@@ -0,0 +1,157 @@
+// Decoder for the binary telemetry frames produced by telemetry_wire.py.
+// Request them with `Accept: application/vnd.skysync.telemetry` over HTTP,
+// or the 'skysync.telemetry.bin' WebSocket subprotocol (binaryType = 'arraybuffer').
+
+export const TELEMETRY_MIME = 'application/vnd.skysync.telemetry';
+export const WS_BINARY = 'skysync.telemetry.bin';
+export const WS_JSON = 'skysync.telemetry.json';
+
+const SCHEMA = 1;
+const ROWS = 2;
+const COLUMNS = 3;
+const HEADER_SIZE = 8;
+
+type FieldCode = 'd' | 'f' | 'b' | 'B' | 'h' | 'H' | 'i' | 'I' | 's';
+type Field = [name: string, code: FieldCode, length: number];
+
+interface WireSchema {
+  id: number;
+  type: string;
+  fields: Field[];
+  size: number;
+}
+
+type RowReader = (view: DataView, offset: number) => Record<string, WireValue>;
+
+export type WireValue = number | string | number[];
+export type WireColumn = Float64Array | Float32Array | Int8Array | Uint8Array | Int16Array
+  | Uint16Array | Int32Array | Uint32Array | string[];
+
+export interface WireBatch {
+  type: string;
+  // ROWS frames (live stream) decode to one object per message
+  rows?: Record<string, WireValue>[];
+  // COLUMNS frames (history) are typed-array views into the buffer; array fields are flattened
+  columns?: Record<string, WireColumn>;
+  count: number;
+}
+
+const SIZES: Record<FieldCode, number> = { d: 8, f: 4, b: 1, B: 1, h: 2, H: 2, i: 4, I: 4, s: 1 };
+
+const ARRAYS = {
+  d: Float64Array, f: Float32Array, b: Int8Array, B: Uint8Array,
+  h: Int16Array, H: Uint16Array, i: Int32Array, I: Uint32Array,
+};
+
+const utf8 = new TextDecoder();
+
+function readString(bytes: Uint8Array): string {
+  const end = bytes.indexOf(0);
+  return utf8.decode(end === -1 ? bytes : bytes.subarray(0, end));
+}
+
+const pad8 = (n: number) => (n + 7) & ~7;
+
+const GETTERS: Record<Exclude<FieldCode, 's'>, string> = {
+  d: 'getFloat64', f: 'getFloat32', b: 'getInt8', B: 'getUint8',
+  h: 'getInt16', H: 'getUint16', i: 'getInt32', I: 'getUint32',
+};
+
+// Specialised reader per schema: one object literal with fixed offsets, so rows
+// decode without per-field dispatch (the same idea as the generated Python encoders)
+function compileRowReader(schema: WireSchema): RowReader {
+  let at = 0;
+  const props: string[] = [];
+  for (const [name, code, length] of schema.fields) {
+    const key = JSON.stringify(name);
+    if (code === 's') {
+      props.push(`${key}: readString(new Uint8Array(view.buffer, view.byteOffset + o + ${at}, ${Math.max(length, 1)}))`);
+      at += Math.max(length, 1);
+    } else if (length) {
+      const items: string[] = [];
+      for (let i = 0; i < length; i++, at += SIZES[code]) {
+        items.push(`view.${GETTERS[code]}(o + ${at}, true)`);
+      }
+      props.push(`${key}: [${items.join(', ')}]`);
+    } else {
+      props.push(`${key}: view.${GETTERS[code]}(o + ${at}, true)`);
+      at += SIZES[code];
+    }
+  }
+  return new Function('readString', `return function (view, o) { return { ${props.join(', ')} }; }`)(readString);
+}
+
+export class TelemetryDecoder {
+  // Schemas are announced once per stream, so keep one decoder per connection
+  private schemas = new Map<number, WireSchema>();
+  private readers = new Map<number, RowReader>();
+
+  decode(buffer: ArrayBuffer): WireBatch[] {
+    const view = new DataView(buffer);
+    const batches: WireBatch[] = [];
+    let offset = 0;
+
+    while (offset < buffer.byteLength) {
+      const kind = view.getUint8(offset);
+      const schemaId = view.getUint16(offset + 2, true);
+      const count = view.getUint32(offset + 4, true);
+      offset += HEADER_SIZE;
+
+      if (kind === SCHEMA) {
+        const schema: WireSchema = JSON.parse(utf8.decode(new Uint8Array(buffer, offset, count)));
+        this.schemas.set(schemaId, schema);
+        this.readers.set(schemaId, compileRowReader(schema));
+        offset += count;
+        continue;
+      }
+
+      const schema = this.schemas.get(schemaId);
+      if (!schema) {
+        throw new Error(`Telemetry frame for unannounced schema ${schemaId}`);
+      }
+
+      if (kind === ROWS) {
+        const read = this.readers.get(schemaId)!;
+        const rows: Record<string, WireValue>[] = new Array(count);
+        for (let r = 0; r < count; r++) {
+          rows[r] = read(view, offset + r * schema.size);
+        }
+        offset += pad8(count * schema.size);
+        batches.push({ type: schema.type, rows, count });
+      } else if (kind === COLUMNS) {
+        const columns: Record<string, WireColumn> = {};
+        for (const [name, code, length] of schema.fields) {
+          if (code === 's') {
+            const width = Math.max(length, 1);
+            const strings: string[] = new Array(count);
+            for (let r = 0; r < count; r++) {
+              strings[r] = readString(new Uint8Array(buffer, offset + r * width, width));
+            }
+            columns[name] = strings;
+            offset += pad8(count * width);
+          } else {
+            const n = count * Math.max(length, 1);
+            columns[name] = new ARRAYS[code](buffer, offset, n);
+            offset += pad8(n * SIZES[code]);
+          }
+        }
+        batches.push({ type: schema.type, columns, count });
+      } else {
+        throw new Error(`Unknown telemetry frame kind ${kind}`);
+      }
+    }
+    return batches;
+  }
+}
+
+// One-shot fetch of an endpoint that may answer in binary (falls back to JSON if the server does not)
+export async function fetchTelemetry(url: string): Promise<WireBatch[] | unknown> {
+  const response = await fetch(url, { headers: { Accept: `${TELEMETRY_MIME}, application/json;q=0.5` } });
+  if (!response.ok) {
+    throw new Error(`Failed to fetch ${url}: ${response.status}`);
+  }
+  if (response.headers.get('Content-Type')?.startsWith(TELEMETRY_MIME)) {
+    return new TelemetryDecoder().decode(await response.arrayBuffer());
+  }
+  return response.json();
+}
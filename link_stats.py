@@ -0,0 +1,215 @@
+"""
+Link health statistics from the MAVLink stream
+
+LinkStats is fed every received message (BAD_DATA included) and keeps
+fixed-size counters: sequence gaps per sysid/compid, CRC failures,
+bytes/s and msgs/s per message type over a sliding window of one-second
+buckets, the latest RADIO_STATUS and a ring of decode-to-handle
+latencies. snapshot() returns them as a LINK_STATS telemetry dict that
+is written next to the other params/*.json files and served by
+start_metrics_server() at /metrics.
+"""
+
+import json
+import time
+import logging
+import threading
+from array import array
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 10     # Rates are averaged over this many one-second buckets
+LATENCY_SAMPLES = 256
+MAX_SOURCES = 32        # sysid/compid pairs tracked
+REORDER_WINDOW = 128    # A forward gap larger than this is a late or repeated packet, not loss
+RADIO_FIELDS = ('rssi', 'remrssi', 'noise', 'remnoise', 'rxerrors', 'fixed', 'txbuf')
+
+
+class SourceCounters:
+    """Sequence tracking for one sysid/compid"""
+
+    __slots__ = ('last_seq', 'received', 'lost', 'reordered')
+
+    def __init__(self):
+        self.last_seq = None
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+
+
+class LinkStats:
+    """Fixed-size link quality counters for one MAVLink connection"""
+
+    def __init__(self, window=WINDOW_SECONDS):
+        self.started = time.monotonic()
+        self.sources = {}
+        self.crc_errors = 0
+        self.bad_data = 0
+        self.total_bytes = 0
+        self.total_msgs = 0
+        self.radio = None
+        self.latency = array('d', bytes(8 * LATENCY_SAMPLES))
+        self.latency_count = 0
+        self._buckets = deque(maxlen=window)   # (second, bytes, msgs, {type: count})
+        self._second = None
+        self._bytes = 0
+        self._msgs = 0
+        self._types = {}
+        self._lock = threading.Lock()
+
+    def _roll(self, second):
+        if self._second is not None:
+            self._buckets.append((self._second, self._bytes, self._msgs, self._types))
+        self._second = second
+        self._bytes = 0
+        self._msgs = 0
+        self._types = {}
+
+    def observe(self, msg, now=None):
+        """Account for one message from recv_match()/recv_msg()"""
+        now = time.time() if now is None else now
+        second = int(now)
+        msg_type = msg.get_type()
+        with self._lock:
+            if second != self._second:
+                self._roll(second)
+
+            if msg_type == 'BAD_DATA':
+                self.bad_data += 1
+                if 'CRC' in str(getattr(msg, 'reason', '')):
+                    self.crc_errors += 1
+                self._bytes += len(msg.data)
+                self.total_bytes += len(msg.data)
+                return
+
+            size = len(msg.get_msgbuf())
+            self._bytes += size
+            self._msgs += 1
+            self.total_bytes += size
+            self.total_msgs += 1
+            self._types[msg_type] = self._types.get(msg_type, 0) + 1
+
+            key = (msg.get_srcSystem(), msg.get_srcComponent())
+            source = self.sources.get(key)
+            if source is None:
+                if len(self.sources) >= MAX_SOURCES:
+                    return
+                source = self.sources[key] = SourceCounters()
+            seq = msg.get_seq()
+            source.received += 1
+            gap = (seq - source.last_seq - 1) & 0xFF if source.last_seq is not None else 0
+            if gap > REORDER_WINDOW:
+                # Behind the newest sequence: arrived late or twice, keep counting from the newest
+                source.reordered += 1
+            else:
+                source.lost += gap
+                source.last_seq = seq
+
+            # pymavlink stamps _timestamp when the frame is decoded
+            stamp = getattr(msg, '_timestamp', None)
+            if stamp:
+                self.latency[self.latency_count % LATENCY_SAMPLES] = now - stamp
+                self.latency_count += 1
+
+            if msg_type == 'RADIO_STATUS':
+                self.radio = {field: getattr(msg, field, None) for field in RADIO_FIELDS}
+
+    def snapshot(self):
+        """Current statistics as a LINK_STATS telemetry dict"""
+        with self._lock:
+            buckets = list(self._buckets)
+            seconds = max(len(buckets), 1)
+            types = {}
+            for _, _, _, counts in buckets:
+                for msg_type, count in counts.items():
+                    types[msg_type] = types.get(msg_type, 0) + count
+
+            sources = {}
+            for (sysid, compid), source in self.sources.items():
+                total = source.received + source.lost
+                sources[f"{sysid}:{compid}"] = {
+                    'received': source.received,
+                    'lost': source.lost,
+                    'reordered': source.reordered,
+                    'loss_pct': round(100.0 * source.lost / total, 2) if total else 0.0,
+                }
+
+            n = min(self.latency_count, LATENCY_SAMPLES)
+            latencies = sorted(self.latency[:n])
+            latency = None
+            if latencies:
+                latency = {
+                    'avg_ms': round(1000 * sum(latencies) / n, 3),
+                    'p95_ms': round(1000 * latencies[min(n - 1, int(n * 0.95))], 3),
+                    'max_ms': round(1000 * latencies[-1], 3),
+                }
+
+            return {
+                'uptime': round(time.monotonic() - self.started, 1),
+                'bytes_per_s': round(sum(b[1] for b in buckets) / seconds, 1),
+                'msgs_per_s': round(sum(b[2] for b in buckets) / seconds, 1),
+                'rates': {msg_type: round(count / seconds, 2) for msg_type, count in sorted(types.items())},
+                'total_bytes': self.total_bytes,
+                'total_msgs': self.total_msgs,
+                'crc_errors': self.crc_errors,
+                'bad_data': self.bad_data,
+                'sources': sources,
+                'radio': self.radio,
+                'latency': latency,
+            }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    routes = {}
+    binary_routes = {}
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/')
+        content_type = 'application/json'
+        route = self.routes.get(path)
+        binary = self.binary_routes.get(path)
+        if binary and binary[0] in (self.headers.get('Accept') or ''):
+            content_type, route = binary
+        if route is None:
+            self.send_error(404)
+            return
+        # Query-string parameters are passed to the route as keyword arguments
+        try:
+            result = route(**dict(parse_qsl(url.query)))
+        except KeyError as e:
+            self.send_error(404, str(e))
+            return
+        except (TypeError, ValueError) as e:
+            self.send_error(400, str(e))
+            return
+        body = result if isinstance(result, bytes) else json.dumps(result).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(stats, port=8787, host='127.0.0.1', routes=None, binary_routes=None):
+    """Serve stats.snapshot() as JSON at /metrics (plus any extra {path: callable}) from a daemon thread
+
+    Query-string parameters become keyword arguments of the callable.
+    binary_routes maps a path to (content type, callable returning bytes),
+    used instead of the JSON route when the request Accepts that type.
+    """
+    all_routes = {'/metrics': stats.snapshot, '/api/metrics': stats.snapshot}
+    all_routes.update(routes or {})
+    handler = type('MetricsHandler', (_MetricsHandler,),
+                   {'routes': all_routes, 'binary_routes': binary_routes or {}})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Link metrics on http://{host}:{port}/metrics")
+    return server
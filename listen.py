@@ -1,51 +1,90 @@
 import json
 import os
-from pymavlink import mavutil
 import time
 import argparse
+import logging
+from time import perf_counter_ns
+from connection_profile import open_connection
+from stream_profiles import PROFILES, StreamManager
+from link_stats import LinkStats, start_metrics_server
+from stage_profiler import StageProfiler
+from clock_sync import VehicleClocks
+from tlog import TlogWriter
+from resampler import DERIVED_SOURCES, SOURCES, Resampler
+from safe_spots import SafeSpotService
+from timeseries import TimeSeriesCache
+from derived import DerivedTelemetry
+import mavlink_json
+import telemetry_wire
 
 parser = argparse.ArgumentParser(description='MAVLink listener with USB and telemetry support')
 parser.add_argument('--connection', type=str, default='/dev/tty.usbmodem01',
-                    help='Connection string (e.g., /dev/tty.usbmodem01 or /dev/tty.usbserial-*)')
+                    help='Connection string (e.g., /dev/tty.usbmodem01, /dev/tty.usbserial-* or auto)')
 parser.add_argument('--baud', type=int, default=115200,
                     help='Baud rate for serial connection')
+parser.add_argument('--profile', type=str, default='dashboard', choices=sorted(PROFILES),
+                    help='Telemetry stream profile to request')
+parser.add_argument('--metrics-port', type=int, default=None,
+                    help='Serve link statistics as JSON on this port')
+parser.add_argument('--metrics-host', type=str, default='127.0.0.1',
+                    help='Address the metrics server binds to (0.0.0.0 exposes it on the network)')
+parser.add_argument('--profile-stages', action='store_true',
+                    help='Time receive/decode/transform/serialise/write (dump with SIGUSR1 or /profile)')
+parser.add_argument('--snapshot-rate', type=float, default=10.0,
+                    help='Rate in Hz of the aligned SNAPSHOT.json used by the history API (0 disables)')
+parser.add_argument('--safe-spots', type=str, default=None,
+                    help='Safe spot JSON (e.g. public/safe-spots-data.json); publishes SAFE_SPOT_STATUS.json')
+parser.add_argument('--series-seconds', type=float, default=300,
+                    help='Seconds of per-field history served at /series on the metrics port (0 disables)')
+parser.add_argument('--no-derived', action='store_true',
+                    help='Do not publish derived types (ATTITUDE_DEG, GROUND_VELOCITY, ALTITUDE_AGL, BATTERY_ESTIMATE)')
+parser.add_argument('--record', type=str, default=None,
+                    help='Record the stream to this .tlog file (receive-time stamped)')
 
 args = parser.parse_args()
 
 PARAMS_DIR = os.path.join('public', 'params')
 os.makedirs(PARAMS_DIR, exist_ok=True)
+LINK_STATS_INTERVAL = 1.0  # Seconds between LINK_STATS.json updates
 
-def create_mavlink_connection(connection_str, baud_rate):
+def write_to_json(data, filename, prof=None):
     try:
-        return mavutil.mavlink_connection(connection_str, baud=baud_rate)
-    except Exception as e:
-        print(f"Failed to establish connection: {e}")
-        return None
-
-def check_heartbeat(master):
-    try:
-        msg = master.wait_heartbeat(timeout=5)
-        return bool(msg)
+        if prof: t0 = perf_counter_ns()
+        text = json.dumps(data)
+        if prof: prof.record('serialise', perf_counter_ns() - t0)
+        write_text(text, filename, prof)
     except Exception:
-        return False
+        pass
 
-def write_to_json(data, filename):
+def write_message(msg, filename, time_us, prof=None):
+    """msg.to_dict() plus time_unix_us, through the generated per-type encoder"""
     try:
-        filepath = os.path.join(PARAMS_DIR, filename)
-        with open(filepath, 'w') as f:
-            json.dump(data, f)
+        if prof: t0 = perf_counter_ns()
+        text = mavlink_json.dumps(msg, time_unix_us=time_us)
+        if prof: prof.record('serialise', perf_counter_ns() - t0)
+        write_text(text, filename, prof)
     except Exception:
         pass
 
-def request_data_streams(master):
-    master.mav.request_data_stream_send(
-        master.target_system, master.target_component,
-        mavutil.mavlink.MAV_DATA_STREAM_ALL,
-        50,  # 50Hz
-        1    # Start
-    )
+def write_text(text, filename, prof=None):
+    if prof: t0 = perf_counter_ns()
+    with open(os.path.join(PARAMS_DIR, filename), 'w') as f:
+        f.write(text)
+    if prof: prof.record('write', perf_counter_ns() - t0)
 
-def monitor_messages(master):
+def reload_safe_spots(spots, path, last_mtime):
+    """Reload the safe spot file when it changes; returns its mtime"""
+    try:
+        mtime = os.path.getmtime(path)
+        if mtime != last_mtime:
+            spots.load(path)
+        return mtime
+    except (OSError, ValueError) as e:
+        print(f"Could not load safe spots from {path}: {e}")
+        return last_mtime
+
+def monitor_messages(master, streams, stats, clock, resampler=None, spots=None, recorder=None, prof=None,
+                     series=None, derived=None):
     message_types = {
         'ATTITUDE': 'ATTITUDE.json',
         'HEARTBEAT': 'HEARTBEAT.json',
@@ -61,30 +100,111 @@ def monitor_messages(master):
         'AHRS2': 'AHRS2.json'
     }
 
+    if prof: t0 = perf_counter_ns()
     msg = master.recv_match(blocking=False)
     if msg:
+        if prof: prof.record_receive(perf_counter_ns() - t0)
+        stats.observe(msg)
+        streams.observe(msg)
+        clock.handle(msg, master)
+        if recorder:
+            recorder.write(msg)
         msg_type = msg.get_type()
+        time_us = clock.unified_time_us(msg)
+        if resampler:
+            resampler.add(msg, time_us)
+        if series:
+            series.add(msg, time_us)
+        outputs = ()
+        if derived:
+            if prof: t1 = perf_counter_ns()
+            outputs = derived.add(msg, time_us)
+            if prof: prof.record('transform', perf_counter_ns() - t1)
         if msg_type in message_types:
-            data = msg.to_dict()
-            if msg_type == 'BATTERY_STATUS' and data['current_battery'] > 0:
-                data['time_remaining'] = int((data['battery_remaining'] / 100.0) * 
-                                           (data['current_consumed'] / data['current_battery']))
-            write_to_json(data, message_types[msg_type])
+            remaining_s = None
+            if msg_type == 'BATTERY_STATUS' and derived:
+                remaining_s = derived.get('BATTERY_ESTIMATE', 'time_remaining_s')
+            if remaining_s is not None:
+                # The dashboard reads time_remaining in minutes; BATTERY_ESTIMATE.json has the detail
+                data = msg.to_dict()
+                data['time_unix_us'] = time_us
+                data['time_remaining'] = int(remaining_s / 60)
+                write_to_json(data, message_types[msg_type], prof)
+            else:
+                write_message(msg, message_types[msg_type], time_us, prof)
+            if spots:
+                status = spots.handle(msg)
+                if status:
+                    write_to_json(status, 'SAFE_SPOT_STATUS.json', prof)
+        for name, values in outputs:
+            write_to_json(values, f'{name}.json', prof)
+            if resampler:
+                resampler.add_values(name, values, time_us)
+        if prof: prof.finish(msg_type)
+    elif prof:
+        prof.take_io()  # Empty polls are not part of any message
 
 def main():
-    master = create_mavlink_connection(args.connection, args.baud)
-    if not master or not check_heartbeat(master):
+    try:
+        master, _ = open_connection(args.connection, args.baud)
+    except Exception as e:
+        print(f"Failed to establish connection: {e}")
+        return
+    if not master:
         return
 
-    request_data_streams(master)
+    streams = StreamManager(master)
+    streams.apply(args.profile)
+    stats = LinkStats()
+    clock = VehicleClocks()
+    spots = SafeSpotService() if args.safe_spots else None
+    spots_mtime = reload_safe_spots(spots, args.safe_spots, None) if spots else None
+    recorder = TlogWriter(args.record) if args.record else None
+    series = TimeSeriesCache(args.series_seconds, PROFILES[args.profile]) if args.series_seconds > 0 else None
+    derived = None if args.no_derived else DerivedTelemetry()
+    resampler = Resampler(args.snapshot_rate, sources=DERIVED_SOURCES if derived else SOURCES) \
+        if args.snapshot_rate > 0 else None
+    prof = StageProfiler.from_env(args.profile_stages)
+    if prof:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        prof.instrument(master)
+        prof.install_signal_handler()
+    if args.metrics_port:
+        routes = {}
+        if prof:
+            routes['/profile'] = prof.snapshot
+        binary_routes = {}
+        if series:
+            routes['/series'] = series.route
+            binary_routes['/series'] = (telemetry_wire.MIME_TYPE, series.route_binary)
+        if derived:
+            routes['/derived'] = derived.route
+        start_metrics_server(stats, args.metrics_port, args.metrics_host, routes=routes, binary_routes=binary_routes)
 
     try:
+        last_stats = time.monotonic()
         while True:
-            monitor_messages(master)
+            clock.poll(master)
+            monitor_messages(master, streams, stats, clock, resampler, spots, recorder, prof, series, derived)
+            if resampler:
+                snapshot = resampler.poll()
+                if snapshot:
+                    write_to_json(snapshot, 'SNAPSHOT.json')
+            if time.monotonic() - last_stats >= LINK_STATS_INTERVAL:
+                last_stats = time.monotonic()
+                if spots:
+                    spots_mtime = reload_safe_spots(spots, args.safe_spots, spots_mtime)
+                link = stats.snapshot()
+                link['clock'] = clock.status()
+                write_to_json(link, 'LINK_STATS.json')
     except KeyboardInterrupt:
         pass
     except Exception as e:
         print(f"Error in main loop: {e}")
+    if recorder:
+        recorder.close()
+    if prof:
+        prof.dump()
 
 if __name__ == "__main__":
     main()
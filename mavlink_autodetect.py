@@ -0,0 +1,219 @@
+"""
+Serial port and baud rate auto-detection for MAVLink links
+
+Opens every candidate serial port at once, reads a short burst at each baud
+rate and scores it by the number of MAVLink v1/v2 frames with a valid CRC.
+The best port/baud wins, usually well under a second.
+
+    from mavlink_autodetect import resolve_serial
+    port, baud = resolve_serial('auto')
+"""
+
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+import serial.tools.list_ports
+from pymavlink import mavutil
+from pymavlink.generator.mavcrc import x25crc
+
+logger = logging.getLogger(__name__)
+
+BAUD_RATES = [57600, 115200, 921600, 38400]  # Common Pixhawk baud rates
+BURST_TIME = 0.15     # Seconds of data read per baud rate
+MIN_FRAMES = 2        # Valid frames needed to accept a baud rate early
+PORT_PATTERNS = ('usbserial', 'usbmodem', 'ttyUSB', 'ttyACM', 'COM')
+
+STX_V1 = 0xFE
+STX_V2 = 0xFD
+SIGNATURE_LEN = 13
+
+
+class DetectedLink:
+    """Result of sniffing one port at one baud rate"""
+
+    def __init__(self, port, baud, score, mavlink_version=None, sysid=None, compid=None,
+                 serial_number=None, vid=None, pid=None):
+        self.port = port
+        self.baud = baud
+        self.score = score
+        self.mavlink_version = mavlink_version
+        self.sysid = sysid
+        self.compid = compid
+        self.serial_number = serial_number
+        self.vid = vid
+        self.pid = pid
+
+    def __repr__(self):
+        return (f"DetectedLink({self.port}@{self.baud}, score={self.score}, "
+                f"v{self.mavlink_version}, sysid={self.sysid})")
+
+
+def scan_frames(data):
+    """
+    Find MAVLink frames with a valid CRC in raw bytes.
+    Returns (frames, crc_errors) where frames is a list of
+    (version, seq, sysid, compid, msgid) tuples.
+    """
+    frames = []
+    crc_errors = 0
+    mavlink_map = mavutil.mavlink.mavlink_map
+    i = 0
+    n = len(data)
+    while i < n - 1:
+        stx = data[i]
+        if stx == STX_V1:
+            header_len = 6
+        elif stx == STX_V2:
+            header_len = 10
+        else:
+            i += 1
+            continue
+
+        payload_len = data[i + 1]
+        end = i + header_len + payload_len + 2
+        if end > n:
+            # A stray start byte near the end; a real frame may still follow it
+            i += 1
+            continue
+        if stx == STX_V1:
+            seq, sysid, compid, msgid = data[i + 2], data[i + 3], data[i + 4], data[i + 5]
+        else:
+            seq, sysid, compid = data[i + 4], data[i + 5], data[i + 6]
+            msgid = data[i + 7] | (data[i + 8] << 8) | (data[i + 9] << 16)
+
+        msg_class = mavlink_map.get(msgid)
+        if msg_class is None:
+            i += 1
+            continue
+        crc = x25crc(data[i + 1:end - 2])
+        crc.accumulate(bytes((msg_class.crc_extra,)))
+        if crc.crc != (data[end - 2] | (data[end - 1] << 8)):
+            crc_errors += 1
+            i += 1
+            continue
+
+        frames.append((1 if stx == STX_V1 else 2, seq, sysid, compid, msgid))
+        if stx == STX_V2 and data[i + 2] & 0x01:
+            end += SIGNATURE_LEN
+        i = end
+    return frames, crc_errors
+
+
+def candidate_ports():
+    """Serial ports that look like a flight controller or telemetry radio"""
+    return [p for p in serial.tools.list_ports.comports()
+            if any(pattern in p.device for pattern in PORT_PATTERNS)]
+
+
+def sniff(port, baud, burst=BURST_TIME):
+    """Read a burst from port at baud and score it; returns a DetectedLink"""
+    data = bytearray()
+    with serial.Serial(port, baud, timeout=0) as ser:
+        ser.reset_input_buffer()
+        deadline = time.monotonic() + burst
+        while time.monotonic() < deadline:
+            chunk = ser.read(ser.in_waiting or 1)
+            if chunk:
+                data += chunk
+            else:
+                time.sleep(0.005)
+
+    frames, _ = scan_frames(bytes(data))
+    link = DetectedLink(port, baud, len(frames))
+    if frames:
+        link.mavlink_version = max(f[0] for f in frames)
+        # Prefer the autopilot's heartbeat for the vehicle identity
+        heartbeats = [f for f in frames if f[4] == 0] or frames
+        link.sysid, link.compid = heartbeats[0][2], heartbeats[0][3]
+    return link
+
+
+def probe_port(port_info, bauds=BAUD_RATES, burst=BURST_TIME):
+    """Try each baud rate on one port and return its best DetectedLink"""
+    best = None
+    port = getattr(port_info, 'device', port_info)
+    for baud in bauds:
+        try:
+            link = sniff(port, baud, burst)
+        except (serial.SerialException, OSError) as e:
+            logger.debug(f"Cannot open {port}: {e}")
+            return best
+        logger.debug(f"{port}@{baud}: {link.score} valid frames")
+        if best is None or link.score > best.score:
+            best = link
+        if link.score >= MIN_FRAMES:
+            break
+
+    if best is not None:
+        best.serial_number = getattr(port_info, 'serial_number', None)
+        best.vid = getattr(port_info, 'vid', None)
+        best.pid = getattr(port_info, 'pid', None)
+    return best
+
+
+def autodetect(ports=None, bauds=BAUD_RATES, burst=BURST_TIME):
+    """Sniff all candidate ports concurrently; returns the best DetectedLink or None"""
+    if ports is None:
+        ports = candidate_ports()
+    if not ports:
+        logger.info("No candidate serial ports found")
+        return None
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        links = [link for link in pool.map(lambda p: probe_port(p, bauds, burst), ports) if link]
+
+    links = [link for link in links if link.score > 0]
+    if not links:
+        logger.info(f"No MAVLink traffic found on {len(ports)} port(s)")
+        return None
+    best = max(links, key=lambda link: link.score)
+    logger.info(f"Detected {best} in {time.monotonic() - started:.2f}s")
+    return best
+
+
+def is_serial(connection):
+    """True for serial device strings, False for udp:/tcp: and other URLs"""
+    return ':' not in connection or connection.startswith('/dev/')
+
+
+def resolve_serial(port='auto', baud=None, bauds=BAUD_RATES):
+    """
+    Return (port, baud) to connect with. 'auto', or a serial port that
+    is not present, is replaced by the auto-detected link; network
+    connection strings are returned unchanged.
+    """
+    if not is_serial(port):
+        return port, baud
+    if port != 'auto' and os.path.exists(port) and baud is not None:
+        return port, baud
+
+    if baud is not None:
+        bauds = [baud] + [b for b in bauds if b != baud]
+    link = autodetect(bauds=bauds)
+    if link is None:
+        logger.warning(f"Auto-detection failed, falling back to {port}@{baud}")
+        return port, baud
+    return link.port, link.baud
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect the MAVLink serial port and baud rate')
+    parser.add_argument('--burst', type=float, default=BURST_TIME,
+                        help='Seconds to listen at each baud rate')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    link = autodetect(burst=args.burst)
+    if link:
+        print(f"{link.port} {link.baud} (MAVLink v{link.mavlink_version}, sysid {link.sysid})")
+    else:
+        print("No MAVLink device found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,650 @@
+"""
+MAVLink FTP client for bulk parameter and log download
+
+Reads files with BurstReadFile and reassembles the chunks by offset into a
+preallocated buffer, so lost or reordered packets only cost a re-request
+of the gaps. Partial downloads are kept next to the destination
+(<file>.part plus <file>.part.json) and resumed on the next run.
+
+On top of the engine:
+  - fetch_params() reads @PARAM/param.pck (ArduPilot) and decodes it
+  - download_log() lists /APM/LOGS and downloads a dataflash log
+
+FTPResponder is a local stand-in for the autopilot side, so everything
+here can be exercised without hardware:
+
+    python3 mavlink_ftp.py --simulate params
+    python3 mavlink_ftp.py --connection auto logs
+    python3 mavlink_ftp.py --connection auto log
+"""
+
+import os
+import json
+import time
+import random
+import struct
+import logging
+import argparse
+import threading
+
+from pymavlink import mavutil
+
+logger = logging.getLogger(__name__)
+
+# Opcodes
+OP_NONE = 0
+OP_TERMINATE_SESSION = 1
+OP_RESET_SESSIONS = 2
+OP_LIST_DIRECTORY = 3
+OP_OPEN_FILE_RO = 4
+OP_READ_FILE = 5
+OP_BURST_READ_FILE = 15
+OP_ACK = 128
+OP_NAK = 129
+
+# NAK error codes
+ERR_FAIL = 1
+ERR_FAIL_ERRNO = 2
+ERR_INVALID_SESSION = 4
+ERR_NO_SESSIONS = 5
+ERR_EOF = 6
+ERR_UNKNOWN_COMMAND = 7
+ERR_FILE_NOT_FOUND = 10
+
+HEADER = struct.Struct('<HBBBBBxI')
+PAYLOAD_LEN = 251
+MAX_DATA = PAYLOAD_LEN - HEADER.size   # 239 bytes per packet
+
+REPLY_TIMEOUT = 1.0
+BURST_IDLE_TIMEOUT = 0.3   # Gap in a burst after which the rest is treated as lost
+MAX_RETRIES = 5
+
+PARAM_FILE = '@PARAM/param.pck'
+LOG_DIR = '/APM/LOGS'
+
+PCK_MAGIC = 0x671B
+PCK_MAGIC_DEFAULTS = 0x671C
+PCK_TYPES = {
+    1: ('b', mavutil.mavlink.MAV_PARAM_TYPE_INT8),
+    2: ('h', mavutil.mavlink.MAV_PARAM_TYPE_INT16),
+    3: ('i', mavutil.mavlink.MAV_PARAM_TYPE_INT32),
+    4: ('f', mavutil.mavlink.MAV_PARAM_TYPE_REAL32),
+}
+
+
+class FTPError(Exception):
+    """NAK or timeout from the FTP server"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class FTPPacket:
+    """Decoded FILE_TRANSFER_PROTOCOL payload"""
+
+    __slots__ = ('seq', 'session', 'opcode', 'size', 'req_opcode', 'burst_complete', 'offset', 'data')
+
+    def __init__(self, seq=0, session=0, opcode=OP_NONE, size=0, req_opcode=OP_NONE,
+                 burst_complete=0, offset=0, data=b''):
+        self.seq = seq
+        self.session = session
+        self.opcode = opcode
+        self.size = size
+        self.req_opcode = req_opcode
+        self.burst_complete = burst_complete
+        self.offset = offset
+        self.data = data
+
+    def pack(self):
+        payload = HEADER.pack(self.seq, self.session, self.opcode, self.size, self.req_opcode,
+                              self.burst_complete, self.offset) + self.data
+        return payload.ljust(PAYLOAD_LEN, b'\x00')
+
+    @classmethod
+    def unpack(cls, payload):
+        payload = bytes(payload)
+        seq, session, opcode, size, req_opcode, burst_complete, offset = HEADER.unpack_from(payload)
+        data = payload[HEADER.size:HEADER.size + size]
+        return cls(seq, session, opcode, size, req_opcode, burst_complete, offset, data)
+
+    @property
+    def error(self):
+        return self.data[0] if self.opcode == OP_NAK and self.data else None
+
+
+class RangeSet:
+    """Sorted, merged [start, end) byte ranges that have been received"""
+
+    def __init__(self, ranges=None):
+        self.ranges = []
+        for start, end in ranges or []:
+            self.add(start, end)
+
+    def add(self, start, end):
+        merged = []
+        for s, e in self.ranges:
+            if e < start or s > end:
+                merged.append((s, e))
+            else:
+                start, end = min(s, start), max(e, end)
+        merged.append((start, end))
+        merged.sort()
+        self.ranges = merged
+
+    def covered(self):
+        return sum(e - s for s, e in self.ranges)
+
+    def contains(self, start, end):
+        return any(s <= start and end <= e for s, e in self.ranges)
+
+    def gaps(self, size):
+        """Missing [start, end) ranges below size"""
+        result = []
+        position = 0
+        for s, e in self.ranges:
+            if s > position:
+                result.append((position, min(s, size)))
+            position = max(position, e)
+        if position < size:
+            result.append((position, size))
+        return result
+
+
+class Transfer:
+    """Download state: preallocated buffer plus the ranges filled so far"""
+
+    def __init__(self, remote_path, size):
+        self.remote_path = remote_path
+        self.size = size
+        self.buffer = bytearray(size)
+        self.received = RangeSet()
+
+    def write(self, offset, data):
+        end = min(offset + len(data), self.size)
+        if offset >= end:
+            return
+        self.buffer[offset:end] = data[:end - offset]
+        self.received.add(offset, end)
+
+    def gaps(self):
+        return self.received.gaps(self.size)
+
+    def complete(self):
+        return not self.gaps()
+
+    def save_partial(self, local_path):
+        """Keep what we have so a later run can resume"""
+        with open(local_path + '.part', 'wb') as f:
+            f.write(self.buffer)
+        with open(local_path + '.part.json', 'w') as f:
+            json.dump({'remote_path': self.remote_path, 'size': self.size,
+                       'ranges': self.received.ranges}, f)
+
+    @classmethod
+    def load_partial(cls, local_path, remote_path, size):
+        """Resume state for local_path, or None if absent or for a different file"""
+        try:
+            with open(local_path + '.part.json') as f:
+                meta = json.load(f)
+            with open(local_path + '.part', 'rb') as f:
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get('remote_path') != remote_path or meta.get('size') != size or len(data) != size:
+            return None
+        transfer = cls(remote_path, size)
+        transfer.buffer[:] = data
+        transfer.received = RangeSet(meta.get('ranges'))
+        return transfer
+
+    @staticmethod
+    def discard_partial(local_path):
+        for suffix in ('.part', '.part.json'):
+            try:
+                os.remove(local_path + suffix)
+            except OSError:
+                pass
+
+
+class FTPClient:
+    """MAVLink FTP over an open mavutil connection"""
+
+    def __init__(self, master, target_system=None, target_component=None, timeout=REPLY_TIMEOUT,
+                 retries=MAX_RETRIES):
+        self.master = master
+        self.target_system = master.target_system if target_system is None else target_system
+        self.target_component = master.target_component if target_component is None else target_component
+        self.timeout = timeout
+        self.retries = retries
+        self.seq = 0
+        self.bytes_received = 0
+        self.re_requests = 0
+        self.transfer = None   # Download in progress, for late burst packets
+
+    def _send(self, opcode, session=0, offset=0, data=b'', size=None):
+        self.seq = (self.seq + 1) & 0xFFFF
+        packet = FTPPacket(self.seq, session, opcode, len(data) if size is None else size,
+                           offset=offset, data=data)
+        self.master.mav.file_transfer_protocol_send(
+            0, self.target_system, self.target_component, list(packet.pack()))
+        return self.seq
+
+    def _recv(self, timeout):
+        """Next FTP reply addressed to us, or None"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            msg = self.master.recv_match(type='FILE_TRANSFER_PROTOCOL', blocking=True, timeout=remaining)
+            if msg is None:
+                return None
+            if msg.target_system not in (0, self.master.source_system):
+                continue
+            return FTPPacket.unpack(msg.payload)
+
+    def _request(self, opcode, session=0, offset=0, data=b'', size=None):
+        """Send a request and wait for its ACK, retrying on timeout; NAKs raise FTPError"""
+        for _ in range(self.retries):
+            seq = self._send(opcode, session, offset, data, size)
+            deadline = time.monotonic() + self.timeout
+            while time.monotonic() < deadline:
+                reply = self._recv(deadline - time.monotonic())
+                if reply is None:
+                    break
+                if reply.req_opcode == OP_BURST_READ_FILE and reply.opcode == OP_ACK and self.transfer:
+                    # Late packet from the last burst: still good data
+                    self._store(reply)
+                    continue
+                # Replies to earlier retries are skipped
+                if reply.req_opcode != opcode or reply.seq != ((seq + 1) & 0xFFFF):
+                    continue
+                if reply.opcode == OP_NAK:
+                    raise FTPError(f"FTP opcode {opcode} failed with error {reply.error}", reply.error)
+                return reply
+        raise FTPError(f"No reply to FTP opcode {opcode}")
+
+    def reset_sessions(self):
+        self._request(OP_RESET_SESSIONS)
+
+    def terminate(self, session):
+        try:
+            self._request(OP_TERMINATE_SESSION, session)
+        except FTPError as e:
+            logger.debug(f"Terminate session {session}: {e}")
+
+    def open_read(self, path):
+        """Open path read-only; returns (session, size)"""
+        reply = self._request(OP_OPEN_FILE_RO, data=path.encode('ascii'))
+        size = struct.unpack('<I', reply.data[:4])[0] if len(reply.data) >= 4 else 0
+        return reply.session, size
+
+    def list_dir(self, path):
+        """Return [(kind, name, size)] where kind is 'F' or 'D'"""
+        entries = []
+        while True:
+            try:
+                reply = self._request(OP_LIST_DIRECTORY, offset=len(entries), data=path.encode('ascii'))
+            except FTPError as e:
+                if e.code == ERR_EOF:
+                    return entries
+                raise
+            names = [n for n in reply.data.decode('ascii', errors='ignore').split('\x00') if n]
+            if not names:
+                return entries
+            for entry in names:
+                kind, rest = entry[0], entry[1:]
+                if kind == 'F':
+                    name, _, size = rest.partition('\t')
+                    entries.append(('F', name, int(size or 0)))
+                elif kind == 'D':
+                    entries.append(('D', rest, 0))
+                else:
+                    # Skipped entries still count towards the offset
+                    entries.append(('S', rest, 0))
+
+    def _burst(self, session, offset):
+        """Burst-read from offset into the current transfer; returns True once the server reports EOF"""
+        self._send(OP_BURST_READ_FILE, session, offset, size=MAX_DATA)
+        first = True
+        while True:
+            reply = self._recv(self.timeout if first else BURST_IDLE_TIMEOUT)
+            if reply is None:
+                return False
+            if reply.req_opcode != OP_BURST_READ_FILE or reply.session != session:
+                continue
+            # Late packets from an earlier burst carry their own offset and are kept too
+            first = False
+            if reply.opcode == OP_NAK:
+                if reply.error == ERR_EOF:
+                    return True
+                raise FTPError(f"Burst read failed with error {reply.error}", reply.error)
+            self._store(reply)
+            if reply.burst_complete:
+                return reply.offset + len(reply.data) >= self.transfer.size
+
+    def _store(self, reply):
+        self.transfer.write(reply.offset, reply.data)
+        self.bytes_received += len(reply.data)
+
+    def _read_chunk(self, session, offset, length):
+        self._store(self._request(OP_READ_FILE, session, offset, size=min(length, MAX_DATA)))
+
+    def read_file(self, path, local_path=None, progress=None):
+        """
+        Download path and return its bytes. With local_path the file is
+        also written there, and an interrupted download resumes from its
+        .part file.
+        """
+        session, size = self.open_read(path)
+        transfer = Transfer.load_partial(local_path, path, size) if local_path else None
+        if transfer:
+            logger.info(f"Resuming {path} with {transfer.received.covered()}/{size} bytes")
+        else:
+            transfer = Transfer(path, size)
+
+        started = time.monotonic()
+        self.bytes_received = 0
+        self.re_requests = 0
+        self.transfer = transfer
+        try:
+            stalls = 0
+            while not transfer.complete():
+                before = transfer.received.covered()
+                gaps = transfer.gaps()
+                start, end = gaps[0]
+                if end - start > 2 * MAX_DATA:
+                    self._burst(session, start)
+                else:
+                    # Small holes left by lost burst packets: re-request just those
+                    for start, end in gaps:
+                        if end - start > 2 * MAX_DATA:
+                            break
+                        for offset in range(start, end, MAX_DATA):
+                            # A late burst packet may have filled it meanwhile
+                            if not transfer.received.contains(offset, min(end, offset + MAX_DATA)):
+                                self.re_requests += 1
+                                self._read_chunk(session, offset, end - offset)
+                if progress:
+                    progress(transfer.received.covered(), size)
+                if transfer.received.covered() == before:
+                    stalls += 1
+                    if stalls >= self.retries:
+                        raise FTPError(f"Download of {path} stalled at {before}/{size} bytes")
+                else:
+                    stalls = 0
+        except (FTPError, KeyboardInterrupt):
+            if local_path:
+                transfer.save_partial(local_path)
+                logger.info(f"Saved partial download of {path} for resume")
+            raise
+        finally:
+            self.transfer = None
+            self.terminate(session)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Read {path}: {size} bytes in {elapsed:.2f}s "
+                    f"({self.bytes_received / max(elapsed, 1e-6) / 1024:.1f} KiB/s, "
+                    f"{self.re_requests} gap re-requests)")
+        if local_path:
+            with open(local_path, 'wb') as f:
+                f.write(transfer.buffer)
+            Transfer.discard_partial(local_path)
+        return bytes(transfer.buffer)
+
+
+def decode_param_pck(data):
+    """
+    Decode ArduPilot's packed parameter file into
+    {name: (value, mav_param_type, default_or_None)} in file order.
+    """
+    if len(data) < 6:
+        raise ValueError("param.pck too short")
+    magic, num_params, total_params = struct.unpack_from('<HHH', data)
+    if magic not in (PCK_MAGIC, PCK_MAGIC_DEFAULTS):
+        raise ValueError(f"Bad param.pck magic 0x{magic:04x}")
+    with_defaults = magic == PCK_MAGIC_DEFAULTS
+
+    params = {}
+    last_name = b''
+    i = 6
+    n = len(data)
+    while i < n:
+        if data[i] == 0:
+            i += 1   # Padding so a record never crosses a 512 byte block
+            continue
+        type_flags, lengths = data[i], data[i + 1]
+        if (type_flags & 0x0F) not in PCK_TYPES:
+            raise ValueError(f"Bad param.pck type {type_flags & 0x0F} at byte {i}")
+        type_format, param_type = PCK_TYPES[type_flags & 0x0F]
+        has_default = with_defaults and (type_flags >> 4) & 0x01
+        common_len = lengths & 0x0F
+        name_len = (lengths >> 4) + 1
+        i += 2
+        name = last_name[:common_len] + data[i:i + name_len]
+        i += name_len
+        value_size = struct.calcsize(type_format)
+        value = struct.unpack_from('<' + type_format, data, i)[0]
+        i += value_size
+        default = None
+        if has_default:
+            default = struct.unpack_from('<' + type_format, data, i)[0]
+            i += value_size
+        params[name.decode('ascii')] = (value, param_type, default)
+        last_name = name
+
+    if len(params) != num_params:
+        raise ValueError(f"param.pck holds {len(params)} parameters, header says {num_params}")
+    return params
+
+
+def encode_param_pck(params):
+    """Pack {name: value} the way ArduPilot does (used by the stand-in responder)"""
+    out = bytearray(struct.pack('<HHH', PCK_MAGIC, len(params), len(params)))
+    last_name = b''
+    for name, value in params.items():
+        name = name.encode('ascii')
+        if float(value).is_integer() and -128 <= value < 128:
+            type_id = 1
+        elif float(value).is_integer() and -32768 <= value < 32768:
+            type_id = 2
+        elif float(value).is_integer() and -2**31 <= value < 2**31:
+            type_id = 3
+        else:
+            type_id = 4
+        type_format = PCK_TYPES[type_id][0]
+        common = 0
+        while common < min(len(name) - 1, len(last_name), 15) and name[common] == last_name[common]:
+            common += 1
+        suffix = name[common:]
+        record = bytes((type_id, ((len(suffix) - 1) << 4) | common)) + suffix + \
+            struct.pack('<' + type_format, int(value) if type_id != 4 else value)
+        if len(out) // 512 != (len(out) + len(record) - 1) // 512:
+            out += bytes(512 - len(out) % 512)
+        out += record
+        last_name = name
+    return bytes(out)
+
+
+def fetch_params(client):
+    """Bulk-read all parameters over FTP; returns decode_param_pck() output"""
+    return decode_param_pck(client.read_file(PARAM_FILE))
+
+
+def download_log(client, name=None, dest_dir='.', progress=None):
+    """Download a dataflash log from /APM/LOGS (the newest if name is None); returns the local path"""
+    logs = [(n, size) for kind, n, size in client.list_dir(LOG_DIR) if kind == 'F' and n.upper().endswith('.BIN')]
+    if not logs:
+        raise FTPError(f"No logs in {LOG_DIR}")
+    if name is None:
+        name = max(logs)[0]
+    local_path = os.path.join(dest_dir, name)
+    client.read_file(f"{LOG_DIR}/{name}", local_path, progress)
+    return local_path
+
+
+class FTPResponder:
+    """
+    Minimal autopilot-side FTP server over in-memory files. Drops and
+    reorders burst packets on request so the client's recovery paths run.
+    """
+
+    BURST_PACKETS = 64
+
+    def __init__(self, files, drop_rate=0.0, reorder=False, seed=None):
+        self.files = files
+        self.drop_rate = drop_rate
+        self.reorder = reorder
+        self.random = random.Random(seed)
+        self.sessions = {}
+        self.next_session = 0
+
+    def _reply(self, request, opcode=OP_ACK, data=b'', offset=None, session=None, burst_complete=0, seq=None):
+        return FTPPacket((request.seq + 1 if seq is None else seq) & 0xFFFF,
+                         request.session if session is None else session,
+                         opcode, len(data), request.opcode, burst_complete,
+                         request.offset if offset is None else offset, data)
+
+    def _nak(self, request, error):
+        return self._reply(request, OP_NAK, bytes((error,)))
+
+    def _list(self, request):
+        path = request.data.decode('ascii').rstrip('/')
+        names = sorted(name for name in self.files if name.rsplit('/', 1)[0] == path)
+        entries = names[request.offset:]
+        if not entries:
+            return self._nak(request, ERR_EOF)
+        data = b''
+        for name in entries:
+            entry = f"F{name.rsplit('/', 1)[1]}\t{len(self.files[name])}\x00".encode('ascii')
+            if len(data) + len(entry) > MAX_DATA:
+                break
+            data += entry
+        return self._reply(request, data=data)
+
+    def handle(self, request):
+        """Return the list of reply packets for one request packet"""
+        op = request.opcode
+        if op == OP_RESET_SESSIONS:
+            self.sessions.clear()
+            return [self._reply(request)]
+        if op == OP_TERMINATE_SESSION:
+            self.sessions.pop(request.session, None)
+            return [self._reply(request)]
+        if op == OP_LIST_DIRECTORY:
+            return [self._list(request)]
+        if op == OP_OPEN_FILE_RO:
+            path = request.data.decode('ascii')
+            if path not in self.files:
+                return [self._nak(request, ERR_FILE_NOT_FOUND)]
+            session = self.next_session
+            self.next_session = (self.next_session + 1) & 0xFF
+            self.sessions[session] = self.files[path]
+            return [self._reply(request, data=struct.pack('<I', len(self.files[path])), session=session)]
+        if op in (OP_READ_FILE, OP_BURST_READ_FILE):
+            content = self.sessions.get(request.session)
+            if content is None:
+                return [self._nak(request, ERR_INVALID_SESSION)]
+            if request.offset >= len(content):
+                return [self._nak(request, ERR_EOF)]
+            if op == OP_READ_FILE:
+                return [self._reply(request, data=content[request.offset:request.offset + request.size])]
+            replies = []
+            offset = request.offset
+            for i in range(self.BURST_PACKETS):
+                if offset >= len(content):
+                    break
+                chunk = content[offset:offset + MAX_DATA]
+                last = i == self.BURST_PACKETS - 1 or offset + len(chunk) >= len(content)
+                replies.append(self._reply(request, data=chunk, offset=offset,
+                                           burst_complete=int(last), seq=request.seq + 1 + i))
+                offset += len(chunk)
+            if self.reorder:
+                self.random.shuffle(replies)
+            # The last packet carries burst_complete; lose it too sometimes
+            return [r for r in replies if self.random.random() >= self.drop_rate]
+        return [self._nak(request, ERR_UNKNOWN_COMMAND)]
+
+    def serve(self, connection, stop_event):
+        """Answer FTP requests arriving on a mavutil connection until stop_event is set"""
+        while not stop_event.is_set():
+            msg = connection.recv_match(type='FILE_TRANSFER_PROTOCOL', blocking=True, timeout=0.1)
+            if msg is None:
+                continue
+            for reply in self.handle(FTPPacket.unpack(msg.payload)):
+                connection.mav.file_transfer_protocol_send(
+                    0, msg.get_srcSystem(), msg.get_srcComponent(), list(reply.pack()))
+
+
+def start_simulator(port=14590, parm_file='mav.parm', log_size=2 * 1024 * 1024, drop_rate=0.05):
+    """Run an FTPResponder on UDP loopback; returns (client connection string, stop event)"""
+    from param_upload import read_parm_file
+
+    files = {LOG_DIR + '/00000001.BIN': os.urandom(log_size)}
+    if os.path.exists(parm_file):
+        files[PARAM_FILE] = encode_param_pck(read_parm_file(parm_file))
+    responder = FTPResponder(files, drop_rate=drop_rate, reorder=True)
+    connection = mavutil.mavlink_connection(f'udpin:127.0.0.1:{port}', source_system=1, source_component=1)
+    stop_event = threading.Event()
+    threading.Thread(target=responder.serve, args=(connection, stop_event), daemon=True).start()
+    return f'udpout:127.0.0.1:{port}', stop_event
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MAVLink FTP parameter and log download')
+    parser.add_argument('--connection', type=str, default='auto',
+                        help='Connection string (e.g., /dev/tty.usbserial-*, udpin:localhost:14551 or auto)')
+    parser.add_argument('--baud', type=int, default=57600,
+                        help='Baud rate for serial connection')
+    parser.add_argument('--simulate', action='store_true',
+                        help='Talk to a local stand-in FTP server instead of a vehicle')
+    parser.add_argument('command', choices=['params', 'logs', 'log'],
+                        help='params: bulk parameter read, logs: list logs, log: download a log')
+    parser.add_argument('--name', type=str, default=None,
+                        help='Log file name for "log" (default: newest)')
+    parser.add_argument('--dest', type=str, default='.',
+                        help='Directory to save logs in')
+    parser.add_argument('--save', type=str, default=None,
+                        help='Write fetched parameters to a .parm file')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.simulate:
+        connection, stop_event = start_simulator()
+        master = mavutil.mavlink_connection(connection, source_system=255)
+        master.target_system, master.target_component = 1, 1
+    else:
+        from connection_profile import open_connection
+        master, _ = open_connection(args.connection, args.baud)
+        if not master:
+            print("Failed to connect")
+            return
+
+    client = FTPClient(master)
+    try:
+        if args.command == 'params':
+            started = time.monotonic()
+            params = fetch_params(client)
+            print(f"Fetched {len(params)} parameters in {time.monotonic() - started:.2f}s")
+            if args.save:
+                from param_cache import ParamCache
+                cache = ParamCache(master.target_system, 'ftp')
+                cache.update_from_pck(params)
+                cache.write_parm_file(args.save)
+        elif args.command == 'logs':
+            for kind, name, size in client.list_dir(LOG_DIR):
+                if kind == 'F':
+                    print(f"{name:<16} {size:>10}")
+        else:
+            path = download_log(client, args.name, args.dest,
+                                progress=lambda done, total: print(f"\r{done * 100 // max(total, 1)}%", end=''))
+            print(f"\nSaved {path}")
+    except FTPError as e:
+        print(f"FTP error: {e}")
+    finally:
+        master.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Generated JSON encoders for MAVLink messages
+
+msg.to_dict() followed by json.dumps builds a dict per message and then
+walks it generically. encoder(msg_type) instead generates, once per type
+from the dialect definition, a function that formats the message's
+attributes straight into a template whose keys and punctuation are
+precomputed. The output matches json.dumps(msg.to_dict()) byte for byte,
+except that NaN and infinity become null (JSON.parse rejects NaN) and
+char fields that arrive as bytes are decoded instead of failing.
+
+    text = dumps(msg, time_unix_us=time_us)     # extra keys go last
+    python mavlink_json.py --benchmark          # against to_dict + json.dumps
+"""
+
+import json
+import time
+import argparse
+import functools
+from json.encoder import encode_basestring_ascii
+
+from pymavlink.dialects.v20 import ardupilotmega as dialect
+
+from records import message_fields
+
+
+class _Null:
+    """Formats as null through %r, standing in for non-finite floats"""
+
+    def __repr__(self):
+        return 'null'
+
+
+_NULL = _Null()
+
+
+def _string(value):
+    if isinstance(value, (bytes, bytearray)):
+        value = value.split(b'\0', 1)[0].decode('utf-8', 'replace')
+    return encode_basestring_ascii(value)
+
+
+def _floats(values):
+    return '[' + ', '.join(repr(v) if v - v == 0 else 'null' for v in values) + ']'
+
+
+def _source(msg_type):
+    """Python source of the encoder for one message type"""
+    body = []
+    parts = ['{"mavpackettype": %s' % encode_basestring_ascii(msg_type).replace('%', '%%')]
+    args = []
+    for i, (name, ftype, length) in enumerate(message_fields(msg_type)):
+        key = encode_basestring_ascii(name).replace('%', '%%')
+        if ftype == 'char':
+            parts.append(f', {key}: %s')
+            args.append(f'_string(msg.{name})')
+        elif ftype in ('float', 'double'):
+            if length:
+                parts.append(f', {key}: %s')
+                args.append(f'_floats(msg.{name})')
+            else:
+                # x - x is nan (truthy) for nan and inf, 0.0 for finite values
+                body.append(f'    v{i} = msg.{name}')
+                body.append(f'    if v{i} - v{i}: v{i} = _NULL')
+                parts.append(f', {key}: %r')
+                args.append(f'v{i}')
+        elif length:
+            parts.append(f', {key}: [' + ', '.join(['%d'] * length) + ']')
+            args.append(f'*msg.{name}')
+        else:
+            parts.append(f', {key}: %d')
+            args.append(f'msg.{name}')
+    template = ''.join(parts) + '%s}'
+    args.append('tail')
+    return '\n'.join([
+        'def encode(msg, tail=""):',
+        *body,
+        f'    return {template!r} % ({", ".join(args)},)',
+    ])
+
+
+@functools.lru_cache(maxsize=None)
+def encoder(msg_type):
+    """encode(msg, tail='') -> JSON text; tail is preformatted ', "key": value' pairs"""
+    namespace = {'_NULL': _NULL, '_string': _string, '_floats': _floats}
+    exec(compile(_source(msg_type), f'<mavlink_json {msg_type}>', 'exec'), namespace)
+    return namespace['encode']
+
+
+def _tail(extra):
+    return ''.join(f', {encode_basestring_ascii(key)}: {value if type(value) is int else json.dumps(value)}'
+                   for key, value in extra.items())
+
+
+def dumps(msg, **extra):
+    """JSON text of msg.to_dict() plus extra keys; falls back to json.dumps for anything unexpected"""
+    try:
+        return encoder(msg.get_type())(msg, _tail(extra) if extra else '')
+    except (KeyError, TypeError, ValueError):
+        # Types outside the dialect (BAD_DATA) or fields of an unexpected shape
+        data = msg.to_dict()
+        data.update(extra)
+        return json.dumps(data)
+
+
+def _sample_messages():
+    mav = dialect.MAVLink(None, srcSystem=1, srcComponent=1)
+    parser = dialect.MAVLink(None)
+    encoded = [
+        mav.attitude_encode(123456, 0.1, -0.2, 1.5, 0.01, 0.02, -0.03),
+        mav.global_position_int_encode(123456, 377749000, -1224194000, 260, 1698, 12, -3, 0, 9000),
+        mav.local_position_ned_encode(123456, 1.25, -0.5, -0.5, 0.1, 0.0, 0.0),
+        mav.raw_imu_encode(123456000, 10, -4, -1002, 1, 2, 3, 230, -40, 400),
+        mav.battery_status_encode(0, 0, 0, 2500, [12100, 12050, 12080] + [65535] * 7, 1200, 350, 80, 76),
+        mav.heartbeat_encode(2, 12, 81, 0, 4),
+        mav.statustext_encode(6, b'CAL_SCRIPTS: gyro calibration "done"'),
+    ]
+    return [parser.decode(bytearray(msg.pack(mav))) for msg in encoded]
+
+
+def benchmark(iterations=20000):
+    """µs per message for to_dict + json.dumps vs the generated encoder, per sample type"""
+    results = {}
+    for msg in _sample_messages():
+        msg_type = msg.get_type()
+        assert dumps(msg) == json.dumps(msg.to_dict()), msg_type
+        encode = encoder(msg_type)
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            json.dumps(msg.to_dict())
+        t1 = time.perf_counter()
+        for _ in range(iterations):
+            encode(msg)
+        t2 = time.perf_counter()
+        results[msg_type] = ((t1 - t0) / iterations * 1e6, (t2 - t1) / iterations * 1e6)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generated MAVLink JSON encoders')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Compare against to_dict + json.dumps on sample messages')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--source', type=str, default=None,
+                        help='Print the generated encoder for a message type')
+    args = parser.parse_args()
+
+    if args.source:
+        print(_source(args.source.upper()))
+    if args.benchmark:
+        print(f"{'type':<22}{'to_dict+dumps':>15}{'generated':>12}{'speedup':>9}")
+        for msg_type, (baseline, generated) in benchmark(args.iterations).items():
+            print(f"{msg_type:<22}{baseline:>12.2f} us{generated:>9.2f} us{baseline / generated:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
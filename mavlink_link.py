@@ -0,0 +1,237 @@
+"""
+Self-healing MAVLink link
+
+ReconnectingLink owns the MAVLink connection and a list of subscribers.
+When the device disappears it watches /dev for it to come back (instead
+of sleeping blindly), reopens it with jittered exponential backoff,
+re-runs the on-connect hooks (stream requests) and keeps delivering to
+the same subscribers, so nothing has to re-register.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from time import perf_counter_ns
+
+import serial
+from pymavlink import mavutil
+from mavlink_autodetect import candidate_ports, is_serial, resolve_serial
+from link_stats import LinkStats
+from stage_profiler import StageProfiler
+
+logger = logging.getLogger(__name__)
+
+DEVICE_POLL_INTERVAL = 0.05   # Seconds between /dev checks while unplugged
+BACKOFF_INITIAL = 0.05
+BACKOFF_MAX = 2.0
+HEARTBEAT_TIMEOUT = 1.5       # Per attempt, once the device node exists
+STALE_TIMEOUT = 3.0           # No data for this long with the node gone means unplugged
+
+
+class ReconnectingLink:
+    """MAVLink connection that survives unplug/replug without losing subscribers"""
+
+    def __init__(self, port='auto', baud=57600, **kwargs):
+        self.port = port
+        self.baud = baud
+        self.kwargs = kwargs
+        self.master = None
+        self.subscribers = []
+        self.connect_hooks = []
+        self.running = False
+        self.reconnects = 0
+        self.last_reconnect_time = None  # Device reappeared -> first message, seconds
+        self.device = None               # Resolved port/baud of the last good connection
+        self.device_baud = None
+        self.stats = LinkStats()
+        self.prof = StageProfiler.from_env(stages=('receive', 'decode', 'dispatch'))
+        self._device_seen = None
+        self._reader = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """Call callback(msg) for every message, across reconnects"""
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def on_connect(self, hook):
+        """Call hook(master) after every (re)connect, e.g. to request streams"""
+        self.connect_hooks.append(hook)
+        return hook
+
+    def send(self, fn):
+        """Run fn(master) against the current connection; returns False while disconnected"""
+        with self._lock:
+            if self.master is None:
+                return False
+            fn(self.master)
+            return True
+
+    def _device_present(self):
+        if not is_serial(self.port):
+            return True
+        if self.device and os.path.exists(self.device):
+            return True
+        if self.port == 'auto':
+            return bool(candidate_ports())
+        return os.path.exists(self.port)
+
+    def _open(self, timeout):
+        if self.device and os.path.exists(self.device):
+            # Same device back on the same node: skip detection
+            port, baud = self.device, self.device_baud
+        else:
+            port, baud = resolve_serial(self.port, self.baud)
+        if is_serial(port):
+            master = mavutil.mavlink_connection(port, baud=baud, **self.kwargs)
+        else:
+            master = mavutil.mavlink_connection(port, **self.kwargs)
+        if not master.wait_heartbeat(timeout=timeout):
+            master.close()
+            return None
+        self.device, self.device_baud = port, baud
+        return master
+
+    def connect(self, timeout=None):
+        """Block until connected or stop(); returns the new master, or None"""
+        delay = BACKOFF_INITIAL
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (deadline is None or time.monotonic() < deadline) and not self._stopping.is_set():
+            # Cheap hotplug watch: poll the device node instead of retrying the open
+            while not self._device_present():
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                if self._stopping.wait(DEVICE_POLL_INTERVAL):
+                    return None
+            device_seen = time.monotonic()
+
+            try:
+                master = self._open(HEARTBEAT_TIMEOUT)
+            except (serial.SerialException, OSError) as e:
+                logger.debug(f"Open failed: {e}")
+                master = None
+
+            if master is not None:
+                if self.prof:
+                    self.prof.instrument(master)
+                with self._lock:
+                    self.master = master
+                for hook in self.connect_hooks:
+                    try:
+                        hook(master)
+                    except Exception as e:
+                        logger.error(f"Connect hook failed: {e}")
+                self._device_seen = device_seen
+                logger.info(f"Connected to system {master.target_system} on {self.port}")
+                return master
+
+            # Full jitter keeps several clients from retrying in lockstep
+            if self._stopping.wait(random.uniform(0, delay)):
+                return None
+            delay = min(delay * 2, BACKOFF_MAX)
+        return None
+
+    def _drop(self):
+        with self._lock:
+            master, self.master = self.master, None
+        if master is not None:
+            try:
+                master.close()
+            except Exception:
+                pass
+
+    def _dispatch(self, msg):
+        for callback in list(self.subscribers):
+            try:
+                callback(msg)
+            except Exception as e:
+                logger.error(f"Subscriber error: {e}")
+
+    def run(self):
+        """Read and dispatch messages forever, reconnecting as needed"""
+        self.running = True
+        self._stopping.clear()
+        if self.master is None:
+            self.connect()
+        awaiting_first = False
+        last_message = time.monotonic()
+
+        prof = self.prof
+        try:
+            while self.running:
+                master = self.master
+                if master is None:
+                    self._reconnect()
+                    awaiting_first = True
+                    last_message = time.monotonic()
+                    continue
+                try:
+                    if prof: t0 = perf_counter_ns()
+                    msg = master.recv_match(blocking=True, timeout=0.5)
+                except (serial.SerialException, OSError) as e:
+                    if not self.running:
+                        break
+                    logger.error(f"Link lost: {e}")
+                    msg = None
+                    self._reconnect()
+                    awaiting_first = True
+                    last_message = time.monotonic()
+                    continue
+
+                now = time.monotonic()
+                if msg is None:
+                    if prof: prof.take_io()
+                    if now - last_message > STALE_TIMEOUT and self.device and \
+                            is_serial(self.device) and not os.path.exists(self.device):
+                        logger.error("Device removed")
+                        self._reconnect()
+                        awaiting_first = True
+                        last_message = time.monotonic()
+                    continue
+
+                last_message = now
+                if prof: prof.record_receive(perf_counter_ns() - t0)
+                self.stats.observe(msg)
+                if msg.get_type() == 'BAD_DATA':
+                    if prof: prof.finish('BAD_DATA')
+                    continue
+                if awaiting_first:
+                    self.last_reconnect_time = now - self._device_seen
+                    logger.info(f"Telemetry resumed {self.last_reconnect_time * 1000:.0f} ms after the device reappeared")
+                    awaiting_first = False
+                if prof:
+                    t1 = perf_counter_ns()
+                    self._dispatch(msg)
+                    prof.record('dispatch', perf_counter_ns() - t1)
+                    prof.finish(msg.get_type())
+                else:
+                    self._dispatch(msg)
+        finally:
+            # Only the reader closes the link, so recv_match never sees it vanish mid-call
+            self._drop()
+
+    def _reconnect(self):
+        self._drop()
+        self.reconnects += 1
+        self.connect()
+
+    def start(self):
+        """Run the reader in a daemon thread"""
+        thread = threading.Thread(target=self.run, daemon=True)
+        self._reader = thread
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop reading; the reader thread closes the link once its current read returns"""
+        self.running = False
+        self._stopping.set()
+        if self._reader is None or not self._reader.is_alive():
+            self._drop()
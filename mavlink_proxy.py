@@ -3,6 +3,8 @@ import threading
 import time
 import argparse
 from pymavlink import mavutil
+from mavlink_autodetect import resolve_serial
+from link_stats import LinkStats, start_metrics_server
 
 class MAVLinkProxy:
     def __init__(self, source_connection, local_port=14550, remote_port=14551):
@@ -15,6 +17,7 @@ class MAVLinkProxy:
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.bind(('0.0.0.0', local_port))
         self.remote_clients = set()
+        self.stats = LinkStats()
         
     def start(self):
         self.running = True
@@ -34,6 +37,7 @@ class MAVLinkProxy:
             try:
                 msg = self.source.recv_match(blocking=True, timeout=1.0)
                 if msg:
+                    self.stats.observe(msg)
                     # Forward to all connected clients
                     msg_bytes = msg.get_msgbuf()
                     for client in self.remote_clients:
@@ -66,14 +70,18 @@ class MAVLinkProxy:
 
 def main():
     parser = argparse.ArgumentParser(description='MAVLink UDP Proxy')
-    parser.add_argument('--source', type=str, required=True,
-                      help='Source connection (e.g., /dev/ttyUSB0 or udp:localhost:14550)')
+    parser.add_argument('--source', type=str, default='auto',
+                      help='Source connection (e.g., /dev/ttyUSB0, udp:localhost:14550 or auto)')
     parser.add_argument('--baud', type=int, default=57600,
                       help='Baud rate for serial connection')
     parser.add_argument('--local-port', type=int, default=14550,
                       help='Local UDP port for receiving connections')
     parser.add_argument('--remote-port', type=int, default=14551,
                       help='Remote UDP port for client connections')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                      help='Serve link statistics as JSON on this port')
+    parser.add_argument('--metrics-host', type=str, default='127.0.0.1',
+                      help='Address the metrics server binds to (0.0.0.0 exposes it on the network)')
     
     args = parser.parse_args()
     
@@ -81,10 +89,13 @@ def main():
     if args.source.startswith('udp:'):
         source = mavutil.mavlink_connection(args.source)
     else:
-        source = mavutil.mavlink_connection(args.source, baud=args.baud)
+        port, baud = resolve_serial(args.source, args.baud)
+        source = mavutil.mavlink_connection(port, baud=baud)
     
     # Create and start proxy
     proxy = MAVLinkProxy(source, args.local_port, args.remote_port)
+    if args.metrics_port:
+        start_metrics_server(proxy.stats, args.metrics_port, args.metrics_host)
     
     try:
         proxy.start()
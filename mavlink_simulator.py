@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+MAVLink-over-UDP (or pty) fleet simulator for load testing
+
+Emits real MAVLink v2 frames for N vehicles with distinct sysids, so
+listen.py, mavlink_proxy.py and the calibration servers can be driven
+without hardware. Vehicle state lives in NumPy arrays and is advanced
+for the whole fleet at once; per-message send rates are staggered across
+vehicles so the link sees a steady stream instead of one burst per tick.
+
+Vehicles get sysids 1..254 (255 is the GCS); beyond that the sysids
+repeat with the next component id, so vehicle 255 is 1:2.
+
+Each vehicle answers:
+  - COMMAND_LONG MAV_CMD_PREFLIGHT_CALIBRATION with COMMAND_ACK and a
+    scripted STATUSTEXT sequence (gyro, mag, baro, accel/level)
+  - MAV_CMD_SET_MESSAGE_INTERVAL by changing that message's rate
+  - TIMESYNC requests
+
+Usage:
+    python mavlink_simulator.py --vehicles 200 --connection udpout:127.0.0.1:14550
+    python mavlink_simulator.py --vehicles 3 --pty     # prints a /dev/pts/N to connect to
+"""
+
+import os
+import time
+import socket
+import select
+import logging
+import argparse
+
+import numpy as np
+from pymavlink import mavutil
+from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+
+from geodetic import LocalTangentPlane
+
+logger = logging.getLogger(__name__)
+
+TICK_HZ = 50
+# message -> Hz; each rate must divide TICK_HZ
+RATES = {
+    'HEARTBEAT': 1,
+    'SYS_STATUS': 1,
+    'BATTERY_STATUS': 1,
+    'ATTITUDE': 10,
+    'RAW_IMU': 10,
+    'LOCAL_POSITION_NED': 5,
+    'GLOBAL_POSITION_INT': 5,
+}
+MSG_IDS = {name: getattr(mavlink2, f'MAVLINK_MSG_ID_{name}') for name in RATES}
+
+HOME_LAT = 12.9716      # Degrees; vehicles are spread around this point
+HOME_LON = 77.5946
+HOME_ALT = 900.0        # Metres above the ellipsoid
+GRAVITY = 9.80665
+MAX_SYSID = 254
+SENSORS = 0x0020FC2F    # Gyro, accel, mag, baro, GPS, AHRS, battery present/enabled/healthy
+
+CAL_STEP_S = 0.4        # Delay between scripted STATUSTEXT lines
+
+# Scripted calibration output, in the PX4 wording statustext_classifier.py understands
+_SIDES = ('down', 'up', 'left', 'right', 'front', 'back')
+CAL_SCRIPTS = {
+    'gyro': ['[cal] calibration started: 2 gyro'] +
+            [f'[cal] progress <{p}>' for p in (20, 40, 60, 80, 100)] +
+            ['[cal] calibration done: gyro'],
+    'mag': ['[cal] calibration started: 2 mag'] +
+           [f'[cal] progress <{p}>' for p in range(10, 101, 15)] +
+           ['[cal] calibration done: mag'],
+    'baro': ['[cal] calibration started: 2 baro',
+             '[cal] progress <50>',
+             '[cal] calibration done: baro'],
+    'level': ['[cal] calibration started: 2 level',
+              '[cal] hold vehicle still',
+              '[cal] progress <50>',
+              '[cal] progress <100>',
+              '[cal] calibration done: level'],
+    'accel': ['[cal] calibration started: 2 accel',
+              '[cal] pending: ' + ' '.join(_SIDES)] +
+             [line for i, side in enumerate(_SIDES) for line in (
+                 f'[cal] {side} orientation detected',
+                 f'[cal] {side} side done, rotate to a different side',
+                 '[cal] pending: ' + ' '.join(_SIDES[i + 1:]),
+             )][:-1] +
+             ['[cal] calibration done: accel'],
+}
+
+
+def calibration_script(params):
+    """Script name for MAV_CMD_PREFLIGHT_CALIBRATION params 1..7, or None"""
+    if params[0]:
+        return 'gyro'
+    if params[1]:
+        return 'mag'
+    if params[2]:
+        return 'baro'
+    if params[4] == 1:
+        return 'accel'
+    if params[4] in (2, 4):
+        return 'level'
+    return None
+
+
+class _Outbox:
+    """File-like sink for one vehicle's MAVLink encoder"""
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def write(self, data):
+        self.buf += data
+
+
+class Fleet:
+    """State of N simulated vehicles, advanced together with NumPy"""
+
+    def __init__(self, count, seed=None):
+        self.count = count
+        rng = np.random.default_rng(seed)
+        self.rng = rng
+        index = np.arange(count)
+        self.sysids = 1 + index % MAX_SYSID
+        self.compids = 1 + index // MAX_SYSID
+        # Each vehicle orbits its own point at its own radius, speed and height
+        self.center = rng.uniform(-200, 200, (count, 2))
+        self.radius = rng.uniform(5, 40, count)
+        self.speed = rng.uniform(2, 12, count)                 # m/s along the orbit
+        self.direction = rng.choice([-1.0, 1.0], count)
+        self.phase = rng.uniform(0, 2 * np.pi, count)
+        self.height = rng.uniform(5, 60, count)
+        self.boot_ms = rng.integers(10_000, 600_000, count)   # Vehicles were powered on at different times
+        self.remaining = rng.uniform(60, 100, count)
+        self.drain = rng.uniform(0.01, 0.05, count)           # %/s
+
+        self.pos = np.zeros((count, 3))
+        self.vel = np.zeros((count, 3))
+        self.att = np.zeros((count, 3))
+        self.rates = np.zeros((count, 3))
+        self.accel = np.zeros((count, 3))
+        self.home = LocalTangentPlane.cached(HOME_LAT, HOME_LON, HOME_ALT)
+        self.elapsed = 0.0
+        self.started = time.monotonic()
+        self.step(0.0)
+
+    def step(self, dt):
+        """Advance every vehicle by dt seconds"""
+        self.elapsed += dt
+        omega = self.direction * self.speed / self.radius
+        self.phase += omega * dt
+        c, s = np.cos(self.phase), np.sin(self.phase)
+        noise = self.rng.normal(0, 0.02, (self.count, 3))
+
+        pos = np.empty((self.count, 3))
+        pos[:, 0] = self.center[:, 0] + self.radius * c
+        pos[:, 1] = self.center[:, 1] + self.radius * s
+        pos[:, 2] = -self.height + 0.5 * np.sin(0.3 * self.elapsed + self.phase)
+        self.pos = pos + noise
+
+        vel = np.empty((self.count, 3))
+        vel[:, 0] = -self.radius * omega * s
+        vel[:, 1] = self.radius * omega * c
+        vel[:, 2] = 0.15 * np.cos(0.3 * self.elapsed + self.phase)
+        self.vel = vel
+
+        # Coordinated turn: bank into the centre, nose along the velocity
+        yaw = np.arctan2(vel[:, 1], vel[:, 0])
+        roll = np.arctan(self.speed * omega / GRAVITY)
+        pitch = -0.05 * self.speed / 12.0 + noise[:, 2]
+        self.att = np.stack([roll + noise[:, 0], pitch, yaw], axis=1)
+        self.rates = np.stack([noise[:, 0] * 0.5, noise[:, 1] * 0.5, omega], axis=1)
+        self.accel = np.stack([
+            noise[:, 0] * 50,
+            noise[:, 1] * 50,
+            -1000.0 / np.cos(roll) + noise[:, 2] * 50,
+        ], axis=1)   # mG, body frame; a coordinated turn only loads z
+
+        self.remaining = np.maximum(self.remaining - self.drain * dt, 0.0)
+
+    def time_boot_ns(self, now=None):
+        """Boot clock of every vehicle; follows the host clock even when ticks overrun"""
+        now = time.monotonic() if now is None else now
+        return self.boot_ms * 1_000_000 + int((now - self.started) * 1e9)
+
+    def time_boot_ms(self):
+        return self.time_boot_ns() // 1_000_000
+
+    def geodetic(self):
+        """(lat, lon) in degE7 and alt (AMSL) in mm for every vehicle"""
+        return self.home.from_ned_e7(self.pos[:, 0], self.pos[:, 1], self.pos[:, 2])
+
+    def voltage_mv(self):
+        return (10500 + 21 * self.remaining).astype(np.int64)   # 3S pack, 12.6 V full
+
+
+class Simulator:
+    """Encode the fleet as MAVLink, send it and answer commands"""
+
+    def __init__(self, fleet, transport, rates=RATES, tick_hz=TICK_HZ):
+        self.fleet = fleet
+        self.transport = transport
+        self.tick_hz = tick_hz
+        self.outboxes = [_Outbox() for _ in range(fleet.count)]
+        self.mavs = [mavlink2.MAVLink(box, srcSystem=int(sysid), srcComponent=int(compid))
+                     for box, sysid, compid in zip(self.outboxes, fleet.sysids, fleet.compids)]
+        self.parser = mavutil.mavlink.MAVLink(None)
+        self.parser.robust_parsing = True
+        # Stagger each vehicle's send slots so the fleet does not emit in lockstep
+        self.offsets = np.arange(fleet.count)
+        self.divisors = {}
+        for name, hz in rates.items():
+            self.set_rate(name, hz)
+        self.scripts = []     # (due time, vehicle index, text)
+        self.tick = 0
+        self.sent_msgs = 0
+        self.sent_bytes = 0
+
+    def set_rate(self, name, hz):
+        if hz <= 0:
+            self.divisors[name] = None
+        else:
+            self.divisors[name] = max(1, round(self.tick_hz / hz))
+
+    def _due(self, name):
+        divisor = self.divisors.get(name)
+        if divisor is None:
+            return ()
+        return np.nonzero((self.tick + self.offsets) % divisor == 0)[0].tolist()
+
+    def emit(self):
+        """Encode every message that is due this tick"""
+        fleet = self.fleet
+        mavs = self.mavs
+        boot = fleet.time_boot_ms().tolist()
+
+        due = self._due('HEARTBEAT')
+        if due:
+            for i in due:
+                mavs[i].heartbeat_send(mavlink2.MAV_TYPE_QUADROTOR, mavlink2.MAV_AUTOPILOT_PX4,
+                                       mavlink2.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED | mavlink2.MAV_MODE_FLAG_SAFETY_ARMED,
+                                       0, mavlink2.MAV_STATE_ACTIVE)
+
+        due = self._due('ATTITUDE')
+        if due:
+            att = fleet.att.tolist()
+            rates = fleet.rates.tolist()
+            for i in due:
+                mavs[i].attitude_send(boot[i] & 0xFFFFFFFF, *att[i], *rates[i])
+
+        due = self._due('LOCAL_POSITION_NED')
+        if due:
+            pos = fleet.pos.tolist()
+            vel = fleet.vel.tolist()
+            for i in due:
+                mavs[i].local_position_ned_send(boot[i] & 0xFFFFFFFF, *pos[i], *vel[i])
+
+        due = self._due('GLOBAL_POSITION_INT')
+        if due:
+            lat, lon, alt = (values.tolist() for values in fleet.geodetic())
+            relative_alt = (-fleet.pos[:, 2] * 1000).astype(np.int64).tolist()
+            vel = (fleet.vel * 100).astype(np.int64).tolist()
+            hdg = ((np.degrees(fleet.att[:, 2]) % 360) * 100).astype(np.int64).tolist()
+            for i in due:
+                mavs[i].global_position_int_send(boot[i] & 0xFFFFFFFF, lat[i], lon[i], alt[i],
+                                                 relative_alt[i], *vel[i], hdg[i])
+
+        due = self._due('RAW_IMU')
+        if due:
+            acc = fleet.accel.astype(np.int64).tolist()
+            gyro = (fleet.rates * 1000).clip(-32767, 32767).astype(np.int64).tolist()
+            yaw = fleet.att[:, 2]
+            mag = np.stack([250 * np.cos(yaw), -250 * np.sin(yaw), np.full(fleet.count, 400.0)],
+                           axis=1).astype(np.int64).tolist()
+            for i in due:
+                mavs[i].raw_imu_send(boot[i] * 1000, *acc[i], *gyro[i], *mag[i])
+
+        battery_due, status_due = self._due('BATTERY_STATUS'), self._due('SYS_STATUS')
+        if battery_due or status_due:
+            voltage = fleet.voltage_mv().tolist()
+            remaining = fleet.remaining.astype(np.int64).tolist()
+            for i in battery_due:
+                mavs[i].battery_status_send(0, mavlink2.MAV_BATTERY_FUNCTION_ALL, mavlink2.MAV_BATTERY_TYPE_LIPO,
+                                            2500, [voltage[i]] + [65535] * 9, 1200, -1, -1, remaining[i])
+            for i in status_due:
+                mavs[i].sys_status_send(SENSORS, SENSORS, SENSORS, 250, voltage[i], 1200, remaining[i],
+                                        0, 0, 0, 0, 0, 0)
+
+        now = time.monotonic()
+        while self.scripts and self.scripts[0][0] <= now:
+            _, i, text = self.scripts.pop(0)
+            mavs[i].statustext_send(mavlink2.MAV_SEVERITY_INFO, text.encode())
+
+    def flush(self):
+        for i, box in enumerate(self.outboxes):
+            if box.buf:
+                self.sent_bytes += len(box.buf)
+                self.transport.send(i, bytes(box.buf))
+                box.buf.clear()
+        self.sent_msgs = sum(mav.total_packets_sent for mav in self.mavs)
+
+    def _targets(self, target_system, target_component=0):
+        """Indices of the vehicles a message is addressed to (0 is a wildcard)"""
+        match = np.ones(self.fleet.count, dtype=bool)
+        if target_system:
+            match &= self.fleet.sysids == target_system
+        if target_component:
+            match &= self.fleet.compids == target_component
+        return np.nonzero(match)[0].tolist()
+
+    def handle(self, data):
+        """Answer commands in received bytes"""
+        for msg in self.parser.parse_buffer(data) or []:
+            msg_type = msg.get_type()
+            if msg_type == 'COMMAND_LONG':
+                for i in self._targets(msg.target_system, msg.target_component):
+                    self._command(i, msg)
+            elif msg_type == 'TIMESYNC' and msg.tc1 == 0:
+                # Each vehicle answers with its own boot clock
+                boot_ns = self.fleet.time_boot_ns().tolist()
+                for i in self._targets(0):
+                    self.mavs[i].timesync_send(boot_ns[i], msg.ts1)
+
+    def _command(self, i, msg):
+        mav = self.mavs[i]
+        params = [msg.param1, msg.param2, msg.param3, msg.param4, msg.param5, msg.param6, msg.param7]
+        result = mavlink2.MAV_RESULT_ACCEPTED
+        if msg.command == mavlink2.MAV_CMD_PREFLIGHT_CALIBRATION:
+            script = calibration_script(params)
+            if script is None:
+                result = mavlink2.MAV_RESULT_UNSUPPORTED
+            else:
+                start = time.monotonic()
+                for step, text in enumerate(CAL_SCRIPTS[script]):
+                    self.scripts.append((start + (step + 1) * CAL_STEP_S, i, text))
+                self.scripts.sort(key=lambda entry: entry[0])
+                logger.info(f"Vehicle {self.fleet.sysids[i]}:{self.fleet.compids[i]}: {script} calibration")
+        elif msg.command == mavlink2.MAV_CMD_SET_MESSAGE_INTERVAL:
+            name = next((n for n, msg_id in MSG_IDS.items() if msg_id == int(params[0])), None)
+            if name is None:
+                result = mavlink2.MAV_RESULT_UNSUPPORTED
+            else:
+                # Rates are shared by the fleet; the last request wins
+                interval_us = params[1]
+                self.set_rate(name, 0 if interval_us < 0 else (RATES[name] if interval_us == 0 else 1e6 / interval_us))
+        elif msg.command == mavlink2.MAV_CMD_PREFLIGHT_STORAGE:
+            pass
+        else:
+            result = mavlink2.MAV_RESULT_UNSUPPORTED
+        mav.command_ack_send(msg.command, result)
+
+    def run(self, duration=None, report_interval=5.0):
+        period = 1.0 / self.tick_hz
+        start = next_tick = time.monotonic()
+        last_report, last_msgs, last_bytes = start, 0, 0
+        overruns = 0
+        while duration is None or time.monotonic() - start < duration:
+            self.fleet.step(period)
+            self.emit()
+            self.flush()
+            self.tick += 1
+
+            next_tick += period
+            # Sleep in select() so commands are answered between ticks
+            while True:
+                timeout = next_tick - time.monotonic()
+                if timeout <= 0:
+                    break
+                data = self.transport.recv(timeout)
+                if data:
+                    self.handle(data)
+            if time.monotonic() - next_tick > period:
+                overruns += 1
+                next_tick = time.monotonic()
+
+            now = time.monotonic()
+            if now - last_report >= report_interval:
+                elapsed = now - last_report
+                logger.info(f"{self.fleet.count} vehicles: {(self.sent_msgs - last_msgs) / elapsed:.0f} msg/s, "
+                            f"{(self.sent_bytes - last_bytes) / elapsed / 1024:.1f} KiB/s, {overruns} overruns")
+                last_report, last_msgs, last_bytes = now, self.sent_msgs, self.sent_bytes
+                overruns = 0
+
+
+class UDPTransport:
+    """Send every vehicle to one GCS address, MAVProxy udpout style"""
+
+    def __init__(self, host, port, per_vehicle_ports=False):
+        self.address = (host, port)
+        self.per_vehicle_ports = per_vehicle_ports
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def send(self, vehicle, data):
+        address = (self.address[0], self.address[1] + vehicle) if self.per_vehicle_ports else self.address
+        try:
+            self.sock.sendto(data, address)
+        except OSError:
+            pass   # Nothing listening yet
+
+    def recv(self, timeout):
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        if not readable:
+            return None
+        try:
+            return self.sock.recv(65535)
+        except OSError:
+            return None
+
+
+class PtyTransport:
+    """A pseudo-terminal that looks like a telemetry radio to the GCS (POSIX only)"""
+
+    def __init__(self):
+        import tty
+        self.fd, slave = os.openpty()
+        # Writes must not block when no GCS is draining the pty
+        os.set_blocking(self.fd, False)
+        tty.setraw(slave)
+        self.slave = slave
+        self.name = os.ttyname(slave)
+
+    def send(self, vehicle, data):
+        try:
+            os.write(self.fd, data)
+        except BlockingIOError:
+            pass   # Nobody is reading; drop like a radio would
+
+    def recv(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return None
+        try:
+            return os.read(self.fd, 4096)
+        except BlockingIOError:
+            return None
+
+
+def parse_udp(connection):
+    """'udpout:host:port' or 'host:port' -> (host, port)"""
+    if connection.startswith(('udpout:', 'udp:')):
+        connection = connection.split(':', 1)[1]
+    host, _, port = connection.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MAVLink fleet simulator for load testing')
+    parser.add_argument('--vehicles', type=int, default=1,
+                        help='Number of vehicles (sysids 1..254, then repeating with the next compid)')
+    parser.add_argument('--connection', type=str, default='udpout:127.0.0.1:14550',
+                        help='Where to send (udpout:host:port), e.g. listen.py --connection udpin:0.0.0.0:14550')
+    parser.add_argument('--per-vehicle-ports', action='store_true',
+                        help='Send vehicle N to port+N-1 instead of sharing one port')
+    parser.add_argument('--pty', action='store_true',
+                        help='Expose a pseudo-terminal instead of UDP')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='Stop after this many seconds')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Random seed for repeatable fleets')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.pty:
+        transport = PtyTransport()
+        logger.info(f"Simulated link on {transport.name} (e.g. listen.py --connection {transport.name})")
+    else:
+        host, port = parse_udp(args.connection)
+        transport = UDPTransport(host, port, args.per_vehicle_ports)
+        logger.info(f"Sending {args.vehicles} vehicle(s) to {host}:{port}")
+
+    simulator = Simulator(Fleet(args.vehicles, args.seed), transport)
+    try:
+        simulator.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+Per-vehicle parameter cache with incremental sync
+
+The full parameter set (~1,140 entries) is stored per vehicle, keyed by
+sysid and the firmware identity from AUTOPILOT_VERSION. On connect the
+cache is checked against the autopilot's _HASH_CHECK value (PX4) and
+kept as is when it matches; otherwise every parameter is re-read once,
+with a window of PARAM_REQUEST_READs in flight. Autopilots without
+_HASH_CHECK (ArduPilot) have a complete cache checked against a fresh
+param_count and a spread of re-read parameters; only when those disagree
+is everything re-read, as one param.pck transfer over MAVLink FTP when
+available.
+
+    python3 param_cache.py --connection auto --save mav.parm
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import logging
+import argparse
+
+from pymavlink import mavutil
+from connection_profile import CACHE_DIR, open_connection, ensure_autopilot_version
+from mavlink_ftp import FTPClient, FTPError, fetch_params
+
+logger = logging.getLogger(__name__)
+
+PARAM_CACHE_DIR = os.path.join(CACHE_DIR, 'params')
+HASH_CHECK_ID = '_HASH_CHECK'
+
+WINDOW = 8            # PARAM_REQUEST_READs in flight
+REQUEST_TIMEOUT = 0.5
+MAX_RETRIES = 5
+SAMPLE_SIZE = 24      # Parameters re-read to validate a cache without _HASH_CHECK
+
+# PX4 leaves @volatile parameters out of _HASH_CHECK; they change on their own
+VOLATILE_PARAMS = frozenset({'COM_FLIGHT_UUID', 'LND_FLIGHT_T_HI', 'LND_FLIGHT_T_LO'})
+
+PARAM_TYPE_SIZES = {
+    mavutil.mavlink.MAV_PARAM_TYPE_UINT8: 1,
+    mavutil.mavlink.MAV_PARAM_TYPE_INT8: 1,
+    mavutil.mavlink.MAV_PARAM_TYPE_UINT16: 2,
+    mavutil.mavlink.MAV_PARAM_TYPE_INT16: 2,
+    mavutil.mavlink.MAV_PARAM_TYPE_UINT32: 4,
+    mavutil.mavlink.MAV_PARAM_TYPE_INT32: 4,
+    mavutil.mavlink.MAV_PARAM_TYPE_REAL32: 4,
+}
+
+
+def param_name(msg):
+    """PARAM_VALUE id as str without padding"""
+    name = msg.param_id
+    if isinstance(name, bytes):
+        name = name.decode('ascii', errors='ignore')
+    return name.rstrip('\x00')
+
+
+def crc32part(data, crc=0):
+    """NuttX crc32part(): the zlib polynomial without zlib's pre- and post-inversion"""
+    return zlib.crc32(data, crc ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+
+def firmware_id(version):
+    """Short firmware identity from AUTOPILOT_VERSION fields"""
+    if not version:
+        return 'unknown'
+    custom = bytes(version.get('flight_custom_version') or []).hex()
+    return f"{version.get('flight_sw_version', 0):08x}-{version.get('board_version', 0):x}-{custom}"
+
+
+class ParamCache:
+    """Parameter values for one vehicle/firmware, persisted as JSON"""
+
+    def __init__(self, sysid, fw_id, directory=PARAM_CACHE_DIR):
+        self.sysid = sysid
+        self.fw_id = fw_id
+        self.path = os.path.join(directory, f"{sysid}_{fw_id}.json")
+        self.count = None
+        self.params = {}     # name -> [value, type, index]
+        self.by_index = {}   # index -> name
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.count = data.get('count')
+        self.params = data.get('params', {})
+        self.by_index = {entry[2]: name for name, entry in self.params.items()}
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'count': self.count, 'params': self.params, 'saved': time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+    def handle_param_value(self, msg):
+        """Store a PARAM_VALUE; returns its name, or None for the hash reply"""
+        name = param_name(msg)
+        if name == HASH_CHECK_ID:
+            return None
+        if msg.param_count and msg.param_count != 65535:
+            self.count = msg.param_count
+        old = self.params.get(name)
+        if old is not None and old[2] != msg.param_index and self.by_index.get(old[2]) == name:
+            del self.by_index[old[2]]
+        self.params[name] = [msg.param_value, msg.param_type, msg.param_index]
+        self.by_index[msg.param_index] = name
+        return name
+
+    def clear(self):
+        self.count = None
+        self.params = {}
+        self.by_index = {}
+
+    def update_from_pck(self, params):
+        """Replace the contents with decoded param.pck entries (file order is index order)"""
+        self.params = {name: [value, param_type, index]
+                       for index, (name, (value, param_type, _)) in enumerate(params.items())}
+        self.by_index = {index: name for name, (_, _, index) in self.params.items()}
+        self.count = len(self.params)
+
+    def missing_indices(self):
+        if self.count is None:
+            return []
+        return [i for i in range(self.count) if i not in self.by_index]
+
+    def complete(self):
+        return self.count is not None and not self.missing_indices()
+
+    def compute_hash(self, volatile=VOLATILE_PARAMS):
+        """
+        PX4's _HASH_CHECK: crc32part over each non-volatile parameter's name
+        and raw value bytes, in PX4's (name-sorted) parameter order
+        """
+        crc = 0
+        for name in sorted(self.params):
+            if name in volatile:
+                continue
+            value, param_type, _ = self.params[name]
+            size = PARAM_TYPE_SIZES.get(param_type, 4)
+            crc = crc32part(name.encode('ascii'), crc)
+            crc = crc32part(struct.pack('<f', value)[:size], crc)
+        return crc
+
+    def values(self):
+        return {name: entry[0] for name, entry in self.params.items()}
+
+    def write_parm_file(self, path):
+        """Write a MAVProxy-style .parm file"""
+        with open(path, 'w') as f:
+            for name in sorted(self.params):
+                value, param_type, _ = self.params[name]
+                if param_type == mavutil.mavlink.MAV_PARAM_TYPE_REAL32:
+                    f.write(f"{name:<16} {value:f}\n")
+                else:
+                    f.write(f"{name:<16} {int(value)}\n")
+
+
+class ParamSync:
+    """Bring a ParamCache up to date over a MAVLink connection"""
+
+    def __init__(self, master, cache, window=WINDOW, timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES, use_ftp=True):
+        self.master = master
+        self.cache = cache
+        self.window = window
+        self.timeout = timeout
+        self.retries = retries
+        self.use_ftp = use_ftp
+
+    def _request_read(self, index=-1, name=''):
+        self.master.mav.param_request_read_send(
+            self.master.target_system, self.master.target_component,
+            name.encode('ascii'), index)
+
+    def vehicle_hash(self, timeout=1.0):
+        """Ask for _HASH_CHECK; returns the uint32 hash or None if unsupported"""
+        self._request_read(-1, HASH_CHECK_ID)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            msg = self.master.recv_match(type='PARAM_VALUE', blocking=True,
+                                         timeout=max(0.0, deadline - time.monotonic()))
+            if msg is None:
+                break
+            if param_name(msg) == HASH_CHECK_ID:
+                return struct.unpack('<I', struct.pack('<f', msg.param_value))[0]
+            self.cache.handle_param_value(msg)
+        return None
+
+    def fetch_ftp(self):
+        """Read the whole set in one param.pck transfer; returns False if FTP is unavailable"""
+        try:
+            # Few retries: an autopilot without FTP should not hold up the fallback
+            params = fetch_params(FTPClient(self.master, retries=2))
+        except (FTPError, ValueError) as e:
+            logger.info(f"FTP parameter read unavailable ({e}), using PARAM_REQUEST_READ")
+            return False
+        self.cache.update_from_pck(params)
+        return True
+
+    def fetch_count(self):
+        """Learn param_count by reading index 0"""
+        if self.cache.count is None or 0 not in self.cache.by_index:
+            self.fetch_indices([0])
+        return self.cache.count
+
+    def sample_matches(self, size=SAMPLE_SIZE):
+        """Re-read param_count and a spread of indices; True if all agree with the cache"""
+        if not self.cache.complete():
+            return False
+        count = self.cache.count
+        indices = sorted({round(i * (count - 1) / max(size - 1, 1)) for i in range(size)})
+        cached = {}
+        for index in indices:
+            name = self.cache.by_index[index]
+            cached[index] = (name, self.cache.params[name][:2])
+        # Index 0 first: a changed count fails fast, without waiting on indices that are gone
+        if self.fetch_indices(indices[:1]) or self.cache.count != count:
+            return False
+        if self.fetch_indices(indices[1:]) or self.cache.count != count:
+            return False
+        return all(self.cache.by_index.get(index) == name and self.cache.params[name][:2] == entry
+                   for index, (name, entry) in cached.items())
+
+    def fetch_indices(self, indices):
+        """Windowed PARAM_REQUEST_READ by index; returns indices that never arrived"""
+        pending = list(indices)
+        pending.reverse()
+        in_flight = {}   # index -> (sent_at, attempts)
+        failed = []
+
+        while pending or in_flight:
+            while pending and len(in_flight) < self.window:
+                index = pending.pop()
+                self._request_read(index)
+                in_flight[index] = (time.monotonic(), 1)
+
+            msg = self.master.recv_match(type='PARAM_VALUE', blocking=True, timeout=self.timeout / 4)
+            if msg is not None:
+                self.cache.handle_param_value(msg)
+                in_flight.pop(msg.param_index, None)
+
+            now = time.monotonic()
+            for index, (sent_at, attempts) in list(in_flight.items()):
+                if now - sent_at < self.timeout:
+                    continue
+                if attempts >= self.retries:
+                    del in_flight[index]
+                    failed.append(index)
+                else:
+                    self._request_read(index)
+                    in_flight[index] = (now, attempts + 1)
+        return failed
+
+    def sync(self):
+        """Validate and fill the cache; returns a short summary dict"""
+        started = time.monotonic()
+        summary = {'hash_match': False, 'sample_match': False, 'fetched': 0, 'full_refresh': False}
+
+        expected = self.vehicle_hash()
+        if expected is not None and self.cache.params and self.cache.compute_hash() == expected:
+            summary['hash_match'] = True
+        elif expected is None and self.sample_matches():
+            # No _HASH_CHECK (ArduPilot), but the count and every sampled value still agree
+            summary['sample_match'] = True
+            summary['fetched'] = min(SAMPLE_SIZE, self.cache.count)
+        elif expected is None:
+            # Unvalidated: re-read everything from scratch, over FTP when the autopilot offers it
+            summary['full_refresh'] = True
+            self.cache.clear()
+            if not (self.use_ftp and self.fetch_ftp()):
+                self.fetch_count()
+                self.fetch_indices(range(1, self.cache.count or 0))
+            summary['fetched'] = self.cache.count or 0
+        else:
+            # Missing or changed values; the hash cannot tell which, so read everything once
+            logger.info("Parameter hash mismatch, re-reading all parameters")
+            summary['full_refresh'] = True
+            self.cache.clear()
+            self.fetch_count()
+            self.fetch_indices(range(1, self.cache.count or 0))
+            summary['fetched'] = self.cache.count or 0
+            if self.cache.complete() and self.cache.compute_hash() != expected:
+                logger.warning("Parameter hash still differs after a full read "
+                               "(a volatile parameter not in VOLATILE_PARAMS?)")
+
+        summary['count'] = self.cache.count
+        summary['missing'] = len(self.cache.missing_indices())
+        summary['seconds'] = time.monotonic() - started
+        self.cache.save()
+        return summary
+
+
+def sync_parameters(master, profile):
+    """Load the vehicle's cache, sync it and return the ParamCache"""
+    version = ensure_autopilot_version(master, profile, fallback=True)
+    cache = ParamCache(master.target_system, firmware_id(version))
+    cache.load()
+    summary = ParamSync(master, cache).sync()
+    logger.info(f"Parameters: {summary['count']} total, {summary['fetched']} fetched, "
+                f"hash match={summary['hash_match']}, sample match={summary['sample_match']} "
+                f"in {summary['seconds']:.2f}s")
+    return cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync vehicle parameters through the local cache')
+    parser.add_argument('--connection', type=str, default='auto',
+                        help='Connection string (e.g., /dev/tty.usbserial-*, udpin:localhost:14551 or auto)')
+    parser.add_argument('--baud', type=int, default=57600,
+                        help='Baud rate for serial connection')
+    parser.add_argument('--save', type=str, default=None,
+                        help='Write the parameters to a .parm file')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    master, profile = open_connection(args.connection, args.baud)
+    if not master:
+        print("Failed to connect")
+        return
+    cache = sync_parameters(master, profile)
+    if args.save:
+        cache.write_parm_file(args.save)
+        print(f"Wrote {len(cache.params)} parameters to {args.save}")
+    master.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Pipelined bulk parameter upload
+
+Applies a .parm file by keeping a window of PARAM_SETs in flight instead
+of waiting for each PARAM_VALUE echo. Echoes are matched by name, lost
+sets are retransmitted after an adaptive timeout (smoothed RTT + 4x
+variance, as TCP does) and the echoed values are checked against what
+was requested.
+
+    python3 param_upload.py tuned.parm --connection auto
+"""
+
+import time
+import struct
+import logging
+import argparse
+
+from pymavlink import mavutil
+from connection_profile import open_connection
+from param_cache import MAX_RETRIES, param_name, sync_parameters
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 8
+RTO_INITIAL = 0.5
+RTO_MIN = 0.1
+RTO_MAX = 3.0
+
+OK = 'ok'
+MISMATCH = 'mismatch'   # Vehicle echoed a different value (rejected or clamped)
+TIMEOUT = 'timeout'
+
+INTEGER_TYPES = (
+    mavutil.mavlink.MAV_PARAM_TYPE_UINT8,
+    mavutil.mavlink.MAV_PARAM_TYPE_INT8,
+    mavutil.mavlink.MAV_PARAM_TYPE_UINT16,
+    mavutil.mavlink.MAV_PARAM_TYPE_INT16,
+    mavutil.mavlink.MAV_PARAM_TYPE_UINT32,
+    mavutil.mavlink.MAV_PARAM_TYPE_INT32,
+)
+
+
+def read_parm_file(path):
+    """Read a MAVProxy/Mission Planner .parm file into {name: value}"""
+    params = {}
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.replace(',', ' ').split()
+            if len(parts) < 2:
+                continue
+            try:
+                params[parts[0]] = float(parts[1])
+            except ValueError:
+                logger.warning(f"Skipping bad line in {path}: {line}")
+    return params
+
+
+def same_value(a, b, param_type):
+    """Compare values the way the vehicle stores them"""
+    if param_type in INTEGER_TYPES:
+        return int(round(a)) == int(round(b))
+    return struct.pack('<f', a) == struct.pack('<f', b)
+
+
+class RetransmitTimer:
+    """Adaptive retransmission timeout from measured round trips"""
+
+    def __init__(self, initial=RTO_INITIAL):
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initial
+
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(RTO_MAX, max(RTO_MIN, self.srtt + 4 * self.rttvar))
+
+    def backoff(self):
+        self.rto = min(RTO_MAX, self.rto * 2)
+
+
+class UploadResult:
+    """Outcome of one parameter write"""
+
+    def __init__(self, name, old, requested, echoed=None, status=TIMEOUT, attempts=0):
+        self.name = name
+        self.old = old
+        self.requested = requested
+        self.echoed = echoed
+        self.status = status
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"UploadResult({self.name}: {self.old} -> {self.requested}, echoed={self.echoed}, {self.status})"
+
+
+class ParamUploader:
+    """Write many parameters with a window of PARAM_SETs in flight"""
+
+    def __init__(self, master, cache=None, window=WINDOW, retries=MAX_RETRIES):
+        self.master = master
+        self.cache = cache
+        self.window = window
+        self.retries = retries
+        self.timer = RetransmitTimer()
+
+    def _param_type(self, name):
+        if self.cache and name in self.cache.params:
+            return self.cache.params[name][1]
+        return mavutil.mavlink.MAV_PARAM_TYPE_REAL32
+
+    def _send(self, name, value):
+        self.master.mav.param_set_send(
+            self.master.target_system, self.master.target_component,
+            name.encode('ascii'), value, self._param_type(name))
+
+    def changed(self, wanted):
+        """Subset of wanted whose value differs from the cache"""
+        if not self.cache:
+            return dict(wanted)
+        result = {}
+        for name, value in wanted.items():
+            entry = self.cache.params.get(name)
+            if entry is None or not same_value(entry[0], value, entry[1]):
+                result[name] = value
+        return result
+
+    def upload(self, params):
+        """Write {name: value}; returns a list of UploadResult"""
+        results = {}
+        for name, value in params.items():
+            entry = self.cache.params.get(name) if self.cache else None
+            results[name] = UploadResult(name, entry[0] if entry else None, value)
+
+        pending = list(params)
+        pending.reverse()
+        in_flight = {}   # name -> sent_at
+
+        while pending or in_flight:
+            while pending and len(in_flight) < self.window:
+                name = pending.pop()
+                self._send(name, params[name])
+                results[name].attempts += 1
+                in_flight[name] = time.monotonic()
+
+            msg = self.master.recv_match(type='PARAM_VALUE', blocking=True, timeout=RTO_MIN / 2)
+            if msg is not None:
+                name = param_name(msg)
+                if self.cache:
+                    self.cache.handle_param_value(msg)
+                sent_at = in_flight.pop(name, None)
+                if sent_at is not None:
+                    result = results[name]
+                    if result.attempts == 1:
+                        # Karn: only time unambiguous round trips
+                        self.timer.sample(time.monotonic() - sent_at)
+                    result.echoed = msg.param_value
+                    result.status = OK if same_value(msg.param_value, result.requested,
+                                                     msg.param_type) else MISMATCH
+
+            now = time.monotonic()
+            expired = [name for name, sent_at in in_flight.items() if now - sent_at >= self.timer.rto]
+            if expired:
+                # One backoff per sweep, however many sets were lost together
+                self.timer.backoff()
+            for name in expired:
+                result = results[name]
+                if result.attempts >= self.retries:
+                    del in_flight[name]
+                    continue
+                self._send(name, params[name])
+                result.attempts += 1
+                in_flight[name] = now
+
+        if self.cache:
+            self.cache.save()
+        return list(results.values())
+
+
+def summarize(results):
+    """One line per parameter that did not verify, plus totals"""
+    lines = []
+    for result in results:
+        if result.status != OK:
+            lines.append(f"  {result.name:<16} {result.old} -> {result.requested}: "
+                         f"{result.status} (echoed {result.echoed}, {result.attempts} attempts)")
+    ok = sum(1 for result in results if result.status == OK)
+    lines.append(f"{ok}/{len(results)} parameters verified")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upload a .parm file to the vehicle')
+    parser.add_argument('file', help='Parameter file (NAME VALUE per line)')
+    parser.add_argument('--connection', type=str, default='auto',
+                        help='Connection string (e.g., /dev/tty.usbserial-*, udpin:localhost:14551 or auto)')
+    parser.add_argument('--baud', type=int, default=57600,
+                        help='Baud rate for serial connection')
+    parser.add_argument('--window', type=int, default=WINDOW,
+                        help='PARAM_SETs in flight at once')
+    parser.add_argument('--all', action='store_true',
+                        help='Send every parameter, not only the changed ones')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    wanted = read_parm_file(args.file)
+    master, profile = open_connection(args.connection, args.baud)
+    if not master:
+        print("Failed to connect")
+        return
+
+    cache = sync_parameters(master, profile)
+    uploader = ParamUploader(master, cache, window=args.window)
+    params = wanted if args.all else uploader.changed(wanted)
+    unknown = [name for name in params if name not in cache.params]
+    if unknown:
+        logger.warning(f"{len(unknown)} parameter(s) not on the vehicle: {', '.join(unknown[:10])}")
+
+    started = time.monotonic()
+    results = uploader.upload(params)
+    print(summarize(results))
+    print(f"Uploaded {len(params)} of {len(wanted)} parameters in {time.monotonic() - started:.2f}s "
+          f"(rto {uploader.timer.rto * 1000:.0f} ms)")
+    master.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,13 @@ import logging
 import serial
 from pymavlink import mavutil
 import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calibrating'))
+from mavlink_autodetect import resolve_serial
+from stream_profiles import StreamManager
+from statustext_classifier import StatusTextAssembler, classify, outcome, STARTED, PROGRESS, FAILURE
 
 # Configure logging
 logging.basicConfig(
@@ -26,6 +33,7 @@ class PixhawkCalibrator:
 
     def connect(self, retries=3, retry_delay=5):
         """Establish connection to Pixhawk with retry mechanism"""
+        self.port, self.baud = resolve_serial(self.port, self.baud)
         for attempt in range(retries):
             try:
                 logger.info(f"Connecting to {self.port} at {self.baud} baud (attempt {attempt + 1}/{retries})")
@@ -83,28 +91,11 @@ class PixhawkCalibrator:
                 'failure_detected': False
             }
 
-            # Request all possible message streams
-            logger.info("Requesting data streams...")
-            streams = [
-                mavutil.mavlink.MAV_DATA_STREAM_ALL,
-                mavutil.mavlink.MAV_DATA_STREAM_RAW_SENSORS,
-                mavutil.mavlink.MAV_DATA_STREAM_EXTENDED_STATUS,
-                mavutil.mavlink.MAV_DATA_STREAM_RC_CHANNELS,
-                mavutil.mavlink.MAV_DATA_STREAM_POSITION,
-                mavutil.mavlink.MAV_DATA_STREAM_EXTRA1,
-                mavutil.mavlink.MAV_DATA_STREAM_EXTRA2,
-                mavutil.mavlink.MAV_DATA_STREAM_EXTRA3
-            ]
-
-            for stream in streams:
-                self.master.mav.request_data_stream_send(
-                    self.master.target_system,
-                    self.master.target_component,
-                    stream,
-                    10,  # 10Hz
-                    1    # Start
-                )
-                logger.info(f"Requested stream {stream}")
+            # Only the sensor messages calibration needs
+            logger.info("Requesting calibration streams...")
+            streams = StreamManager(self.master)
+            streams.apply('calibration')
+            streams.settle()   # Reads the interval ACKs; there is no receive loop yet
 
             # Small delay to let streams start
             time.sleep(1)
@@ -130,13 +121,10 @@ class PixhawkCalibrator:
         """Monitor calibration status messages"""
         logger.info(f"Monitoring {sensor_type} calibration progress for up to {timeout} seconds...")
         
-        # Keywords for success and failure
-        success_keywords = ["success", "complete", "finished", "done", "pass", "completed", "calibration done"]
-        failure_keywords = ["fail", "failed", "error", "aborted", "timeout"]
-
         start_time = time.time()
         last_message_time = start_time
         messages_received = []
+        assembler = StatusTextAssembler()
 
         while time.time() - start_time < timeout:
             try:
@@ -156,40 +144,29 @@ class PixhawkCalibrator:
                 # Handle all message types
                 if msg_type in ['STATUSTEXT', 'COMMAND_ACK', 'COMMAND_LONG', 'HEARTBEAT']:
                     if msg_type == 'STATUSTEXT':
-                        try:
-                            text = msg.text.decode('utf-8', errors='ignore').strip() if isinstance(msg.text, bytes) else msg.text.strip()
-                            messages_received.append(text)
-                            logger.info(f"Message: {text}")
-                            text_lower = text.lower()
-                            
-                            # Check for calibration start
-                            if sensor_type in text_lower and ("calibration" in text_lower or "calibrating" in text_lower):
+                        text = assembler.add(msg)
+                        if text is None:
+                            continue
+                        messages_received.append(text)
+                        logger.info(f"Message: {text}")
+
+                        events = classify(text)
+                        for event in events:
+                            if event.kind == STARTED:
                                 self.calibration_states['started'] = True
                                 logger.info(f"{sensor_type} calibration process detected as started")
-                            
-                            # Parse progress
-                            if "progress" in text_lower:
-                                try:
-                                    progress_val = int(''.join(filter(str.isdigit, text)) or 0)
-                                    self.calibration_states['progress'] = progress_val
-                                    logger.info(f"Calibration progress: {progress_val}%")
-                                except ValueError:
-                                    pass
-                            
-                            # Check for success/failure
-                            if any(s in text_lower for s in success_keywords):
-                                logger.info(f"Calibration success detected: '{text}'")
-                                self.calibration_states['success'] = True
-                                return True
-                            
-                            if any(s in text_lower for s in failure_keywords):
+                            elif event.kind == PROGRESS:
+                                self.calibration_states['progress'] = event.value
+                                logger.info(f"Calibration progress: {event.value}%")
+                            elif event.kind == FAILURE:
                                 logger.error(f"Calibration failure detected: '{text}'")
                                 self.calibration_states['failure_detected'] = True
                                 return False
 
-                        except Exception as e:
-                            logger.warning(f"Error processing STATUSTEXT: {e}")
-                            continue
+                        if outcome(events):
+                            logger.info(f"Calibration success detected: '{text}'")
+                            self.calibration_states['success'] = True
+                            return True
 
                     elif msg_type == 'COMMAND_ACK':
                         logger.info(f"Command acknowledgment received: command={msg.command}, result={msg.result}")
@@ -243,7 +220,7 @@ class PixhawkCalibrator:
 def main():
     parser = argparse.ArgumentParser(description='Pixhawk Sensor Calibration Tool')
     parser.add_argument('--port', type=str, default='/dev/tty.usbmodem01',
-                        help='Serial port for Pixhawk connection')
+                        help='Serial port for Pixhawk connection (or auto)')
     parser.add_argument('--baud', type=int, default=115200,
                         help='Baud rate for serial connection')
     parser.add_argument('--sensor', type=str, choices=['gyro', 'accel', 'mag', 'level'],
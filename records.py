@@ -0,0 +1,262 @@
+"""
+Compact storage for retained MAVLink messages
+
+A pymavlink message object carries its header, packed buffer, payload
+and a __dict__, so holding minutes of samples costs hundreds of bytes
+each. The types here are generated from the dialect definition instead:
+
+    record_class(type)   __slots__ class with just the fields, duck-typed
+                         like a message (get_type(), to_dict(), attributes)
+    record_dtype(type)   NumPy structured dtype with the wire field types
+    RecordRing(type, n)  last n records in one preallocated structured array;
+                         view() returns the newest samples oldest-first as a
+                         slice of the buffer, not a copy
+    RecordStore          one RecordRing per message type seen; add() and the
+                         copying readers (latest_dict(), columns(), copy())
+                         share a lock, so a receive thread can write while
+                         request threads read
+
+    store = RecordStore(capacity=15000)         # 5 min at 50 Hz
+    store.add(msg, clock.unified_time_us(msg))
+    gyro = store['RAW_IMU'].view(500)['xgyro']  # last 10 s, no copy
+"""
+
+import time
+import functools
+import threading
+
+import numpy as np
+from pymavlink.dialects.v20 import ardupilotmega as dialect
+
+CAPACITY = 15000        # Records per type, five minutes at 50 Hz
+
+# MAVLink wire types -> NumPy (little-endian, as on the wire)
+DTYPES = {
+    'float': '<f4',
+    'double': '<f8',
+    'int8_t': 'i1',
+    'uint8_t': 'u1',
+    'uint8_t_mavlink_version': 'u1',
+    'int16_t': '<i2',
+    'uint16_t': '<u2',
+    'int32_t': '<i4',
+    'uint32_t': '<u4',
+    'int64_t': '<i8',
+    'uint64_t': '<u8',
+}
+
+
+def _message_class(msg_type):
+    try:
+        return getattr(dialect, f'MAVLink_{msg_type.lower()}_message')
+    except AttributeError:
+        raise KeyError(f"Unknown MAVLink message type: {msg_type}") from None
+
+
+def message_fields(msg_type):
+    """[(name, wire type, array length)] in the dialect's field order"""
+    cls = _message_class(msg_type)
+    lengths = dict(zip(cls.ordered_fieldnames, cls.array_lengths))
+    return [(name, ftype, lengths.get(name, 0)) for name, ftype in zip(cls.fieldnames, cls.fieldtypes)]
+
+
+def message_time_us(msg):
+    stamp = getattr(msg, '_timestamp', None) or time.time()
+    return int(stamp * 1e6)
+
+
+class Record:
+    """Base for generated records; time_us is the receive (or unified) time"""
+
+    __slots__ = ('time_us',)
+    msg_type = None
+    fields = ()
+
+    def __init__(self, *values, time_us=0):
+        self.time_us = time_us
+        for name, value in zip(self.fields, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_msg(cls, msg, time_us=None):
+        record = cls.__new__(cls)
+        record.time_us = message_time_us(msg) if time_us is None else time_us
+        for name in cls.fields:
+            value = getattr(msg, name)
+            setattr(record, name, tuple(value) if isinstance(value, list) else value)
+        return record
+
+    def get_type(self):
+        return self.msg_type
+
+    def to_dict(self):
+        """Same shape as pymavlink's msg.to_dict()"""
+        d = {'mavpackettype': self.msg_type}
+        for name in self.fields:
+            value = getattr(self, name)
+            d[name] = list(value) if isinstance(value, tuple) else value
+        return d
+
+    def __repr__(self):
+        body = ', '.join(f'{name}: {getattr(self, name)}' for name in self.fields)
+        return f'{self.msg_type} {{{body}}}'
+
+
+@functools.lru_cache(maxsize=None)
+def record_class(msg_type):
+    """__slots__ record class for a message type, generated once from the dialect"""
+    names = tuple(name for name, _, _ in message_fields(msg_type))
+    class_name = ''.join(part.title() for part in msg_type.split('_')) + 'Record'
+    return type(class_name, (Record,), {'__slots__': names, 'msg_type': msg_type, 'fields': names})
+
+
+def compact(msg):
+    """Slot record for a message, or the message itself for types the dialect does not define"""
+    try:
+        return record_class(msg.get_type()).from_msg(msg)
+    except KeyError:
+        return msg
+
+
+@functools.lru_cache(maxsize=None)
+def record_dtype(msg_type):
+    """Packed structured dtype: time_us followed by the message fields"""
+    layout = [('time_us', '<i8')]
+    for name, ftype, length in message_fields(msg_type):
+        if ftype == 'char':
+            layout.append((name, f'S{max(length, 1)}'))
+        elif length:
+            layout.append((name, DTYPES[ftype], (length,)))
+        else:
+            layout.append((name, DTYPES[ftype]))
+    return np.dtype(layout)
+
+
+class Ring:
+    """Fixed-capacity ring of structured rows with contiguous, zero-copy views
+
+    Every row is written twice, at i and i + capacity, so the newest n rows
+    are always one contiguous slice of the buffer.
+    """
+
+    def __init__(self, dtype, capacity):
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self._buf = np.zeros(2 * capacity, dtype=self.dtype)
+        self._head = 0       # Next slot to write
+        self.count = 0       # Rows ever appended
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def nbytes(self):
+        return self._buf.nbytes
+
+    def append_row(self, row):
+        self._buf[self._head] = row
+        self._buf[self._head + self.capacity] = row
+        self._head = (self._head + 1) % self.capacity
+        self.count += 1
+
+    def clear(self):
+        self._head = 0
+        self.count = 0
+
+    def view(self, n=None):
+        """The newest n rows (all by default), oldest first, as a view into the buffer"""
+        size = len(self)
+        n = size if n is None else max(0, min(n, size))
+        end = self._head + self.capacity
+        return self._buf[end - n:end]
+
+    def latest(self):
+        """Newest row as a structured scalar (a view), or None"""
+        if not self.count:
+            return None
+        return self._buf[self._head + self.capacity - 1]
+
+
+class RecordRing(Ring):
+    """Ring of one message type in its record_dtype"""
+
+    def __init__(self, msg_type, capacity=CAPACITY):
+        super().__init__(record_dtype(msg_type), capacity)
+        self.msg_type = msg_type
+        fields = message_fields(msg_type)
+        self._names = [name for name, _, _ in fields]
+        self._chars = [i for i, (_, ftype, _) in enumerate(fields) if ftype == 'char']
+
+    def append(self, msg, time_us=None):
+        values = [getattr(msg, name) for name in self._names]
+        for i in self._chars:
+            if isinstance(values[i], str):
+                values[i] = values[i].encode('utf-8', 'replace')
+        self.append_row((message_time_us(msg) if time_us is None else time_us, *values))
+
+    def to_dict(self, row=None):
+        """msg.to_dict() shape for a row (the newest by default)"""
+        row = self.latest() if row is None else row
+        if row is None:
+            return None
+        d = {'mavpackettype': self.msg_type}
+        for name in self._names:
+            value = row[name]
+            if isinstance(value, bytes):
+                value = value.decode('utf-8', 'replace')
+            d[name] = value.tolist() if hasattr(value, 'tolist') else value
+        return d
+
+    def columns(self, n=None):
+        """{field: list} for the newest n rows, for JSON responses"""
+        rows = self.view(n)
+        return {name: rows[name].tolist() for name in self.dtype.names}
+
+
+class RecordStore:
+    """Per-type RecordRings, created on first sight of a type"""
+
+    def __init__(self, capacity=CAPACITY, capacities=None):
+        self.capacity = capacity
+        self.capacities = capacities or {}    # Per-type overrides, e.g. {'HEARTBEAT': 300}
+        self.rings = {}
+        self.lock = threading.Lock()
+
+    def add(self, msg, time_us=None):
+        msg_type = msg.get_type()
+        ring = self.rings.get(msg_type)
+        if ring is None:
+            try:
+                ring = RecordRing(msg_type, self.capacities.get(msg_type, self.capacity))
+            except KeyError:
+                return None
+            with self.lock:
+                self.rings[msg_type] = ring
+        with self.lock:
+            ring.append(msg, time_us)
+        return ring
+
+    def __contains__(self, msg_type):
+        return msg_type in self.rings and self.rings[msg_type].count > 0
+
+    def __getitem__(self, msg_type):
+        return self.rings[msg_type]
+
+    def latest_dict(self, msg_type):
+        with self.lock:
+            ring = self.rings.get(msg_type)
+            return ring.to_dict() if ring is not None else None
+
+    def columns(self, msg_type, n=None):
+        """RecordRing.columns() taken under the lock"""
+        with self.lock:
+            return self.rings[msg_type].columns(n)
+
+    def copy(self, msg_type, n=None):
+        """The newest n rows as a copy, safe to use while add() carries on"""
+        with self.lock:
+            return self.rings[msg_type].view(n).copy()
+
+    @property
+    def nbytes(self):
+        return sum(ring.nbytes for ring in self.rings.values())
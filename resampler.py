@@ -0,0 +1,260 @@
+"""
+Fixed-rate resampling of the telemetry stream into aligned snapshots
+
+Each message type keeps a short ring of (time, values) in preallocated
+arrays. On every tick the Resampler evaluates all fields at the same
+instant, a little behind real time so both neighbours of continuous
+fields are usually in: continuous fields are linearly interpolated
+(angles along the short way round), discrete ones such as HEARTBEAT
+modes are sample-and-hold. The result is written into one preallocated
+value array and returned in the TelemetrySnapshot shape the history API
+stores, so producing a snapshot no longer means reading eight files.
+
+    resampler = Resampler(rate=10)
+    resampler.add(msg, clock.unified_time_us(msg))   # for every message
+    snapshot = resampler.poll()                      # None until a tick is due
+
+With derived telemetry running, Resampler(sources=DERIVED_SOURCES) takes
+rangefinder.distance from ALTITUDE_AGL (fed with add_values()) instead of
+the raw RANGEFINDER/DISTANCE_SENSOR readings, so the aligned snapshot and
+the per-file path serve the same tilt-corrected height.
+"""
+
+import math
+import time
+from array import array
+from datetime import datetime, timezone
+
+RATE_HZ = 10
+DELAY_MS = 150          # Evaluate this far behind the newest data so both neighbours exist
+BUFFER_SIZE = 16        # Samples kept per message type
+STALE_S = 3.0           # A type with nothing newer than this is left out of snapshots
+
+LINEAR = 'linear'
+ANGLE = 'angle'
+HOLD = 'hold'
+
+
+def _first_voltage(msg):
+    voltages = getattr(msg, 'voltages', None) or [0]
+    return voltages[0]
+
+
+# message type -> [(snapshot field, attribute or callable, mode)]; units as in params/*.json
+SOURCES = {
+    'ATTITUDE': [
+        ('time_boot_ms', 'time_boot_ms', LINEAR),
+        ('attitude.roll', 'roll', ANGLE),
+        ('attitude.pitch', 'pitch', ANGLE),
+        ('attitude.yaw', 'yaw', ANGLE),
+        ('attitude.rollspeed', 'rollspeed', LINEAR),
+        ('attitude.pitchspeed', 'pitchspeed', LINEAR),
+        ('attitude.yawspeed', 'yawspeed', LINEAR),
+    ],
+    'LOCAL_POSITION_NED': [
+        ('position.x', 'x', LINEAR),
+        ('position.y', 'y', LINEAR),
+        ('position.z', 'z', LINEAR),
+        ('velocity.vx', 'vx', LINEAR),
+        ('velocity.vy', 'vy', LINEAR),
+        ('velocity.vz', 'vz', LINEAR),
+    ],
+    'GLOBAL_POSITION_INT': [
+        ('position.lat', 'lat', LINEAR),
+        ('position.lon', 'lon', LINEAR),
+        ('position.alt', 'alt', LINEAR),
+        ('position.relative_alt', 'relative_alt', LINEAR),
+    ],
+    'RAW_IMU': [
+        ('imu.' + field, field, LINEAR)
+        for field in ('xacc', 'yacc', 'zacc', 'xgyro', 'ygyro', 'zgyro', 'xmag', 'ymag', 'zmag')
+    ],
+    'BATTERY_STATUS': [
+        ('battery.voltage', _first_voltage, LINEAR),
+        ('battery.current', 'current_battery', LINEAR),
+        ('battery.remaining', 'battery_remaining', HOLD),
+        ('battery.temperature', 'temperature', HOLD),
+    ],
+    'RANGEFINDER': [
+        ('rangefinder.distance', 'distance', LINEAR),
+    ],
+    'DISTANCE_SENSOR': [
+        ('rangefinder.distance', 'current_distance', LINEAR),
+    ],
+    'HEARTBEAT': [
+        ('heartbeat.system_status', 'system_status', HOLD),
+        ('heartbeat.base_mode', 'base_mode', HOLD),
+        ('heartbeat.custom_mode', 'custom_mode', HOLD),
+    ],
+}
+
+
+def _sensor_altitude(values):
+    """ALTITUDE_AGL's tilt-corrected height, or None while it is only relative altitude"""
+    return values['altitude'] if values['source'] != 'RELATIVE_ALT' else None
+
+
+# The raw sensor readings give way to the derived height above ground
+DERIVED_SOURCES = {msg_type: fields for msg_type, fields in SOURCES.items()
+                   if msg_type not in ('RANGEFINDER', 'DISTANCE_SENSOR')}
+DERIVED_SOURCES['ALTITUDE_AGL'] = [('rangefinder.distance', _sensor_altitude, LINEAR)]
+
+
+class _Stream:
+    """Ring of the last BUFFER_SIZE samples of one message type"""
+
+    def __init__(self, fields, slots):
+        self.fields = fields
+        self.slots = slots                  # Index of each field in the output array
+        self.modes = [mode for _, _, mode in fields]
+        self.width = len(fields)
+        self.times = array('q', bytes(8 * BUFFER_SIZE))
+        self.values = array('d', bytes(8 * BUFFER_SIZE * self.width))
+        self.count = 0
+
+    def add(self, msg, time_us):
+        if self.count and time_us <= self.times[(self.count - 1) % BUFFER_SIZE]:
+            return   # Duplicate or out of order
+        slot = self.count % BUFFER_SIZE
+        base = slot * self.width
+        for i, (_, getter, _) in enumerate(self.fields):
+            value = getter(msg) if callable(getter) else getattr(msg, getter, 0)
+            if value is None:
+                # The source stopped providing this field: drop out of snapshots now
+                self.count = 0
+                return
+            self.values[base + i] = value
+        self.times[slot] = time_us
+        self.count += 1
+
+    def newest_time(self):
+        return self.times[(self.count - 1) % BUFFER_SIZE]
+
+    def sample(self, t_us, out):
+        """Write every field at t_us into out; False if there is no data yet"""
+        if not self.count:
+            return False
+        n = min(self.count, BUFFER_SIZE)
+        newest = self.count - 1
+        # Walk back to the newest sample at or before t_us
+        i = newest
+        while i > self.count - n and self.times[i % BUFFER_SIZE] > t_us:
+            i -= 1
+        before = i % BUFFER_SIZE
+        t0 = self.times[before]
+        base0 = before * self.width
+        if i == newest or t0 > t_us:
+            # Nothing to interpolate towards: hold the nearest sample
+            for f in range(self.width):
+                out[self.slots[f]] = self.values[base0 + f]
+            return True
+
+        after = (i + 1) % BUFFER_SIZE
+        base1 = after * self.width
+        frac = (t_us - t0) / (self.times[after] - t0)
+        for f in range(self.width):
+            v0 = self.values[base0 + f]
+            mode = self.modes[f]
+            if mode == HOLD:
+                out[self.slots[f]] = v0
+                continue
+            delta = self.values[base1 + f] - v0
+            if mode == ANGLE:
+                delta = (delta + math.pi) % (2 * math.pi) - math.pi
+                value = v0 + delta * frac
+                out[self.slots[f]] = (value + math.pi) % (2 * math.pi) - math.pi
+            else:
+                out[self.slots[f]] = v0 + delta * frac
+        return True
+
+
+class Resampler:
+    """Aligned telemetry snapshots at a fixed rate from the live message stream"""
+
+    def __init__(self, rate=RATE_HZ, delay_ms=DELAY_MS, sources=SOURCES):
+        self.period_us = int(1e6 / rate)
+        self.delay_us = int(delay_ms * 1000)
+        self.names = []
+        self.discrete = set()     # Output slots reported as integers
+        index = {}
+        for fields in sources.values():
+            for name, _, mode in fields:
+                if name not in index:
+                    index[name] = len(self.names)
+                    self.names.append(name)
+                if mode == HOLD:
+                    self.discrete.add(index[name])
+        self.streams = {
+            msg_type: _Stream(fields, [index[name] for name, _, _ in fields])
+            for msg_type, fields in sources.items()
+        }
+        self.values = array('d', bytes(8 * len(self.names)))
+        self.valid = bytearray(len(self.names))
+        self.next_tick = None
+        self.emitted = 0
+
+    def add(self, msg, time_us):
+        stream = self.streams.get(msg.get_type())
+        if stream is not None:
+            stream.add(msg, time_us)
+
+    def add_values(self, name, values, time_us):
+        """Like add() for a derived type's output dict (see derived.py)"""
+        stream = self.streams.get(name)
+        if stream is not None:
+            stream.add(values, time_us)
+
+    def sample(self, t_us):
+        """Fill self.values/self.valid with every field at t_us"""
+        valid = self.valid
+        for i in range(len(valid)):
+            valid[i] = 0
+        stale_before = t_us - int(STALE_S * 1e6)
+        # Earlier sources win a shared field (DISTANCE_SENSOR only backs up RANGEFINDER)
+        for stream in self.streams.values():
+            if not stream.count or stream.newest_time() < stale_before:
+                continue
+            keep = [(slot, self.values[slot]) for slot in stream.slots if valid[slot]]
+            if len(keep) == stream.width:
+                continue
+            stream.sample(t_us, self.values)
+            for slot, value in keep:
+                self.values[slot] = value
+            for slot in stream.slots:
+                valid[slot] = 1
+
+    def poll(self, now_us=None):
+        """The snapshot for the current tick if one is due, else None"""
+        now_us = int(time.time() * 1e6) if now_us is None else now_us
+        t_us = now_us - self.delay_us
+        if self.next_tick is None:
+            self.next_tick = t_us - t_us % self.period_us
+        if t_us < self.next_tick:
+            return None
+        tick = self.next_tick
+        # Fall behind by at most one tick rather than emitting a burst
+        self.next_tick = max(tick + self.period_us, t_us - t_us % self.period_us)
+        self.sample(tick)
+        self.emitted += 1
+        return self.snapshot(tick)
+
+    def snapshot(self, t_us):
+        """Current values in the history API's TelemetrySnapshot layout"""
+        snapshot = {
+            'timestamp': datetime.fromtimestamp(t_us / 1e6, timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'time_unix_us': t_us,
+        }
+        for i, name in enumerate(self.names):
+            if name == 'time_boot_ms':
+                snapshot[name] = int(self.values[i]) if self.valid[i] else 0
+                continue
+            group, field = name.split('.')
+            if self.valid[i]:
+                value = self.values[i]
+                snapshot.setdefault(group, {})[field] = int(value) if i in self.discrete else value
+        # A group that is present has every field, like the per-file snapshot
+        for i, name in enumerate(self.names):
+            group, _, field = name.partition('.')
+            if field and group in snapshot:
+                snapshot[group].setdefault(field, 0)
+        return snapshot
@@ -0,0 +1,240 @@
+"""
+Safe-spot geometry on the live position stream
+
+SpotIndex keeps the safe spots in a uniform grid of CELL_SIZE metre
+cells, so nearest-spot and within-radius queries only look at the cells
+around the vehicle instead of every spot, and update() applies only the
+spots that were added, moved or removed. Arena is the competition
+boundary polygon with a bounding-box reject in front of the crossing
+test. SafeSpotService ties them to LOCAL_POSITION_NED or
+GLOBAL_POSITION_INT and returns a SAFE_SPOT_STATUS telemetry dict per
+position update.
+
+Spots and arena corners can be given in metres ({'name', 'x', 'y'}, as
+in telemetry_simulator.py) or in degrees ({'id'/'name', 'lat',
+'lng'/'lon'}, as from the Jetson and public/safe-spots-data.json).
+"""
+
+import json
+import math
+import logging
+
+import numpy as np
+
+from geodetic import LocalTangentPlane
+
+logger = logging.getLogger(__name__)
+
+CELL_SIZE = 2.0         # Metres per grid cell, about the spacing of detected spots
+WITHIN_RADIUS = 3.0     # Default radius for SAFE_SPOT_STATUS.within
+MAX_RING = 64           # Scan all spots rather than search further out than this
+
+
+def spot_id(spot, index=0):
+    return str(spot.get('id') or spot.get('name') or f'spot{index + 1}')
+
+
+class SpotIndex:
+    """Uniform grid over safe spots in local metres"""
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.spots = {}      # id -> (x, y)
+        self.cells = {}      # (cx, cy) -> [id, ...]
+        self.version = 0
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def add(self, sid, x, y):
+        if sid in self.spots:
+            if self.spots[sid] == (x, y):
+                return False
+            self.remove(sid)
+        self.spots[sid] = (x, y)
+        self.cells.setdefault(self._cell(x, y), []).append(sid)
+        return True
+
+    def remove(self, sid):
+        position = self.spots.pop(sid, None)
+        if position is None:
+            return False
+        cell = self._cell(*position)
+        members = self.cells[cell]
+        members.remove(sid)
+        if not members:
+            del self.cells[cell]
+        return True
+
+    def update(self, spots):
+        """Replace the set with {id: (x, y)}, touching only what changed; returns the change count"""
+        changed = sum(self.remove(sid) for sid in list(self.spots) if sid not in spots)
+        changed += sum(self.add(sid, x, y) for sid, (x, y) in spots.items())
+        if changed:
+            self.version += 1
+        return changed
+
+    def nearest(self, x, y):
+        """(id, distance) of the closest spot, or (None, None)"""
+        if not self.spots:
+            return None, None
+        cx, cy = self._cell(x, y)
+        best, best_d2 = None, math.inf
+        ring = 0
+        # Once the rings cover more cells than are occupied, a plain scan is cheaper
+        while ring <= MAX_RING and (2 * ring + 1) ** 2 <= 4 * len(self.cells):
+            for cell in self._ring(cx, cy, ring):
+                for sid in self.cells.get(cell, ()):
+                    sx, sy = self.spots[sid]
+                    d2 = (sx - x) ** 2 + (sy - y) ** 2
+                    if d2 < best_d2:
+                        best, best_d2 = sid, d2
+            # Anything in a further ring is at least ring * cell_size away
+            if best is not None and best_d2 <= (ring * self.cell_size) ** 2:
+                return best, math.sqrt(best_d2)
+            ring += 1
+        for sid, (sx, sy) in self.spots.items():
+            d2 = (sx - x) ** 2 + (sy - y) ** 2
+            if d2 < best_d2:
+                best, best_d2 = sid, d2
+        return best, math.sqrt(best_d2)
+
+    @staticmethod
+    def _ring(cx, cy, ring):
+        if ring == 0:
+            yield cx, cy
+            return
+        for i in range(-ring, ring + 1):
+            yield cx + i, cy - ring
+            yield cx + i, cy + ring
+        for j in range(-ring + 1, ring):
+            yield cx - ring, cy + j
+            yield cx + ring, cy + j
+
+    def within(self, x, y, radius):
+        """[(id, distance)] of spots within radius, nearest first"""
+        r2 = radius * radius
+        x0, y0 = self._cell(x - radius, y - radius)
+        x1, y1 = self._cell(x + radius, y + radius)
+        found = []
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            cells = [cell for cell in self.cells if x0 <= cell[0] <= x1 and y0 <= cell[1] <= y1]
+        else:
+            cells = [(i, j) for i in range(x0, x1 + 1) for j in range(y0, y1 + 1)]
+        for cell in cells:
+            for sid in self.cells.get(cell, ()):
+                sx, sy = self.spots[sid]
+                d2 = (sx - x) ** 2 + (sy - y) ** 2
+                if d2 <= r2:
+                    found.append((sid, math.sqrt(d2)))
+        found.sort(key=lambda item: item[1])
+        return found
+
+
+class Arena:
+    """Boundary polygon in local metres"""
+
+    def __init__(self, corners):
+        self.corners = list(corners)
+        xs = [x for x, _ in self.corners]
+        ys = [y for _, y in self.corners]
+        self.bounds = (min(xs), min(ys), max(xs), max(ys)) if self.corners else None
+        n = len(self.corners)
+        self.edges = [(self.corners[i], self.corners[(i + 1) % n]) for i in range(n)] if n >= 3 else []
+
+    def contains(self, x, y):
+        if not self.edges:
+            return None
+        min_x, min_y, max_x, max_y = self.bounds
+        if not (min_x <= x <= max_x and min_y <= y <= max_y):
+            return False
+        inside = False
+        for (x0, y0), (x1, y1) in self.edges:
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+                inside = not inside
+        return inside
+
+
+class SafeSpotService:
+    """Nearest spot, spots in range and arena containment per position update"""
+
+    def __init__(self, radius=WITHIN_RADIUS, cell_size=CELL_SIZE):
+        self.radius = radius
+        self.index = SpotIndex(cell_size)
+        self.arena = Arena([])
+        self.frame = None     # LocalTangentPlane when spots are in degrees
+        self.status = None
+
+    def _to_local(self, points):
+        """[(x, y)] in metres (NED north/east when given in degrees) for a list of points"""
+        if not points:
+            return []
+        if 'x' in points[0]:
+            return [(float(p['x']), float(p['y'])) for p in points]
+        lats = np.array([float(p['lat']) for p in points])
+        lons = np.array([float(p.get('lng', p.get('lon'))) for p in points])
+        if self.frame is None:
+            self.frame = LocalTangentPlane.cached(lats[0], lons[0])
+        north, east, _ = self.frame.to_ned(lats, lons)
+        return list(zip(north.tolist(), east.tolist()))
+
+    def set_spots(self, spots):
+        """Load spots (metres or degrees); only changed spots touch the index"""
+        positions = self._to_local(spots)
+        changed = self.index.update({spot_id(spot, i): xy for i, (spot, xy) in enumerate(zip(spots, positions))})
+        if changed:
+            logger.info(f"Safe spots: {len(self.index.spots)} ({changed} changed)")
+        return changed
+
+    def set_arena(self, corners):
+        self.arena = Arena(self._to_local(corners))
+
+    def position(self, msg):
+        """Local (x, y) of a position message in the spots' frame, or None"""
+        msg_type = msg.get_type()
+        if self.frame is None and msg_type == 'LOCAL_POSITION_NED':
+            return msg.x, msg.y
+        if self.frame is not None and msg_type == 'GLOBAL_POSITION_INT' and (msg.lat or msg.lon):
+            north, east, _ = self.frame.point_to_ned_e7(msg.lat, msg.lon)
+            return north, east
+        return None
+
+    def query(self, x, y):
+        nearest, distance = self.index.nearest(x, y)
+        status = {
+            'x': round(x, 3),
+            'y': round(y, 3),
+            'in_arena': self.arena.contains(x, y),
+            'nearest': None,
+            'within': [{'id': sid, 'distance': round(d, 3)} for sid, d in self.index.within(x, y, self.radius)],
+            'radius': self.radius,
+            'spot_count': len(self.index.spots),
+            'version': self.index.version,
+        }
+        if nearest is not None:
+            sx, sy = self.index.spots[nearest]
+            status['nearest'] = {
+                'id': nearest,
+                'distance': round(distance, 3),
+                'bearing': round(math.degrees(math.atan2(sy - y, sx - x)) % 360, 1),
+            }
+        return status
+
+    def handle(self, msg):
+        """SAFE_SPOT_STATUS for a position message, or None for anything else"""
+        position = self.position(msg)
+        if position is None:
+            return None
+        self.status = self.query(*position)
+        self.status['time_boot_ms'] = getattr(msg, 'time_boot_ms', 0)
+        return self.status
+
+    def load(self, path):
+        """Spots from a JSON list, or {'arena': [...], 'safeSpots': [...]} as served by /api/jetson-data"""
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            if data.get('arena'):
+                self.set_arena(data['arena'])
+            data = data.get('safeSpots', [])
+        return self.set_spots(data)
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Push-based ingestion of the Jetson safe-zone data
+
+Replaces the scp copy of /home/nvidia/safe_zone_data.txt on every
+/api/jetson-data request. The companion computer pushes the same text
+format over UDP (one document per datagram) or TCP (4-byte big-endian
+length + document), or a local copy of the file is watched with inotify
+(mtime polling where inotify is not available). Only the lines that
+changed since the last document are parsed; the typed corner and spot
+records are versioned, and clients fetch either the full state or the
+diff since the version they hold:
+
+    GET /safe-zone                      same JSON shape as /api/jetson-data, plus version
+    GET /safe-zone/diff?since=N&wait=5  changes after version N, long-polling up to wait s
+
+Usage:
+    python safe_zone_ingest.py serve --udp 5600 --tcp 5601 --watch temp/safe_zone_data.txt
+    python safe_zone_ingest.py send --udp 127.0.0.1:5600 --spots 200   # stand-in Jetson
+"""
+
+import os
+import re
+import json
+import time
+import random
+import select
+import socket
+import struct
+import logging
+import argparse
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+HTTP_PORT = 8790
+PARAMS_FILE = os.path.join('public', 'params', 'SAFE_ZONE.json')
+DIFF_HISTORY = 256          # Versions a client can fall behind before getting a full snapshot
+MAX_WAIT = 30.0
+TCP_LENGTH = struct.Struct('>I')
+MAX_DOCUMENT = 1 << 20
+
+ARENA = 'arena'
+SPOTS = 'safespots'
+_LINE = re.compile(r'^(Corner\d+|SafeSpot\d+|Spot\d+):\s*\[([0-9.-]+),\s*([0-9.-]+)\]')
+_HEADERS = {'Arena:': ARENA, 'Detected Safe Spots': SPOTS, 'SafeSpots:': SPOTS}
+
+
+class ArenaCorner:
+    __slots__ = ('name', 'lat', 'lng')
+
+    def __init__(self, name, lat, lng):
+        self.name = name
+        self.lat = lat
+        self.lng = lng
+
+    def __eq__(self, other):
+        return isinstance(other, ArenaCorner) and (self.name, self.lat, self.lng) == (other.name, other.lat, other.lng)
+
+    def to_dict(self):
+        return {'lat': self.lat, 'lng': self.lng}
+
+
+class SafeSpot:
+    __slots__ = ('id', 'lat', 'lng')
+
+    def __init__(self, id, lat, lng):
+        self.id = id
+        self.lat = lat
+        self.lng = lng
+
+    def __eq__(self, other):
+        return isinstance(other, SafeSpot) and (self.id, self.lat, self.lng) == (other.id, other.lat, other.lng)
+
+    def to_dict(self):
+        return {'id': self.id, 'lat': self.lat, 'lng': self.lng}
+
+
+def parse_line(line, section):
+    """(section after this line, record or None)"""
+    header = _HEADERS.get(line)
+    if header:
+        return header, None
+    match = _LINE.match(line)
+    if not match:
+        return section, None
+    name, lat, lng = match.group(1), float(match.group(2)), float(match.group(3))
+    if section == ARENA:
+        return section, ArenaCorner(name, lat, lng)
+    if section == SPOTS:
+        return section, SafeSpot(name, lat, lng)
+    return section, None
+
+
+class SafeZoneParser:
+    """Re-parses only the lines that differ from the previous document"""
+
+    def __init__(self):
+        self.lines = []
+        self.parsed = []       # Per line: (section after the line, record or None)
+        self.reparsed = 0      # Lines parsed by the last feed()
+
+    def feed(self, text):
+        """Parse a full document; returns (arena corners, {spot id: SafeSpot})"""
+        lines = [line.strip() for line in text.split('\n')]
+        lines = [line for line in lines if line]
+        old, old_parsed = self.lines, self.parsed
+        shortest = min(len(old), len(lines))
+        prefix = 0
+        while prefix < shortest and old[prefix] == lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < shortest - prefix and old[-1 - suffix] == lines[-1 - suffix]:
+            suffix += 1
+
+        parsed = old_parsed[:prefix]
+        section = parsed[-1][0] if parsed else ''
+        for line in lines[prefix:len(lines) - suffix]:
+            section, record = parse_line(line, section)
+            parsed.append((section, record))
+        self.reparsed = len(lines) - suffix - prefix
+
+        old_start = len(old) - suffix
+        old_section = old_parsed[old_start - 1][0] if old_start else ''
+        if section == old_section:
+            parsed.extend(old_parsed[old_start:])
+        else:
+            # A header changed above the unchanged tail, so its lines mean something else now
+            for line in lines[len(lines) - suffix:]:
+                section, record = parse_line(line, section)
+                parsed.append((section, record))
+            self.reparsed += suffix
+
+        self.lines, self.parsed = lines, parsed
+        arena = [record for _, record in parsed if isinstance(record, ArenaCorner)]
+        spots = {record.id: record for _, record in parsed if isinstance(record, SafeSpot)}
+        return arena, spots
+
+
+class SafeZoneStore:
+    """Versioned arena and safe spots with a bounded history of diffs"""
+
+    def __init__(self, params_file=PARAMS_FILE):
+        self.params_file = params_file
+        self.arena = []
+        self.spots = {}
+        self.version = 0
+        self.updated = None
+        self.received = None
+        self.diffs = deque(maxlen=DIFF_HISTORY)   # (version, arena or None, {id: spot or None})
+        self.changed = threading.Condition()
+
+    def apply(self, arena, spots, source=''):
+        """Record a parsed document; returns True if anything changed"""
+        with self.changed:
+            self.received = time.time()
+            changes = {sid: spot for sid, spot in spots.items() if self.spots.get(sid) != spot}
+            changes.update({sid: None for sid in self.spots if sid not in spots})
+            arena_changed = arena != self.arena
+            if not changes and not arena_changed:
+                return False
+            self.arena = arena
+            self.spots = dict(spots)
+            self.version += 1
+            self.updated = self.received
+            self.diffs.append((self.version, arena if arena_changed else None, changes))
+            self.changed.notify_all()
+        logger.info(f"Safe zone v{self.version} from {source}: {len(spots)} spots, "
+                    f"{len(changes)} changed{', arena changed' if arena_changed else ''}")
+        self._publish()
+        return True
+
+    def _publish(self):
+        if not self.params_file:
+            return
+        tmp = self.params_file + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, self.params_file)
+        except OSError as e:
+            logger.warning(f"Could not write {self.params_file}: {e}")
+
+    def snapshot(self):
+        with self.changed:
+            snapshot = {
+                'arena': [corner.to_dict() for corner in self.arena],
+                'safeSpots': [spot.to_dict() for spot in self.spots.values()],
+                'timestamp': datetime.fromtimestamp(self.updated or time.time(), timezone.utc).isoformat(),
+                'status': 'success' if self.version else 'error',
+                'version': self.version,
+            }
+        if not self.version:
+            snapshot['error'] = 'No safe zone data received yet'
+        return snapshot
+
+    def diff_since(self, since, wait=0.0):
+        """Changes after version since; waits up to wait seconds for one. Full snapshot if since is too old"""
+        with self.changed:
+            if wait > 0 and since >= self.version:
+                self.changed.wait_for(lambda: self.version > since, timeout=min(wait, MAX_WAIT))
+            if since >= self.version:
+                return {'version': self.version, 'since': since, 'full': False,
+                        'arena': None, 'upserts': [], 'removed': []}
+            if not self.diffs or self.diffs[0][0] > since + 1:
+                return dict(self.snapshot(), since=since, full=True)
+            arena, merged = None, {}
+            for version, diff_arena, changes in self.diffs:
+                if version > since:
+                    arena = diff_arena if diff_arena is not None else arena
+                    merged.update(changes)
+            return {
+                'version': self.version,
+                'since': since,
+                'full': False,
+                'arena': [corner.to_dict() for corner in arena] if arena is not None else None,
+                'upserts': [spot.to_dict() for spot in merged.values() if spot is not None],
+                'removed': [sid for sid, spot in merged.items() if spot is None],
+            }
+
+
+class Ingest:
+    """Feeds documents from any source through one parser into the store"""
+
+    def __init__(self, store):
+        self.store = store
+        self.parser = SafeZoneParser()
+        self._lock = threading.Lock()
+
+    def document(self, text, source=''):
+        with self._lock:
+            arena, spots = self.parser.feed(text)
+        return self.store.apply(arena, spots, source)
+
+
+def serve_udp(ingest, port, host='0.0.0.0', stop_event=None):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    logger.info(f"Listening for safe zone datagrams on udp:{host}:{port}")
+    while not (stop_event and stop_event.is_set()):
+        readable, _, _ = select.select([sock], [], [], 0.5)
+        if readable:
+            data, address = sock.recvfrom(65535)
+            ingest.document(data.decode('utf-8', errors='replace'), f'udp:{address[0]}')
+    sock.close()
+
+
+def _tcp_client(ingest, conn, address):
+    source = f'tcp:{address[0]}'
+    buf = b''
+    with conn:
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                return
+            buf += data
+            while len(buf) >= TCP_LENGTH.size:
+                (length,) = TCP_LENGTH.unpack_from(buf)
+                if length > MAX_DOCUMENT:
+                    logger.warning(f"{source}: {length} byte document, dropping connection")
+                    return
+                if len(buf) < TCP_LENGTH.size + length:
+                    break
+                text = buf[TCP_LENGTH.size:TCP_LENGTH.size + length].decode('utf-8', errors='replace')
+                buf = buf[TCP_LENGTH.size + length:]
+                ingest.document(text, source)
+
+
+def serve_tcp(ingest, port, host='0.0.0.0', stop_event=None):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(4)
+    logger.info(f"Listening for safe zone streams on tcp:{host}:{port}")
+    while not (stop_event and stop_event.is_set()):
+        readable, _, _ = select.select([server], [], [], 0.5)
+        if readable:
+            conn, address = server.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=_tcp_client, args=(ingest, conn, address), daemon=True).start()
+    server.close()
+
+
+class _Inotify:
+    """Minimal inotify via ctypes: IN_CLOSE_WRITE / IN_MOVED_TO on one directory"""
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, directory):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self.fd, directory.encode(), self.IN_CLOSE_WRITE | self.IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {directory}')
+
+    def names(self, timeout):
+        """File names written or moved into the directory within timeout"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        data = os.read(self.fd, 65536)
+        names, offset = [], 0
+        while offset < len(data):
+            _, _, _, length = self.EVENT.unpack_from(data, offset)
+            start = offset + self.EVENT.size
+            names.append(data[start:start + length].rstrip(b'\0').decode(errors='replace'))
+            offset = start + length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+def watch_file(ingest, path, poll_interval=0.2, stop_event=None):
+    """Feed path on every change (inotify on Linux, mtime polling elsewhere)"""
+    directory, name = os.path.split(os.path.abspath(path))
+
+    def load():
+        try:
+            with open(path) as f:
+                ingest.document(f.read(), f'file:{name}')
+        except OSError as e:
+            logger.warning(f"Could not read {path}: {e}")
+
+    if os.path.exists(path):
+        load()
+    try:
+        notify = _Inotify(directory)
+    except (OSError, AttributeError) as e:
+        logger.info(f"inotify unavailable ({e}), polling {path}")
+        notify = None
+    logger.info(f"Watching {path}")
+
+    last_mtime = None
+    while not (stop_event and stop_event.is_set()):
+        if notify:
+            if name in notify.names(0.5):
+                load()
+            continue
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime != last_mtime:
+            if last_mtime is not None:
+                load()
+            last_mtime = mtime
+        time.sleep(poll_interval)
+    if notify:
+        notify.close()
+
+
+class _SafeZoneHandler(BaseHTTPRequestHandler):
+    store = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path.rstrip('/')
+        try:
+            if path == '/safe-zone':
+                body = self.store.snapshot()
+            elif path == '/safe-zone/diff':
+                since = int(query.get('since', ['0'])[0])
+                wait = float(query.get('wait', ['0'])[0])
+                body = self.store.diff_since(since, wait)
+            else:
+                self.send_error(404)
+                return
+        except ValueError:
+            self.send_error(400)
+            return
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(store, port=HTTP_PORT, host='0.0.0.0'):
+    handler = type('SafeZoneHandler', (_SafeZoneHandler,), {'store': store})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Safe zone on http://{host}:{port}/safe-zone")
+    return server
+
+
+def format_document(arena, spots):
+    """Text in the safe_zone_data.txt format from [(lat, lng)] corners and spots"""
+    lines = ['Arena:'] + [f'Corner{i + 1}: [{lat:.6f}, {lng:.6f}]' for i, (lat, lng) in enumerate(arena)]
+    lines += ['', 'Detected Safe Spots', 'SafeSpots:']
+    lines += [f'Spot{i + 1}: [{lat:.6f}, {lng:.6f}]' for i, (lat, lng) in enumerate(spots)]
+    return '\n'.join(lines) + '\n'
+
+
+def run_sender(args):
+    """Stand-in Jetson: a fixed arena with spots that appear, drift and disappear"""
+    rng = random.Random(args.seed)
+    arena = [(12.0345, 77.1234), (12.0345, 77.1265), (12.0315, 77.1265), (12.0315, 77.1234)]
+    lat0, lat1, lng0, lng1 = 12.0315, 12.0345, 77.1234, 77.1265
+    spots = [(rng.uniform(lat0, lat1), rng.uniform(lng0, lng1)) for _ in range(args.spots)]
+
+    sock = None
+    if args.udp:
+        host, port = args.udp.rsplit(':', 1)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        target = (host, int(port))
+    elif args.tcp:
+        host, port = args.tcp.rsplit(':', 1)
+        sock = socket.create_connection((host, int(port)))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    sent = 0
+    try:
+        while args.count is None or sent < args.count:
+            # A few spots move each frame, now and then one is lost or found
+            for _ in range(max(1, len(spots) // 20)):
+                if spots:
+                    i = rng.randrange(len(spots))
+                    lat, lng = spots[i]
+                    spots[i] = (lat + rng.gauss(0, 2e-6), lng + rng.gauss(0, 2e-6))
+            if rng.random() < 0.1 and spots:
+                spots.pop()
+            if rng.random() < 0.1:
+                spots.append((rng.uniform(lat0, lat1), rng.uniform(lng0, lng1)))
+
+            document = format_document(arena, spots)
+            if args.udp:
+                sock.sendto(document.encode(), target)
+            elif args.tcp:
+                data = document.encode()
+                sock.sendall(TCP_LENGTH.pack(len(data)) + data)
+            else:
+                tmp = args.file + '.tmp'
+                with open(tmp, 'w') as f:
+                    f.write(document)
+                os.replace(tmp, args.file)
+            sent += 1
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if sock:
+            sock.close()
+    print(f"Sent {sent} documents")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Jetson safe zone ingestion')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Receive safe zone updates and serve them')
+    serve.add_argument('--udp', type=int, default=None, help='UDP port to receive documents on')
+    serve.add_argument('--tcp', type=int, default=None, help='TCP port to receive length-prefixed documents on')
+    serve.add_argument('--watch', type=str, default=None, help='Watch this file (e.g. temp/safe_zone_data.txt)')
+    serve.add_argument('--http', type=int, default=HTTP_PORT, help='Port for /safe-zone and /safe-zone/diff')
+    serve.add_argument('--params-file', type=str, default=PARAMS_FILE,
+                       help='Also write the current state here (empty to disable)')
+
+    send = commands.add_parser('send', help='Stand-in Jetson sender for testing')
+    target = send.add_mutually_exclusive_group(required=True)
+    target.add_argument('--udp', type=str, help='host:port')
+    target.add_argument('--tcp', type=str, help='host:port')
+    target.add_argument('--file', type=str, help='Rewrite this file instead')
+    send.add_argument('--spots', type=int, default=3, help='Initial number of safe spots')
+    send.add_argument('--interval', type=float, default=0.5, help='Seconds between documents')
+    send.add_argument('--count', type=int, default=None, help='Stop after this many documents')
+    send.add_argument('--seed', type=int, default=None)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'send':
+        run_sender(args)
+        return
+
+    if not (args.udp or args.tcp or args.watch):
+        parser.error('serve needs at least one of --udp, --tcp or --watch')
+    if args.params_file:
+        os.makedirs(os.path.dirname(args.params_file) or '.', exist_ok=True)
+    store = SafeZoneStore(args.params_file or None)
+    ingest = Ingest(store)
+    start_http_server(store, args.http)
+    threads = []
+    if args.udp:
+        threads.append(threading.Thread(target=serve_udp, args=(ingest, args.udp), daemon=True))
+    if args.tcp:
+        threads.append(threading.Thread(target=serve_tcp, args=(ingest, args.tcp), daemon=True))
+    if args.watch:
+        threads.append(threading.Thread(target=watch_file, args=(ingest, args.watch), daemon=True))
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,17 @@
-from flask import Flask, jsonify, render_template, send_from_directory
+from flask import Flask, Response, jsonify, render_template, send_from_directory, request
 from pymavlink import mavutil
+from stream_profiles import StreamManager
+from records import RecordStore
+import mavlink_json
+import telemetry_wire
 import threading
 import time
 import os
-import json
 
 app = Flask(__name__)
 
-# Global variables for MAVLink connection
-mavlink_data = {}
+# Recent samples per message type, kept as compact records rather than message objects
+mavlink_data = RecordStore()
 PARAMS_DIR = os.path.join('public', 'params')
 os.makedirs(PARAMS_DIR, exist_ok=True)
 
@@ -54,31 +57,36 @@ def mavlink_listener():
     master.wait_heartbeat()
     print("Heartbeat received")
 
+    # Request the dashboard messages; observe() re-applies them after a reboot
+    # and re-requests any that go stale
+    streams = StreamManager(master)
+    streams.apply('dashboard')
+
     while True:
-        for param_type in PARAM_TYPES:
-            try:
-                # Request data stream
-                master.mav.request_data_stream_send(
-                    master.target_system, master.target_component,
-                    mavutil.mavlink.MAV_DATA_STREAM_ALL, 4, 1)
-                
-                # Get message
-                msg = master.recv_match(type=param_type, blocking=True, timeout=0.5)
-                if msg:
-                    # Update global data
-                    data = msg.to_dict()
-                    mavlink_data[param_type] = data
-                    
-                    # Save to file
-                    file_path = os.path.join(PARAMS_DIR, f"{param_type}.json")
-                    with open(file_path, 'w') as f:
-                        json.dump(data, f, indent=4)
-                    
-                    print(f"Updated {param_type}")
-            except Exception as e:
-                print(f"Error getting {param_type}: {e}")
-        
-        time.sleep(0.1)  # Small delay between cycles
+        try:
+            msg = master.recv_match(blocking=True, timeout=0.5)
+        except Exception as e:
+            print(f"Error receiving MAVLink: {e}")
+            time.sleep(0.1)
+            continue
+        if not msg:
+            continue
+        streams.observe(msg)
+        param_type = msg.get_type()
+        if param_type not in PARAM_TYPES:
+            continue
+        try:
+            # Update global data
+            mavlink_data.add(msg)
+
+            # Save to file (msg.to_dict() as JSON, without building the dict)
+            file_path = os.path.join(PARAMS_DIR, f"{param_type}.json")
+            with open(file_path, 'w') as f:
+                f.write(mavlink_json.dumps(msg))
+
+            print(f"Updated {param_type}")
+        except Exception as e:
+            print(f"Error getting {param_type}: {e}")
 
 # Flask routes
 @app.route('/')
@@ -88,9 +96,31 @@ def index():
 @app.route('/api/mavlink/<param_type>')
 def get_mavlink_data(param_type):
     if param_type in mavlink_data:
-        return jsonify(mavlink_data[param_type])
+        if telemetry_wire.wants_binary(request.headers.get('Accept')):
+            return binary_response(param_type, 1)
+        return jsonify(mavlink_data.latest_dict(param_type))
+    return jsonify({'error': 'Parameter not found'}), 404
+
+@app.route('/api/mavlink/<param_type>/history')
+def get_mavlink_history(param_type):
+    if param_type in mavlink_data:
+        n = request.args.get('n', default=None, type=int)
+        if telemetry_wire.wants_binary(request.headers.get('Accept')):
+            return binary_response(param_type, n)
+        return jsonify(mavlink_data.columns(param_type, n))
     return jsonify({'error': 'Parameter not found'}), 404
 
+def binary_response(param_type, n):
+    """The newest n records as telemetry_wire columns, projected to ?fields=a,b"""
+    # A copy: the MAVLink thread keeps writing the ring while this request encodes it
+    rows = mavlink_data.copy(param_type, n)
+    try:
+        payload = telemetry_wire.encode_columns(param_type, rows['time_us'], rows,
+                                                telemetry_wire.parse_fields(request.args.get('fields')))
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(payload, mimetype=telemetry_wire.MIME_TYPE)
+
 @app.route('/params/<path:filename>')
 def serve_param_file(filename):
     return send_from_directory(PARAMS_DIR, filename)
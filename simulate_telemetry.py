@@ -12,6 +12,8 @@ import random
 import os
 from datetime import datetime
 
+from geodetic import LocalTangentPlane
+
 class TelemetrySimulator:
     def __init__(self):
         # File paths
@@ -165,15 +167,14 @@ class TelemetrySimulator:
         base_lat = 37774900  # San Francisco area (in 1e7 degrees)
         base_lon = -122419400
         
-        # Convert meters to GPS degrees (very rough approximation)
-        lat_offset = int(self.current_y * 89.83)  # ~111m per degree
-        lon_offset = int(self.current_x * 111.32)
+        # x is east and y is north of the base point
+        lat, lon, _ = LocalTangentPlane.from_e7(base_lat, base_lon).from_ned_e7(self.current_y, self.current_x)
         
         data = {
             "mavpackettype": "GLOBAL_POSITION_INT", 
             "time_boot_ms": self.time_boot_ms,
-            "lat": base_lat + lat_offset,
-            "lon": base_lon + lon_offset,
+            "lat": int(lat),
+            "lon": int(lon),
             "alt": int(self.current_z * 1000) + 260,  # Convert to mm
             "relative_alt": int(-self.current_z * 1000) + 1698,
             "vx": 0,
@@ -0,0 +1,190 @@
+"""
+Stage timing for the ingest loops
+
+Optional perf_counter_ns instrumentation of receive, decode, transform,
+serialise and write. Each stage records into a preallocated log-linear
+(HDR-style) histogram, and messages slower than a threshold are kept in
+a small trace ring with their per-stage breakdown. Loops hold None
+instead of a profiler when profiling is off, so the disabled cost is an
+`if` per stage.
+
+Enable with --profile-stages (listen.py) or SKYSYNC_PROFILE=1, then dump
+with `kill -USR1 <pid>` or GET /profile on the metrics port.
+"""
+
+import os
+import json
+import signal
+import logging
+import threading
+from array import array
+from collections import deque
+from time import perf_counter_ns
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('receive', 'decode', 'transform', 'serialise', 'write')
+
+SUB_BITS = 4                      # 16 sub-buckets per power of two, ~6% resolution
+SUB_COUNT = 1 << SUB_BITS
+MAX_SHIFT = 32                    # Values up to ~2^37 ns (over two minutes)
+BUCKETS = SUB_COUNT * (MAX_SHIFT + 2)
+
+SLOW_THRESHOLD_MS = 5.0
+TRACE_SIZE = 64
+DUMP_FILE = 'stage_profile.json'
+
+
+def bucket_index(ns):
+    if ns < 2 * SUB_COUNT:
+        return max(ns, 0)
+    shift = min(ns.bit_length() - (SUB_BITS + 1), MAX_SHIFT)
+    return min((shift + 1) * SUB_COUNT + (ns >> shift) - SUB_COUNT, BUCKETS - 1)
+
+
+def bucket_value(index):
+    """Lower bound in ns of a bucket"""
+    if index < 2 * SUB_COUNT:
+        return index
+    shift = index // SUB_COUNT - 1
+    return (index % SUB_COUNT + SUB_COUNT) << shift
+
+
+class Histogram:
+    """Log-linear histogram of nanosecond durations in a fixed array"""
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns):
+        self.counts[bucket_index(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p):
+        if not self.count:
+            return 0
+        target = self.count * p / 100.0
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return bucket_value(index)
+        return self.max
+
+    def summary(self):
+        """Microsecond summary of the recorded durations"""
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_us': round(self.total / self.count / 1000, 2),
+            'p50_us': round(self.percentile(50) / 1000, 2),
+            'p90_us': round(self.percentile(90) / 1000, 2),
+            'p99_us': round(self.percentile(99) / 1000, 2),
+            'max_us': round(self.max / 1000, 2),
+        }
+
+
+class StageProfiler:
+    """Per-stage histograms plus a trace of slow messages"""
+
+    def __init__(self, stages=STAGES, slow_threshold_ms=SLOW_THRESHOLD_MS, trace_size=TRACE_SIZE):
+        self.histograms = {stage: Histogram() for stage in stages}
+        self.total = Histogram()
+        self.slow_threshold_ns = int(slow_threshold_ms * 1e6)
+        self.trace = deque(maxlen=trace_size)
+        self.io_ns = 0
+        self.wait_ns = 0
+        self._current = {}
+        # Reentrant: the SIGUSR1 dump can interrupt record() on the same thread
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_env(cls, enabled=False, **kwargs):
+        """A profiler when enabled or SKYSYNC_PROFILE is set, else None"""
+        if enabled or os.environ.get('SKYSYNC_PROFILE'):
+            return cls(**kwargs)
+        return None
+
+    def instrument(self, master):
+        """Time master.recv() (reads) and master.select() (idle waits) apart from decoding"""
+        master.recv = self._timed(master.recv, 'io_ns')
+        master.select = self._timed(master.select, 'wait_ns')
+        return master
+
+    def _timed(self, fn, counter):
+        def timed(*args, **kwargs):
+            started = perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                setattr(self, counter, getattr(self, counter) + perf_counter_ns() - started)
+        return timed
+
+    def take_io(self):
+        """(read ns, wait ns) in master I/O since the last call"""
+        io_ns, wait_ns = self.io_ns, self.wait_ns
+        self.io_ns = self.wait_ns = 0
+        return io_ns, wait_ns
+
+    def record(self, stage, ns):
+        with self._lock:
+            self.histograms[stage].record(ns)
+        self._current[stage] = self._current.get(stage, 0) + ns
+
+    def record_receive(self, total_ns):
+        """Split a recv_match() duration into receive (reads) and decode; idle waiting is dropped"""
+        io_ns, wait_ns = self.take_io()
+        busy_ns = max(total_ns - wait_ns, 0)
+        io_ns = min(io_ns, busy_ns)
+        self.record('receive', io_ns)
+        self.record('decode', busy_ns - io_ns)
+
+    def finish(self, msg_type=None):
+        """Close the current message: update the total and the slow trace"""
+        stages, self._current = self._current, {}
+        elapsed = sum(stages.values())
+        with self._lock:
+            self.total.record(elapsed)
+            if elapsed >= self.slow_threshold_ns:
+                self.trace.append({
+                    'type': msg_type,
+                    'total_us': round(elapsed / 1000, 1),
+                    'stages_us': {stage: round(ns / 1000, 1) for stage, ns in stages.items()},
+                })
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'stages': {stage: h.summary() for stage, h in self.histograms.items()},
+                'total': self.total.summary(),
+                'slow_threshold_ms': self.slow_threshold_ns / 1e6,
+                'slow_messages': list(self.trace),
+            }
+
+    def dump(self, path=DUMP_FILE):
+        """Log a summary line per stage and write the full snapshot to path"""
+        snapshot = self.snapshot()
+        for stage, summary in list(snapshot['stages'].items()) + [('total', snapshot['total'])]:
+            if summary['count']:
+                logger.info(f"{stage:<10} n={summary['count']} mean={summary['mean_us']}us "
+                            f"p50={summary['p50_us']}us p99={summary['p99_us']}us max={summary['max_us']}us")
+        try:
+            with open(path, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+        except OSError as e:
+            logger.warning(f"Could not write {path}: {e}")
+        return snapshot
+
+    def install_signal_handler(self, signum=getattr(signal, 'SIGUSR1', None)):
+        """Dump on SIGUSR1 (not available on Windows)"""
+        if signum is None:
+            return False
+        signal.signal(signum, lambda *_: self.dump())
+        return True
@@ -0,0 +1,364 @@
+"""
+Telemetry stream profiles
+
+A profile maps message names to the rate (Hz) the GCS actually needs.
+StreamManager applies a profile with MAV_CMD_SET_MESSAGE_INTERVAL, falls
+back to the legacy REQUEST_DATA_STREAM groups when the autopilot does not
+support it, and switching profiles only sends the rates that changed.
+
+apply() never blocks: every interval is sent at once and the COMMAND_ACKs
+are matched (in send order, per command) as they pass through observe(),
+so no telemetry is consumed waiting for them. Unanswered requests are
+resent; the link only falls back to legacy streams on an explicit
+MAV_RESULT_UNSUPPORTED or when no request has ever been answered after
+repeated timeouts. observe() also measures arrival rates, re-requests
+messages that stay well below their target, and re-applies the whole
+profile when the vehicle reboots (time_boot_ms goes backwards, or its
+heartbeat returns after a silence).
+
+    from stream_profiles import StreamManager
+    streams = StreamManager(master)
+    streams.apply('dashboard')
+    streams.observe(msg)            # for every received message
+"""
+
+import time
+import logging
+import argparse
+from collections import deque
+
+from pymavlink import mavutil
+
+logger = logging.getLogger(__name__)
+
+PROFILES = {
+    # What the web dashboard renders (listen.py message_types)
+    'dashboard': {
+        'ATTITUDE': 20,
+        'GLOBAL_POSITION_INT': 10,
+        'LOCAL_POSITION_NED': 10,
+        'RAW_IMU': 10,
+        'SCALED_IMU2': 5,
+        'RANGEFINDER': 5,
+        'DISTANCE_SENSOR': 5,
+        'AHRS': 2,
+        'AHRS2': 2,
+        'SYS_STATUS': 1,
+        'BATTERY_STATUS': 1,
+    },
+    # Sensor data the calibration screens plot
+    'calibration': {
+        'RAW_IMU': 20,
+        'SCALED_IMU2': 10,
+        'SCALED_PRESSURE': 10,
+        'ATTITUDE': 10,
+        'SYS_STATUS': 2,
+    },
+    # Enough to fly by over a weak radio link
+    'low-bandwidth': {
+        'ATTITUDE': 4,
+        'GLOBAL_POSITION_INT': 2,
+        'SYS_STATUS': 1,
+        'BATTERY_STATUS': 0.5,
+    },
+}
+
+# ArduPilot's grouping of messages into legacy data streams
+LEGACY_STREAMS = {
+    'RAW_IMU': mavutil.mavlink.MAV_DATA_STREAM_RAW_SENSORS,
+    'SCALED_IMU2': mavutil.mavlink.MAV_DATA_STREAM_RAW_SENSORS,
+    'SCALED_IMU3': mavutil.mavlink.MAV_DATA_STREAM_RAW_SENSORS,
+    'SCALED_PRESSURE': mavutil.mavlink.MAV_DATA_STREAM_RAW_SENSORS,
+    'SCALED_PRESSURE2': mavutil.mavlink.MAV_DATA_STREAM_RAW_SENSORS,
+    'SYS_STATUS': mavutil.mavlink.MAV_DATA_STREAM_EXTENDED_STATUS,
+    'GPS_RAW_INT': mavutil.mavlink.MAV_DATA_STREAM_EXTENDED_STATUS,
+    'NAV_CONTROLLER_OUTPUT': mavutil.mavlink.MAV_DATA_STREAM_EXTENDED_STATUS,
+    'RC_CHANNELS': mavutil.mavlink.MAV_DATA_STREAM_RC_CHANNELS,
+    'SERVO_OUTPUT_RAW': mavutil.mavlink.MAV_DATA_STREAM_RC_CHANNELS,
+    'GLOBAL_POSITION_INT': mavutil.mavlink.MAV_DATA_STREAM_POSITION,
+    'LOCAL_POSITION_NED': mavutil.mavlink.MAV_DATA_STREAM_POSITION,
+    'ATTITUDE': mavutil.mavlink.MAV_DATA_STREAM_EXTRA1,
+    'AHRS2': mavutil.mavlink.MAV_DATA_STREAM_EXTRA1,
+    'VFR_HUD': mavutil.mavlink.MAV_DATA_STREAM_EXTRA2,
+    'AHRS': mavutil.mavlink.MAV_DATA_STREAM_EXTRA3,
+    'RANGEFINDER': mavutil.mavlink.MAV_DATA_STREAM_EXTRA3,
+    'DISTANCE_SENSOR': mavutil.mavlink.MAV_DATA_STREAM_EXTRA3,
+    'BATTERY_STATUS': mavutil.mavlink.MAV_DATA_STREAM_EXTRA3,
+    'VIBRATION': mavutil.mavlink.MAV_DATA_STREAM_EXTRA3,
+}
+
+ACK_TIMEOUT = 0.5
+ACK_ATTEMPTS = 3        # Sends of one request before it counts as timed out
+LEGACY_AFTER = 3        # Timed-out requests, with no ACK ever seen, before falling back to legacy
+VERIFY_AFTER = 3.0      # Seconds between rate checks
+RATE_TOLERANCE = 0.5    # Measured below this fraction of the target counts as missing
+MAX_RETRIES = 3         # Re-requests of a missing message before giving up on it
+REBOOT_GAP_S = 5.0      # A heartbeat after this much silence means the vehicle may have rebooted
+
+
+def message_id(name):
+    return getattr(mavutil.mavlink, f'MAVLINK_MSG_ID_{name}')
+
+
+class RateMeter:
+    """Per-message arrival counts since a reset"""
+
+    def __init__(self):
+        self.counts = {}
+        self.started = time.monotonic()
+
+    def reset(self):
+        self.counts = {}
+        self.started = time.monotonic()
+
+    def add(self, msg_type):
+        self.counts[msg_type] = self.counts.get(msg_type, 0) + 1
+
+    def rates(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return {msg_type: count / elapsed for msg_type, count in self.counts.items()}
+
+
+class StreamManager:
+    """Apply stream profiles to one connection, sending only what changed"""
+
+    def __init__(self, master):
+        self.master = master
+        self.current = {}          # name -> Hz currently requested
+        self.legacy = None         # None until the first SET_MESSAGE_INTERVAL answers
+        self.legacy_rates = {}     # stream id -> Hz currently requested
+        self.profile = None
+        self.meter = RateMeter()
+        self.applied_at = None
+        self.checked_at = None
+        self.pending = deque()     # [name, rate, sent_at, attempts] awaiting an ACK, oldest first
+        self.timeouts = 0
+        self.unsupported = []      # Names refused as unsupported before any request was accepted
+        self.retries = {}          # name -> re-requests since it was last seen at rate
+        self.last_heartbeat = None
+        self.last_boot_ms = None
+
+    def _set_interval(self, name, rate, attempts=1):
+        """Request name at rate Hz (0 disables); the ACK is matched later in observe()"""
+        interval = -1 if rate <= 0 else int(1e6 / rate)
+        self.master.mav.command_long_send(
+            self.master.target_system, self.master.target_component,
+            mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL, 0,
+            message_id(name), interval, 0, 0, 0, 0, 0)
+        self.pending.append([name, rate, time.monotonic(), attempts])
+
+    def _stop_all_streams(self):
+        self.master.mav.request_data_stream_send(
+            self.master.target_system, self.master.target_component,
+            mavutil.mavlink.MAV_DATA_STREAM_ALL, 0, 0)
+
+    def _apply_legacy(self, rates):
+        wanted = {}
+        for name, rate in rates.items():
+            stream = LEGACY_STREAMS.get(name)
+            if stream is None:
+                logger.warning(f"No legacy stream carries {name}")
+                continue
+            # A group runs at the rate of its fastest member
+            wanted[stream] = max(wanted.get(stream, 0), max(1, round(rate)))
+        for stream in set(wanted) | set(self.legacy_rates):
+            rate = wanted.get(stream, 0)
+            if self.legacy_rates.get(stream, 0) == rate:
+                continue
+            self.master.mav.request_data_stream_send(
+                self.master.target_system, self.master.target_component,
+                stream, rate, 1 if rate else 0)
+        self.legacy_rates = wanted
+
+    def _use_legacy(self, reason):
+        logger.info(f"SET_MESSAGE_INTERVAL {reason}, using legacy data streams")
+        self.legacy = True
+        self.pending.clear()
+        self._apply_legacy(self.current)
+
+    def apply(self, profile):
+        """Switch to a profile (name or {message: Hz}); returns the number of requests sent"""
+        rates = PROFILES[profile] if isinstance(profile, str) else dict(profile)
+        changes = {name: rate for name, rate in rates.items() if self.current.get(name) != rate}
+        changes.update({name: 0 for name in self.current if name not in rates})
+
+        if self.profile is None:
+            # First profile on this link: drop whatever blanket streams were running
+            self._stop_all_streams()
+
+        if self.legacy:
+            before = dict(self.legacy_rates)
+            self._apply_legacy(rates)
+            sent = sum(1 for stream in set(before) | set(self.legacy_rates)
+                       if before.get(stream, 0) != self.legacy_rates.get(stream, 0))
+        else:
+            for name, rate in changes.items():
+                self._set_interval(name, rate)
+            sent = len(changes)
+
+        self.current = rates
+        self.profile = profile
+        self.meter.reset()
+        self.applied_at = self.checked_at = time.monotonic()
+        self.retries = {}
+        logger.info(f"Stream profile {profile if isinstance(profile, str) else 'custom'}: "
+                    f"{len(changes)} change(s), {sent} request(s)")
+        return sent
+
+    def reapply(self, reason):
+        """Send the whole profile again, e.g. after the vehicle rebooted and forgot it"""
+        if self.profile is None:
+            return 0
+        logger.info(f"Re-applying stream profile: {reason}")
+        profile = self.profile
+        self.current = {}
+        self.legacy_rates = {}
+        self.pending.clear()
+        self.profile = None
+        return self.apply(profile)
+
+    def _handle_ack(self, msg):
+        if msg.command != mavutil.mavlink.MAV_CMD_SET_MESSAGE_INTERVAL or not self.pending:
+            return
+        # The ACK does not echo the message id; the autopilot answers in order
+        name, rate, _, _ = self.pending.popleft()
+        if msg.result == mavutil.mavlink.MAV_RESULT_ACCEPTED:
+            if self.unsupported:
+                logger.warning(f"Autopilot does not support {', '.join(self.unsupported)}")
+                self.retries.update(dict.fromkeys(self.unsupported, MAX_RETRIES))
+                self.unsupported = []
+            self.legacy = False
+            self.timeouts = 0
+        elif msg.result == mavutil.mavlink.MAV_RESULT_UNSUPPORTED and self.legacy is None:
+            # Per-message refusals are normal; only a batch refused outright means no support
+            self.unsupported.append(name)
+            if not self.pending:
+                self._use_legacy("not supported")
+        elif msg.result != mavutil.mavlink.MAV_RESULT_UNSUPPORTED or not self.legacy:
+            logger.warning(f"Autopilot refused {name} at {rate} Hz (result {msg.result})")
+            self.retries[name] = MAX_RETRIES     # Re-requesting will not help
+
+    def _expire_pending(self, now):
+        while self.pending and now - self.pending[0][2] > ACK_TIMEOUT:
+            name, rate, _, attempts = self.pending.popleft()
+            if attempts < ACK_ATTEMPTS:
+                self._set_interval(name, rate, attempts + 1)
+                continue
+            self.timeouts += 1
+            logger.warning(f"No ACK for {name} at {rate} Hz after {attempts} attempts")
+            if self.legacy is None and self.timeouts >= LEGACY_AFTER:
+                self._use_legacy("never answered")
+                return
+
+    def _check_reboot(self, msg, msg_type, now):
+        if (msg.get_srcSystem(), msg.get_srcComponent()) != (self.master.target_system,
+                                                             self.master.target_component):
+            return
+        if msg_type == 'HEARTBEAT':
+            silent = self.last_heartbeat is not None and now - self.last_heartbeat > REBOOT_GAP_S
+            self.last_heartbeat = now
+            if silent:
+                self.last_boot_ms = None
+                self.reapply("vehicle heartbeat is back after a silence")
+            return
+        boot_ms = getattr(msg, 'time_boot_ms', None)
+        if boot_ms is None:
+            return
+        if self.last_boot_ms is not None and boot_ms + 1000 < self.last_boot_ms:
+            self.last_boot_ms = boot_ms
+            self.reapply("vehicle rebooted (time_boot_ms went backwards)")
+            return
+        self.last_boot_ms = boot_ms
+
+    def observe(self, msg):
+        """Feed every received message: matches ACKs, measures rates and re-requests what is missing"""
+        now = time.monotonic()
+        msg_type = msg.get_type()
+        if msg_type == 'COMMAND_ACK':
+            self._handle_ack(msg)
+        elif msg_type != 'BAD_DATA':
+            self._check_reboot(msg, msg_type, now)
+        self.meter.add(msg_type)
+        if self.pending:
+            self._expire_pending(now)
+        if self.checked_at and now - self.checked_at >= VERIFY_AFTER:
+            self.checked_at = now
+            self.verify(retry=True)
+            self.meter.reset()
+
+    def settle(self, timeout=1.0):
+        """For scripts without a receive loop: read (and observe) until every request is answered"""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            msg = self.master.recv_match(blocking=True, timeout=0.1)
+            if msg:
+                self.observe(msg)
+            else:
+                self._expire_pending(time.monotonic())
+        return not self.pending
+
+    def verify(self, retry=False):
+        """Return {name: (target, measured)} for messages below target; optionally re-request them"""
+        measured = self.meter.rates()
+        short = {}
+        for name, target in self.current.items():
+            rate = measured.get(name, 0.0)
+            if target > 0 and rate < target * RATE_TOLERANCE:
+                short[name] = (target, rate)
+            else:
+                self.retries.pop(name, None)
+        if not retry:
+            return short
+        missing = [name for name in short if self.retries.get(name, 0) < MAX_RETRIES]
+        for name in missing:
+            target, rate = short[name]
+            logger.warning(f"{name}: {rate:.1f} Hz measured, {target} Hz requested")
+            self.retries[name] = self.retries.get(name, 0) + 1
+            if not self.legacy:
+                self._set_interval(name, target)
+        if missing and self.legacy:
+            self.legacy_rates = {}
+            self._apply_legacy(self.current)
+        return short
+
+
+def measure(master, duration=5.0):
+    """Read for duration seconds and return {type: Hz}"""
+    meter = RateMeter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        msg = master.recv_match(blocking=True, timeout=0.1)
+        if msg and msg.get_type() != 'BAD_DATA':
+            meter.add(msg.get_type())
+    return meter.rates()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply a telemetry stream profile and measure the result')
+    parser.add_argument('profile', choices=sorted(PROFILES))
+    parser.add_argument('--connection', type=str, default='auto',
+                        help='Connection string (e.g., /dev/tty.usbserial-*, udpin:localhost:14551 or auto)')
+    parser.add_argument('--baud', type=int, default=57600,
+                        help='Baud rate for serial connection')
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='Seconds to measure arrival rates for')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from connection_profile import open_connection
+    master, _ = open_connection(args.connection, args.baud)
+    if not master:
+        print("Failed to connect")
+        return
+    streams = StreamManager(master)
+    streams.apply(args.profile)
+    streams.settle()
+    rates = measure(master, args.duration)
+    for name in sorted(set(rates) | set(streams.current)):
+        target = streams.current.get(name)
+        print(f"{name:<24} {rates.get(name, 0.0):6.1f} Hz" + (f"  (target {target} Hz)" if target else ''))
+    master.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Compact binary telemetry frames for web clients
+
+An optional alternative to JSON for the Python telemetry endpoints.
+Every frame starts with an 8-byte little-endian header:
+
+    kind u8 | version u8 | schema id u16 | count u32
+
+    SCHEMA   (1)  count bytes of UTF-8 JSON {"id", "type", "fields": [[name, code, length]], "size"}
+    ROWS     (2)  count struct-packed rows of the schema's size
+    COLUMNS  (3)  per field, count values back to back
+
+Frame bodies and each column are padded to 8 bytes, so every column
+starts aligned and can be read as a typed-array view.
+
+Codes are struct/DataView types: d f b B h H i I s. Every row or column
+set starts with time_unix_us as 'd' (exact to 2^53 us). 64-bit integers
+are sent as 'd' because browsers have no cheap int64, and doubles are
+downcast to 'f' unless the schema is built with downcast=False. MAVLink
+floats are already float32 on the wire, so that loses nothing for them.
+A schema is announced before its first rows on a stream, and again if
+its id is recycled for another projection; one-shot HTTP responses carry
+their schema in front of the data.
+
+Negotiation: HTTP clients send `Accept: application/vnd.skysync.telemetry`
+(wants_binary()); WebSocket clients offer the WS_BINARY or WS_JSON
+subprotocol. Anything else keeps getting JSON. lib/mavlink/telemetry-wire.ts
+is the browser-side decoder.
+
+    payload = encode_message(msg, time_us, fields=('roll', 'pitch'))
+    stream = StreamEncoder(); websocket.send(b''.join(stream.frames(msg, time_us)))
+"""
+
+import json
+import struct
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from records import message_fields
+
+MIME_TYPE = 'application/vnd.skysync.telemetry'
+WS_BINARY = 'skysync.telemetry.bin'
+WS_JSON = 'skysync.telemetry.json'
+VERSION = 1
+
+SCHEMA = 1
+ROWS = 2
+COLUMNS = 3
+
+HEADER = struct.Struct('<BBHI')
+
+# MAVLink wire type -> (code, downcast code)
+CODES = {
+    'float': ('f', 'f'),
+    'double': ('d', 'f'),
+    'int8_t': ('b', 'b'),
+    'uint8_t': ('B', 'B'),
+    'uint8_t_mavlink_version': ('B', 'B'),
+    'int16_t': ('h', 'h'),
+    'uint16_t': ('H', 'H'),
+    'int32_t': ('i', 'i'),
+    'uint32_t': ('I', 'I'),
+    'int64_t': ('d', 'd'),
+    'uint64_t': ('d', 'd'),
+}
+
+TIME_FIELD = 'time_unix_us'
+
+
+def _row_struct(fields):
+    return struct.Struct('<' + ''.join(
+        f'{max(length, 1)}s' if code == 's' else code * max(length, 1) for _, code, length in fields))
+
+
+class Schema:
+    """Projection of one message type onto a fixed binary row layout"""
+
+    def __init__(self, schema_id, msg_type, fields=None, downcast=True):
+        self.id = schema_id
+        self.msg_type = msg_type
+        available = {name: (ftype, length) for name, ftype, length in message_fields(msg_type)}
+        names = list(available) if fields is None else list(fields)
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise KeyError(f"{msg_type} has no field {', '.join(unknown)}")
+
+        self.fields = [(TIME_FIELD, 'd', 0)]
+        for name in names:
+            ftype, length = available[name]
+            code = 's' if ftype == 'char' else CODES[ftype][1 if downcast else 0]
+            self.fields.append((name, code, length))
+        self.names = names
+        self.struct = _row_struct(self.fields)
+        self._arrays = any(length and code != 's' for _, code, length in self.fields)
+        self._strings = [i for i, (_, code, _) in enumerate(self.fields[1:]) if code == 's']
+
+        description = {
+            'id': self.id,
+            'type': msg_type,
+            'fields': [list(field) for field in self.fields],
+            'size': self.struct.size,
+        }
+        body = json.dumps(description, separators=(',', ':')).encode('utf-8')
+        body += b' ' * (-len(body) % 8)
+        self.frame = HEADER.pack(SCHEMA, VERSION, self.id, len(body)) + body
+
+    def values(self, msg):
+        values = [getattr(msg, name) for name in self.names]
+        for i in self._strings:
+            if isinstance(values[i], str):
+                values[i] = values[i].encode('utf-8', 'replace')
+        if not self._arrays:
+            return values
+        flat = []
+        for value in values:
+            if isinstance(value, (list, tuple)):
+                flat.extend(value)
+            else:
+                flat.append(value)
+        return flat
+
+    def pack(self, msg, time_us):
+        return self.struct.pack(float(time_us), *self.values(msg))
+
+    def rows(self, packed_rows):
+        """ROWS frame from rows already packed with pack()"""
+        body = b''.join(packed_rows)
+        return HEADER.pack(ROWS, VERSION, self.id, len(packed_rows)) + body + b'\0' * (-len(body) % 8)
+
+    def columns(self, time_us, columns):
+        """COLUMNS frame from a time array and {field: array}, e.g. TimeSeriesCache or RecordRing views"""
+        count = len(time_us)
+        parts = [HEADER.pack(COLUMNS, VERSION, self.id, count)]
+        for name, code, length in self.fields:
+            values = time_us if name == TIME_FIELD else columns[name]
+            if code == 's':
+                data = np.asarray(values, dtype=f'S{max(length, 1)}').tobytes()
+            else:
+                data = np.ascontiguousarray(values, dtype='<' + code).tobytes()
+            parts.append(data)
+            pad = -len(data) % 8
+            if pad:
+                parts.append(b'\0' * pad)
+        return b''.join(parts)
+
+
+MAX_SCHEMAS = 1024      # Registry size; the least recently used schema's id is recycled beyond it
+
+_registry = OrderedDict()   # (type, fields, downcast) -> Schema, least recently used first
+_free_ids = []
+_ids = itertools.count(1)
+_registry_lock = threading.Lock()   # schema() is called from the WS server and HTTP handler threads
+
+
+def _normalise(msg_type, fields):
+    """Projection in the message's own field order without repeats; every field -> None"""
+    if fields is None:
+        return None
+    order = {name: i for i, (name, _, _) in enumerate(message_fields(msg_type))}
+    names = sorted(set(fields), key=lambda name: (order.get(name, len(order)), name))
+    return None if len(names) == len(order) and all(name in order for name in names) else tuple(names)
+
+
+def schema(msg_type, fields=None, downcast=True):
+    """
+    Shared Schema for (type, projected fields, downcast). The same field
+    set in any order maps to one schema. Only MAX_SCHEMAS are kept; an
+    evicted schema's id is reused, so anything that caches schemas by id
+    must check it still has the same object (StreamEncoder does).
+    """
+    fields = _normalise(msg_type, fields)
+    key = (msg_type, fields, downcast)
+    with _registry_lock:
+        result = _registry.get(key)
+        if result is not None:
+            _registry.move_to_end(key)
+            return result
+        if len(_registry) >= MAX_SCHEMAS:
+            _, evicted = _registry.popitem(last=False)
+            _free_ids.append(evicted.id)
+        schema_id = _free_ids.pop() if _free_ids else next(_ids)
+        try:
+            result = Schema(schema_id, msg_type, fields, downcast)
+        except KeyError:
+            _free_ids.append(schema_id)
+            raise
+        _registry[key] = result
+        return result
+
+
+def parse_fields(text):
+    """'roll,pitch' -> ('roll', 'pitch'); empty means every field"""
+    return tuple(name for name in text.split(',') if name) if text else None
+
+
+def wants_binary(accept):
+    return bool(accept) and MIME_TYPE in accept
+
+
+def encode_message(msg, time_us, fields=None, downcast=True):
+    """Self-describing payload for one message: its schema frame then one row"""
+    layout = schema(msg.get_type(), fields, downcast)
+    return layout.frame + layout.rows([layout.pack(msg, time_us)])
+
+
+def encode_columns(msg_type, time_us, columns, fields=None, downcast=True):
+    """Self-describing payload for a window of history: schema frame then columns"""
+    layout = schema(msg_type, fields, downcast)
+    return layout.frame + layout.columns(time_us, columns)
+
+
+class StreamEncoder:
+    """Frames for one connection; a schema is announced the first time it is used"""
+
+    def __init__(self, fields=None, downcast=True):
+        self.fields = fields or {}      # msg_type -> projected field tuple
+        self.downcast = downcast
+        self.announced = {}             # schema id -> Schema last announced under it
+
+    def frames(self, msg, time_us):
+        layout = schema(msg.get_type(), self.fields.get(msg.get_type()), self.downcast)
+        frames = []
+        if self.announced.get(layout.id) is not layout:
+            # New, or the id was recycled for another schema: (re)announce it
+            self.announced[layout.id] = layout
+            frames.append(layout.frame)
+        frames.append(layout.rows([layout.pack(msg, time_us)]))
+        return frames
+
+
+def decode(payload, schemas=None):
+    """[(msg_type, [dict per row])] from a payload; schemas carries announcements across calls"""
+    schemas = {} if schemas is None else schemas
+    out = []
+    offset = 0
+    while offset < len(payload):
+        kind, _, schema_id, count = HEADER.unpack_from(payload, offset)
+        offset += HEADER.size
+        if kind == SCHEMA:
+            description = json.loads(payload[offset:offset + count])
+            fields = description['fields']
+            schemas[schema_id] = (description['type'], fields, _row_struct(fields))
+            offset += count
+            continue
+        msg_type, fields, layout = schemas[schema_id]
+        if kind == ROWS:
+            rows = []
+            for _ in range(count):
+                rows.append(_unflatten(fields, layout.unpack_from(payload, offset)))
+                offset += layout.size
+            offset += -(count * layout.size) % 8
+            out.append((msg_type, rows))
+        elif kind == COLUMNS:
+            columns = {}
+            for name, code, length in fields:
+                dtype = np.dtype(f'S{max(length, 1)}' if code == 's' else '<' + code)
+                shape = (count, length) if length and code != 's' else (count,)
+                size = dtype.itemsize * int(np.prod(shape))
+                columns[name] = np.frombuffer(payload, dtype=dtype, count=int(np.prod(shape)),
+                                              offset=offset).reshape(shape)
+                offset += size + (-size % 8)
+            rows = [{name: values[i].tolist() for name, values in columns.items()} for i in range(count)]
+            for row in rows:
+                for name, value in row.items():
+                    if isinstance(value, bytes):
+                        row[name] = value.split(b'\0', 1)[0].decode('utf-8', 'replace')
+            out.append((msg_type, rows))
+        else:
+            raise ValueError(f"Unknown frame kind {kind}")
+    return out
+
+
+def _unflatten(fields, values):
+    row = {}
+    i = 0
+    for name, code, length in fields:
+        if code == 's':
+            row[name] = values[i].split(b'\0', 1)[0].decode('utf-8', 'replace')
+            i += 1
+        elif length:
+            row[name] = list(values[i:i + length])
+            i += length
+        else:
+            row[name] = values[i]
+            i += 1
+    return row
@@ -0,0 +1,186 @@
+"""
+In-memory time series of the live telemetry
+
+Every numeric field of every message type seen gets its own typed ring
+(the wire type from the dialect, via records.record_dtype), sharing one
+time_us ring per type. Rings are mirrored like records.Ring, so "the
+last T seconds of field X" is one binary search over the time ring and
+a contiguous slice of the field's array, and decimation is a stride on
+that slice, never a copy. Capacities follow the stream profile's rate
+for the type, so a few minutes of the dashboard profile is a few MB.
+
+    cache = TimeSeriesCache(seconds=300, rates=PROFILES['dashboard'])
+    cache.add(msg, clock.unified_time_us(msg))             # for every message
+    times, columns = cache.query('ATTITUDE', ['roll'], seconds=30, max_points=500)
+
+listen.py serves query() as JSON at /series on the metrics port:
+    /series                                   types, fields and sample counts
+    /series?type=ATTITUDE&fields=roll,pitch&seconds=30&max_points=500
+With `Accept: application/vnd.skysync.telemetry` the window comes back
+as telemetry_wire columns instead.
+
+The HTTP thread reads while the ingest loop writes; with the capacity
+headroom that can only disturb the oldest sample of a full window.
+"""
+
+import math
+
+import numpy as np
+
+import telemetry_wire
+from records import record_dtype
+
+SECONDS = 300           # History kept per type
+DEFAULT_RATE = 5.0      # Hz assumed for types the stream profile does not list
+RATE_HEADROOM = 2.0     # Capacity margin for vehicles that stream faster than requested
+MIN_CAPACITY = 64
+
+
+class SeriesGroup:
+    """Time ring plus one typed ring per numeric field of one message type"""
+
+    def __init__(self, msg_type, capacity):
+        self.msg_type = msg_type
+        self.capacity = capacity
+        self.count = 0
+        self._head = 0
+        self.time_us = np.zeros(2 * capacity, dtype=np.int64)
+        self.columns = {}
+        dtype = record_dtype(msg_type)
+        for name in dtype.names[1:]:
+            base, shape = dtype[name].base, dtype[name].shape
+            if base.kind in 'iuf':
+                # Arrays such as BATTERY_STATUS.voltages become (capacity, n) columns
+                self.columns[name] = np.zeros((2 * capacity,) + shape, dtype=base)
+        self._items = list(self.columns.items())
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def nbytes(self):
+        return self.time_us.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    def append(self, msg, time_us):
+        h, h2 = self._head, self._head + self.capacity
+        self.time_us[h] = self.time_us[h2] = time_us
+        for name, column in self._items:
+            value = getattr(msg, name)
+            column[h] = value
+            column[h2] = value
+        self._head = (h + 1) % self.capacity
+        self.count += 1
+
+    def window(self, seconds=None, since_us=None, max_points=None):
+        """Slice into the columns covering the window, newest sample always included
+
+        seconds counts back from the newest sample, since_us is an absolute
+        time_us lower bound; max_points decimates by striding.
+        """
+        end = self._head + self.capacity
+        begin = end - len(self)
+        if begin == end:
+            return slice(end, end)
+        times = self.time_us[begin:end]
+        cutoff = None
+        if seconds is not None:
+            cutoff = int(times[-1] - seconds * 1e6)
+        if since_us is not None:
+            cutoff = since_us if cutoff is None else max(cutoff, since_us)
+        if cutoff is not None:
+            begin += int(np.searchsorted(times, cutoff, side='left'))
+        step = 1
+        if max_points and end - begin > max_points:
+            step = math.ceil((end - begin) / max_points)
+            # Anchor the stride on the newest sample rather than the oldest
+            begin += (end - 1 - begin) % step
+        return slice(begin, end, step)
+
+    def query(self, fields=None, seconds=None, since_us=None, max_points=None):
+        """(time_us, {field: array}) as views into the rings"""
+        window = self.window(seconds, since_us, max_points)
+        names = self.columns if fields is None else fields
+        return self.time_us[window], {name: self.columns[name][window] for name in names}
+
+
+class TimeSeriesCache:
+    """SeriesGroups per message type, created on first sight of a type"""
+
+    def __init__(self, seconds=SECONDS, rates=None, types=None):
+        self.seconds = seconds
+        self.rates = rates or {}
+        self.types = set(types) if types else None    # None caches every type
+        self.groups = {}
+        self._skip = set()
+
+    def capacity(self, msg_type):
+        rate = self.rates.get(msg_type, DEFAULT_RATE)
+        return max(MIN_CAPACITY, int(self.seconds * rate * RATE_HEADROOM))
+
+    def add(self, msg, time_us):
+        msg_type = msg.get_type()
+        group = self.groups.get(msg_type)
+        if group is None:
+            if msg_type in self._skip:
+                return
+            if self.types is not None and msg_type not in self.types:
+                self._skip.add(msg_type)
+                return
+            try:
+                group = SeriesGroup(msg_type, self.capacity(msg_type))
+            except KeyError:
+                self._skip.add(msg_type)   # BAD_DATA and types outside the dialect
+                return
+            self.groups[msg_type] = group
+        group.append(msg, time_us)
+
+    def query(self, msg_type, fields=None, seconds=None, since_us=None, max_points=None):
+        group = self.groups.get(msg_type)
+        if group is None:
+            raise KeyError(msg_type)
+        unknown = [name for name in (fields or ()) if name not in group.columns]
+        if unknown:
+            raise KeyError(f"{msg_type} has no numeric field {', '.join(unknown)}")
+        return group.query(fields, seconds, since_us, max_points)
+
+    @property
+    def nbytes(self):
+        return sum(group.nbytes for group in self.groups.values())
+
+    def summary(self):
+        return {
+            'seconds': self.seconds,
+            'bytes': self.nbytes,
+            'types': {
+                msg_type: {'samples': len(group), 'capacity': group.capacity, 'fields': list(group.columns)}
+                for msg_type, group in sorted(self.groups.items())
+            },
+        }
+
+    def route(self, type=None, fields=None, seconds=None, since_us=None, max_points=None):
+        """JSON body for GET /series (query-string arguments arrive as strings)"""
+        if type is None:
+            return self.summary()
+        times, columns = self.query(
+            type,
+            fields.split(',') if fields else None,
+            float(seconds) if seconds is not None else None,
+            int(since_us) if since_us is not None else None,
+            int(max_points) if max_points is not None else None,
+        )
+        return {
+            'type': type,
+            'time_us': times.tolist(),
+            'fields': {name: values.tolist() for name, values in columns.items()},
+        }
+
+    def route_binary(self, type, fields=None, seconds=None, since_us=None, max_points=None):
+        """telemetry_wire COLUMNS payload for GET /series"""
+        times, columns = self.query(
+            type,
+            telemetry_wire.parse_fields(fields),
+            float(seconds) if seconds is not None else None,
+            int(since_us) if since_us is not None else None,
+            int(max_points) if max_points is not None else None,
+        )
+        return telemetry_wire.encode_columns(type, times, columns, tuple(columns))
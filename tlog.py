@@ -0,0 +1,193 @@
+"""
+Telemetry log (.tlog) recording and replay
+
+A tlog is the raw MAVLink stream with an 8-byte big-endian microsecond
+timestamp in front of every message, as written by MAVProxy and Mission
+Planner. Like MAVProxy, the recorder stamps each message with its host
+receive time, so recordings from several vehicles share one clock and
+other tools read them as expected; the TIMESYNC-aligned time is what
+listen.py publishes. replay() paces messages by the tlog timestamps.
+"""
+
+import time
+import bisect
+import struct
+
+from pymavlink import mavutil
+from pymavlink.dialects.v20 import ardupilotmega as dialect
+from clock_sync import receive_time_us
+
+TIMESTAMP = struct.Struct('>Q')
+INDEX_ENTRY = struct.Struct('>QQ')     # (time_us, byte offset) in a .tlog.idx
+INDEX_INTERVAL_US = 1_000_000          # One index entry per second of log
+
+MAGIC_V1 = 0xFE
+MAGIC_V2 = 0xFD
+SIGNED = 0x01                          # MAVLink 2 incompat flag: 13-byte signature follows
+# Timestamps outside 2000-2100 mean the reader is not on a record boundary
+MIN_TIME_US = 946684800 * 10**6
+MAX_TIME_US = 4102444800 * 10**6
+
+
+class TlogWriter:
+    """Append messages to a .tlog file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+        self.count = 0
+
+    def write(self, msg, time_us=None):
+        if msg.get_type() == 'BAD_DATA':
+            return
+        if time_us is None:
+            time_us = receive_time_us(msg)
+        self.file.write(TIMESTAMP.pack(time_us) + msg.get_msgbuf())
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_tlog(path, types=None):
+    """Yield (time_us, msg) for every message in a tlog"""
+    log = mavutil.mavlink_connection(path, notimestamps=False)
+    try:
+        while True:
+            msg = log.recv_match(type=types)
+            if msg is None:
+                return
+            if msg.get_type() == 'BAD_DATA':
+                continue
+            yield round(msg._timestamp * 1e6), msg
+    finally:
+        log.close()
+
+
+def replay(path, callback, speed=1.0, types=None):
+    """Call callback(msg) for each message, paced by its tlog timestamp (speed 0 = as fast as possible)"""
+    start_log = None
+    start_host = time.monotonic()
+    for time_us, msg in read_tlog(path, types):
+        if start_log is None:
+            start_log = time_us
+        if speed > 0:
+            delay = (time_us - start_log) / 1e6 / speed - (time.monotonic() - start_host)
+            if delay > 0:
+                time.sleep(delay)
+        callback(msg)
+
+
+class RawFrame:
+    """One tlog record without decoding the payload"""
+
+    __slots__ = ('time_us', 'sysid', 'compid', 'seq', 'msgid', 'payload', 'data')
+
+    def __init__(self, time_us, sysid, compid, seq, msgid, payload, data):
+        self.time_us = time_us
+        self.sysid = sysid
+        self.compid = compid
+        self.seq = seq
+        self.msgid = msgid
+        self.payload = payload
+        self.data = data       # The whole MAVLink frame, as it goes back on disk
+
+
+def _crc_ok(frame, header_size, length, msgid):
+    """x25 CRC over the frame (after the magic byte) plus the message's CRC_EXTRA"""
+    entry = dialect.mavlink_map.get(msgid)
+    if entry is None:
+        return False   # Unknown ids cannot be checked, and after corruption they usually are garbage
+    crc = dialect.x25crc(frame[1:header_size + length])
+    crc.accumulate(bytes((entry.crc_extra,)))
+    end = header_size + length
+    return crc.crc == frame[end] | frame[end + 1] << 8
+
+
+def _parse_frame(buf, pos):
+    """(RawFrame or None, frame length) for the frame at buf[pos + 8:], or (None, 0) if incomplete
+
+    (None, -1) means no record starts here; (None, -2) a record whose CRC does not check out.
+    """
+    if len(buf) - pos < 10:
+        return None, 0
+    magic, length = buf[pos + 8], buf[pos + 9]
+    if magic == MAGIC_V1:
+        size = 6 + length + 2
+    elif magic == MAGIC_V2:
+        if len(buf) - pos < 11:
+            return None, 0
+        size = 10 + length + 2 + (13 if buf[pos + 10] & SIGNED else 0)
+    else:
+        return None, -1
+    end = pos + 8 + size
+    if end > len(buf):
+        return None, 0
+    time_us = TIMESTAMP.unpack_from(buf, pos)[0]
+    if not MIN_TIME_US <= time_us <= MAX_TIME_US:
+        return None, -1
+    frame = bytes(buf[pos + 8:end])
+    if magic == MAGIC_V1:
+        if not _crc_ok(frame, 6, length, frame[5]):
+            return None, -2
+        return RawFrame(time_us, frame[3], frame[4], frame[2], frame[5], frame[6:6 + length], frame), size
+    msgid = frame[7] | frame[8] << 8 | frame[9] << 16
+    if not _crc_ok(frame, 10, length, msgid):
+        return None, -2
+    return RawFrame(time_us, frame[5], frame[6], frame[4], msgid, frame[10:10 + length], frame), size
+
+
+def read_frames(path, chunk_size=1 << 16, stats=None):
+    """Yield RawFrames from a tlog in constant memory, skipping bytes that do not parse as records
+
+    Every frame is CRC-checked (with the dialect's CRC_EXTRA); a failed
+    check resynchronises like a bad magic byte, and is counted in
+    stats['crc_errors'] when a stats dict is given.
+    """
+    buf = bytearray()
+    pos = 0
+    eof = False
+    with open(path, 'rb') as f:
+        while True:
+            frame, size = _parse_frame(buf, pos)
+            if size == 0:
+                if eof:
+                    if len(buf) - pos <= 10:
+                        return
+                    pos += 1   # A false magic byte whose length runs past the end of the file
+                    continue
+                chunk = f.read(chunk_size)
+                del buf[:pos]
+                pos = 0
+                if not chunk:
+                    eof = True
+                    continue
+                buf += chunk
+                continue
+            if frame is None:
+                if size == -2 and stats is not None:
+                    stats['crc_errors'] = stats.get('crc_errors', 0) + 1
+                pos += 1       # Resynchronise one byte at a time past corruption
+                continue
+            pos += 8 + size
+            yield frame
+
+
+def read_index(path):
+    """[(time_us, offset)] from a .tlog.idx written next to a merged log"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [INDEX_ENTRY.unpack_from(data, i) for i in range(0, len(data) - len(data) % INDEX_ENTRY.size,
+                                                                INDEX_ENTRY.size)]
+
+
+def seek_offset(index, time_us):
+    """Byte offset to start reading from to see every message at or after time_us"""
+    i = bisect.bisect_right([t for t, _ in index], time_us) - 1
+    return index[max(i, 0)][1] if index else 0
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Merge overlapping .tlog recordings into one clean log
+
+Several recorders often capture the same flight (MAVProxy's mav.tlog,
+calibrating/mav.tlog, MyDrone/logs/.../flight.tlog). merge() k-way merges
+any number of them by timestamp with a heap over lazily read frames
+(tlog.read_frames), so memory stays constant however long the logs are.
+Frames that fail their CRC are counted and dropped, never copied.
+A frame is dropped as a duplicate when a frame with the same (sysid,
+compid, seq, msgid, payload hash) from a different input was written
+less than `window` seconds earlier, and that frame has not already
+absorbed a copy from this input. Repeats within one input are never
+dropped: with a periodic stream the same key can legitimately recur
+once seq wraps. Frames are copied byte for byte, never re-encoded.
+
+The output is written atomically, with a sparse index next to it
+(<out>.idx, one (time_us, offset) entry per second; see tlog.read_index
+and tlog.seek_offset) so tools can jump to a time without scanning.
+
+Each input is assumed to be in time order, as recorders write them; a
+log with clock jumps still merges, but only as ordered as it was.
+
+    python tlog_merge.py mav.tlog calibrating/mav.tlog MyDrone/logs/2025-05-26/flight1/flight.tlog -o merged.tlog
+"""
+
+import os
+import heapq
+import argparse
+from collections import deque
+
+from tlog import TIMESTAMP, INDEX_ENTRY, INDEX_INTERVAL_US, read_frames
+
+WINDOW_S = 5.0          # Duplicates arrive within this of each other across recorders
+
+
+class MergeStats:
+    def __init__(self, paths):
+        self.read = dict.fromkeys(paths, 0)
+        self.errors = {path: {'crc_errors': 0} for path in paths}
+        self.duplicates = 0
+        self.written = 0
+        self.index_entries = 0
+
+    def summary(self):
+        inputs = ', '.join(f'{os.path.basename(path)}: {count}' for path, count in self.read.items())
+        crc_errors = sum(errors['crc_errors'] for errors in self.errors.values())
+        return (f"Read {sum(self.read.values())} messages ({inputs}), dropped {self.duplicates} duplicates "
+                f"and {crc_errors} frames failing CRC, wrote {self.written} with {self.index_entries} index entries")
+
+
+def _tagged(frames, stats, path, source):
+    for frame in frames:
+        stats.read[path] += 1
+        yield frame.time_us, source, frame
+
+
+class DuplicateFilter:
+    """Seen-set over a sliding time window; its size is bounded by message rate x window"""
+
+    def __init__(self, window=WINDOW_S):
+        self.window_us = int(window * 1e6)
+        self.seen = {}           # key -> [time_us, source, bitmask of sources already matched]
+        self.order = deque()     # (time_us, key) oldest first
+
+    def is_duplicate(self, frame, source):
+        cutoff = frame.time_us - self.window_us
+        while self.order and self.order[0][0] < cutoff:
+            time_us, key = self.order.popleft()
+            entry = self.seen.get(key)
+            if entry is not None and entry[0] == time_us:
+                del self.seen[key]
+        key = (frame.sysid, frame.compid, frame.seq, frame.msgid, hash(frame.payload))
+        entry = self.seen.get(key)
+        bit = 1 << source
+        if entry is not None and entry[1] != source and not entry[2] & bit:
+            entry[2] |= bit
+            return True
+        self.seen[key] = [frame.time_us, source, 0]
+        self.order.append((frame.time_us, key))
+        return False
+
+
+def merge(paths, out_path, window=WINDOW_S, index=True):
+    """Merge tlogs into out_path (plus out_path + '.idx'); returns MergeStats"""
+    stats = MergeStats(paths)
+    dedup = DuplicateFilter(window)
+    streams = [_tagged(read_frames(path, stats=stats.errors[path]), stats, path, source)
+               for source, path in enumerate(paths)]
+    tmp_path = out_path + '.tmp'
+    index_file = open(out_path + '.idx.tmp', 'wb') if index else None
+    next_index = None
+    offset = 0
+    try:
+        with open(tmp_path, 'wb') as out:
+            for _, source, frame in heapq.merge(*streams, key=lambda item: item[0]):
+                if dedup.is_duplicate(frame, source):
+                    stats.duplicates += 1
+                    continue
+                if index_file and (next_index is None or frame.time_us >= next_index):
+                    index_file.write(INDEX_ENTRY.pack(frame.time_us, offset))
+                    stats.index_entries += 1
+                    next_index = frame.time_us + INDEX_INTERVAL_US
+                record = TIMESTAMP.pack(frame.time_us) + frame.data
+                out.write(record)
+                offset += len(record)
+                stats.written += 1
+    finally:
+        if index_file:
+            index_file.close()
+    os.replace(tmp_path, out_path)
+    if index:
+        os.replace(out_path + '.idx.tmp', out_path + '.idx')
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge and deduplicate overlapping tlogs')
+    parser.add_argument('inputs', nargs='+', help='tlog files to merge')
+    parser.add_argument('-o', '--output', type=str, required=True,
+                        help='Merged tlog to write')
+    parser.add_argument('--window', type=float, default=WINDOW_S,
+                        help='Seconds within which identical frames count as duplicates')
+    parser.add_argument('--no-index', action='store_true',
+                        help='Do not write <output>.idx')
+    args = parser.parse_args()
+
+    if os.path.abspath(args.output) in map(os.path.abspath, args.inputs):
+        parser.error('the output must not be one of the inputs')
+    stats = merge(args.inputs, args.output, args.window, index=not args.no_index)
+    print(stats.summary())
+
+
+if __name__ == '__main__':
+    main()
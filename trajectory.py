@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Seeded, vectorised trajectories for the TelemetrySimulator patterns
+
+Generates the same flight patterns as simulate_telemetry.py
+(visit_safe_spots, circular_patrol, random_walk, figure_eight, switching
+every 30 s) as whole NumPy time series instead of one sleep-paced step
+at a time, so hours of reproducible flight data take seconds. The
+result can be written as a .tlog (replayable with tlog.replay), as
+columns (.npz or column JSON) or as history-data snapshots.
+
+Differences from the live simulator: the random walk reflects off the
+±5 m bounds instead of sticking to them, the safe-spot pause is two
+seconds of samples rather than a sleep, and velocities are the
+derivative of the path rather than noise.
+
+    python trajectory.py --duration 3600 --seed 1 --tlog flight.tlog --history history.json
+"""
+
+import json
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+
+from geodetic import LocalTangentPlane
+
+PATTERNS = ('visit_safe_spots', 'circular_patrol', 'random_walk', 'figure_eight')
+
+# Same field as simulate_telemetry.TelemetrySimulator
+SAFE_SPOTS = np.array([
+    (-1.0, 0.5),     # Safe Spot Alpha
+    (-2.5, 3.0),     # Safe Spot Beta
+    (2.0, 3.0),      # Safe Spot Gamma
+    (3.9, -4.4),     # Home Base
+])
+RATE_HZ = 4                 # simulate_telemetry's 250 ms updates
+PATTERN_DURATION = 30.0     # Seconds per pattern
+MOVE_SPEED = 0.1            # Metres per update while visiting safe spots
+SPOT_PAUSE = 2.0            # Seconds spent at each safe spot
+WALK_STEP = 0.2             # Random walk step bound per update
+WALK_BOUND = 5.0
+ALTITUDE = -0.5             # NED z, slightly above ground
+
+BASE_LAT = 37774900         # degE7, as in update_global_position_int
+BASE_LON = -122419400
+START_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _visit_safe_spots(n, dt, start, target, rng):
+    """Piecewise-linear legs between safe spots with a pause at each"""
+    speed = MOVE_SPEED / dt
+    first = target
+    knots_t, knots = [0.0], [start]
+    t, position = 0.0, start
+    duration = n * dt
+    while t < duration:
+        spot = SAFE_SPOTS[target % len(SAFE_SPOTS)]
+        t += np.linalg.norm(spot - position) / speed
+        knots_t.append(t)
+        knots.append(spot)
+        t += SPOT_PAUSE
+        knots_t.append(t)
+        knots.append(spot)
+        position = spot
+        target += 1
+    times = np.arange(1, n + 1) * dt
+    knots = np.array(knots)
+    xy = np.stack([np.interp(times, knots_t, knots[:, 0]), np.interp(times, knots_t, knots[:, 1])], axis=1)
+    # The next segment of this pattern carries on from the first spot not yet reached
+    reached = int(np.count_nonzero(np.array(knots_t[1::2]) <= duration))
+    return xy, first + reached
+
+
+def _circular_patrol(n, dt, start, target, rng):
+    angle = (np.arange(1, n + 1) * dt * 0.02) % (2 * np.pi)
+    return 3.0 * np.stack([np.cos(angle), np.sin(angle)], axis=1), target
+
+
+def _random_walk(n, dt, start, target, rng):
+    walk = start + np.cumsum(rng.uniform(-WALK_STEP, WALK_STEP, (n, 2)), axis=0)
+    # Fold into [-WALK_BOUND, WALK_BOUND] (reflecting walls)
+    span = 2 * WALK_BOUND
+    folded = np.abs((walk + WALK_BOUND) % (2 * span) - span)
+    return WALK_BOUND - folded, target
+
+
+def _figure_eight(n, dt, start, target, rng):
+    t = np.arange(1, n + 1) * dt * 0.1
+    return np.stack([2 * np.sin(t), np.sin(2 * t)], axis=1), target
+
+
+PATTERN_FUNCS = {
+    'visit_safe_spots': _visit_safe_spots,
+    'circular_patrol': _circular_patrol,
+    'random_walk': _random_walk,
+    'figure_eight': _figure_eight,
+}
+
+
+class Trajectory:
+    """Columns of one generated flight, one row per update"""
+
+    def __init__(self, columns, rate, start_time=START_TIME):
+        self.columns = columns
+        self.rate = rate
+        self.start_time = start_time
+
+    def __len__(self):
+        return len(self.columns['time_boot_ms'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def time_unix_us(self):
+        return int(self.start_time.timestamp() * 1e6) + self.columns['time_boot_ms'] * 1000
+
+    def global_position(self):
+        """GLOBAL_POSITION_INT fields; like the live simulator, x is east and y is north of BASE_LAT/LON"""
+        c = self.columns
+        lat, lon, _ = LocalTangentPlane.from_e7(BASE_LAT, BASE_LON).from_ned_e7(c['y'], c['x'])
+        # GLOBAL_POSITION_INT velocities are NED: vx north, vy east
+        north, east = c['vy'], c['vx']
+        return {
+            'lat': lat,
+            'lon': lon,
+            'alt': (c['z'] * 1000).astype(np.int64) + 260,
+            'relative_alt': (-c['z'] * 1000).astype(np.int64) + 1698,
+            'vx': (north * 100).astype(np.int64),
+            'vy': (east * 100).astype(np.int64),
+            'vz': (c['vz'] * 100).astype(np.int64),
+            'hdg': ((np.degrees(np.arctan2(east, north)) % 360) * 100).astype(np.int64),
+        }
+
+    def save_columnar(self, path):
+        """.npz, or column JSON ({field: [values]}) for any other extension"""
+        if path.endswith('.npz'):
+            np.savez_compressed(path, rate=self.rate, **self.columns)
+            return
+        with open(path, 'w') as f:
+            json.dump({name: values.tolist() for name, values in self.columns.items()}, f)
+
+    def history(self):
+        """history-data TelemetrySnapshot dicts"""
+        c = self.columns
+        lists = {name: values.tolist() for name, values in c.items()}
+        globals_ = {name: values.tolist() for name, values in self.global_position().items()}
+        snapshots = []
+        for i, t_us in enumerate(self.time_unix_us().tolist()):
+            snapshots.append({
+                'timestamp': datetime.fromtimestamp(t_us / 1e6, timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+                'time_boot_ms': lists['time_boot_ms'][i],
+                'time_unix_us': t_us,
+                'position': {
+                    'x': lists['x'][i], 'y': lists['y'][i], 'z': lists['z'][i],
+                    'lat': globals_['lat'][i], 'lon': globals_['lon'][i],
+                    'alt': globals_['alt'][i], 'relative_alt': globals_['relative_alt'][i],
+                },
+                'velocity': {'vx': lists['vx'][i], 'vy': lists['vy'][i], 'vz': lists['vz'][i]},
+            })
+        return snapshots
+
+    def save_history(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.history(), f)
+
+    def save_tlog(self, path, sysid=1):
+        """LOCAL_POSITION_NED and GLOBAL_POSITION_INT (both NED) per row, plus a 1 Hz HEARTBEAT"""
+        from pymavlink.dialects.v20 import ardupilotmega as mavlink2
+        from tlog import TlogWriter
+
+        mav = mavlink2.MAVLink(None, srcSystem=sysid, srcComponent=1)
+        c = self.columns
+        boot = c['time_boot_ms'].tolist()
+        stamps = self.time_unix_us().tolist()
+        # MAVLink frames are NED: x/vx north, y/vy east (the columns have x east, y north)
+        local = np.stack([c['y'], c['x'], c['z'], c['vy'], c['vx'], c['vz']], axis=1).tolist()
+        g = self.global_position()
+        glob = np.stack([g[k] for k in ('lat', 'lon', 'alt', 'relative_alt', 'vx', 'vy', 'vz', 'hdg')],
+                        axis=1).tolist()
+        beat_every = max(1, int(round(self.rate)))
+
+        def packed(msg):
+            msg.pack(mav)
+            mav.seq = (mav.seq + 1) % 256
+            return msg
+
+        open(path, 'wb').close()   # TlogWriter appends; a fixture starts empty
+        with TlogWriter(path) as writer:
+            for i, t_us in enumerate(stamps):
+                if i % beat_every == 0:
+                    writer.write(packed(mav.heartbeat_encode(
+                        mavlink2.MAV_TYPE_QUADROTOR, mavlink2.MAV_AUTOPILOT_PX4, 0, 0, mavlink2.MAV_STATE_ACTIVE)), t_us)
+                writer.write(packed(mav.local_position_ned_encode(boot[i], *local[i])), t_us)
+                writer.write(packed(mav.global_position_int_encode(boot[i], *glob[i])), t_us)
+            return writer.count
+
+
+def generate(duration, rate=RATE_HZ, seed=0, patterns=PATTERNS, pattern_duration=PATTERN_DURATION,
+             start_time=START_TIME):
+    """A Trajectory of duration seconds at rate Hz; the same seed gives the same flight"""
+    rng = np.random.default_rng(seed)
+    dt = 1.0 / rate
+    total = int(round(duration * rate))
+    per_pattern = max(1, int(round(pattern_duration * rate)))
+    xy = np.empty((total, 2))
+    velocity = np.zeros((total, 2))
+    pattern = np.empty(total, dtype=np.int8)
+
+    position = np.zeros(2)
+    target = 0
+    for segment, begin in enumerate(range(0, total, per_pattern)):
+        n = min(per_pattern, total - begin)
+        index = segment % len(patterns)
+        xy[begin:begin + n], target = PATTERN_FUNCS[patterns[index]](n, dt, position, target, rng)
+        pattern[begin:begin + n] = PATTERNS.index(patterns[index])
+        if n > 1:
+            # Per segment, so the jump into the next pattern is not a velocity spike
+            velocity[begin:begin + n] = np.gradient(xy[begin:begin + n], dt, axis=0)
+        position = xy[begin + n - 1]
+
+    z = np.full(total, ALTITUDE)
+    columns = {
+        'time_boot_ms': np.arange(1, total + 1, dtype=np.int64) * int(round(dt * 1000)),
+        'x': xy[:, 0],
+        'y': xy[:, 1],
+        'z': z,
+        'vx': velocity[:, 0],
+        'vy': velocity[:, 1],
+        'vz': np.zeros(total),
+        'pattern': pattern,
+    }
+    return Trajectory(columns, rate, start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate reproducible synthetic flights without sleeping')
+    parser.add_argument('--duration', type=float, default=600,
+                        help='Flight length in seconds')
+    parser.add_argument('--rate', type=float, default=RATE_HZ,
+                        help='Samples per second')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed (random_walk only)')
+    parser.add_argument('--tlog', type=str, default=None,
+                        help='Write a .tlog for replay')
+    parser.add_argument('--columnar', type=str, default=None,
+                        help='Write columns to .npz or column JSON')
+    parser.add_argument('--history', type=str, default=None,
+                        help='Write history-data snapshots (JSON list)')
+    args = parser.parse_args()
+
+    trajectory = generate(args.duration, args.rate, args.seed)
+    print(f"Generated {len(trajectory)} samples ({args.duration:.0f} s at {args.rate:g} Hz)")
+    if args.tlog:
+        count = trajectory.save_tlog(args.tlog)
+        print(f"Wrote {count} messages to {args.tlog}")
+    if args.columnar:
+        trajectory.save_columnar(args.columnar)
+        print(f"Wrote columns to {args.columnar}")
+    if args.history:
+        trajectory.save_history(args.history)
+        print(f"Wrote history snapshots to {args.history}")
+
+
+if __name__ == '__main__':
+    main()